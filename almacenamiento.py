@@ -0,0 +1,420 @@
+"""Capa de almacenamiento de la app de recetas.
+
+Ofrece dos backends intercambiables con la misma interfaz:
+
+* ``AlmacenJSON``: el archivo ``recetas.json`` de siempre, ahora con escritura
+  atómica (archivo temporal + renombrado).
+* ``AlmacenSQLite``: base embebida con altas, bajas y modificaciones a nivel de
+  receta e ingrediente, sin reescribir el catálogo completo.
+
+Todas las operaciones de escritura aceptan ``version_esperada`` para control
+optimista de concurrencia: si otro administrador guardó antes, se lanza
+``ConflictoDeVersion`` en lugar de pisar sus cambios. ``aplicar_lote`` aplica
+varias operaciones en una sola escritura (lo usa ``escritura.EscrituraDiferida``).
+"""
+
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+
+
+class ConflictoDeVersion(Exception):
+    """Los datos cambiaron desde que se leyeron."""
+
+
+def _copia_vacia():
+    return {"ingredientes_globales": {}, "recetas": []}
+
+
+def _verificar_id_libre(recetas, receta_id, buscado):
+    if receta_id != buscado and any(r['id'] == receta_id for r in recetas):
+        raise ValueError(f"Ya existe una receta con el ID '{receta_id}'.")
+
+
+# --- BACKEND JSON ---
+
+class AlmacenJSON:
+    """Guarda el catálogo completo en un único archivo JSON."""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+
+    def version(self):
+        """Versión barata del archivo: inodo, fecha de modificación y tamaño.
+
+        El inodo cambia con cada escritura atómica (``os.replace``), y la fecha
+        y el tamaño detectan las ediciones hechas en el sitio por otro programa.
+        """
+        try:
+            st = os.stat(self.ruta)
+        except FileNotFoundError:
+            return "0"
+        return f"{st.st_ino}-{st.st_mtime_ns}-{st.st_size}"
+
+    def cargar(self):
+        """Devuelve ``(data, version)``. Lanza FileNotFoundError si no existe."""
+        with self._lock:
+            version = self.version()
+            with open(self.ruta, 'r', encoding='utf-8') as f:
+                return json.load(f), version
+
+    def _escribir(self, data):
+        directorio = os.path.dirname(os.path.abspath(self.ruta))
+        fd, tmp = tempfile.mkstemp(dir=directorio, prefix='.recetas-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=4, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.ruta)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return self.version()
+
+    def _modificar(self, cambio, version_esperada):
+        """Lee, aplica ``cambio(data)`` y escribe, todo bajo el mismo candado."""
+        with self._lock:
+            if version_esperada is not None and version_esperada != self.version():
+                raise ConflictoDeVersion(self.ruta)
+            try:
+                with open(self.ruta, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except FileNotFoundError:
+                data = _copia_vacia()
+            cambio(data)
+            return self._escribir(data)
+
+    def guardar_todo(self, data, version_esperada=None):
+        with self._lock:
+            if version_esperada is not None and version_esperada != self.version():
+                raise ConflictoDeVersion(self.ruta)
+            return self._escribir(data)
+
+    def guardar_receta(self, receta, id_anterior=None, version_esperada=None):
+        return self._modificar(self._cambio_guardar_receta(receta, id_anterior), version_esperada)
+
+    def eliminar_receta(self, receta_id, version_esperada=None):
+        return self._modificar(self._cambio_eliminar_receta(receta_id), version_esperada)
+
+    def guardar_recetas(self, recetas, version_esperada=None):
+        """Inserta o reemplaza (por ID) muchas recetas con una sola escritura."""
+        return self._modificar(self._cambio_guardar_recetas(recetas), version_esperada)
+
+    def guardar_ingredientes(self, ingredientes, eliminar=(), version_esperada=None):
+        return self._modificar(self._cambio_guardar_ingredientes(ingredientes, eliminar), version_esperada)
+
+    def aplicar_lote(self, operaciones, version_esperada=None):
+        """Aplica varias operaciones ``(nombre, args, kwargs)`` con una sola lectura y escritura.
+
+        Devuelve ``(version, errores)``, donde ``errores[i]`` es el ValueError
+        de la operación ``i`` o None; una operación rechazada no impide las demás.
+        """
+        cambios = [getattr(self, f'_cambio_{nombre}')(*args, **kwargs) for nombre, args, kwargs in operaciones]
+        errores = [None] * len(cambios)
+
+        def cambio(data):
+            for i, c in enumerate(cambios):
+                try:
+                    c(data)
+                except ValueError as e:
+                    errores[i] = e
+        return self._modificar(cambio, version_esperada), errores
+
+    # Cada operación como función que modifica el dict del catálogo.
+
+    @staticmethod
+    def _cambio_guardar_todo(nuevo):
+        def cambio(data):
+            data.clear()
+            data.update(nuevo)
+        return cambio
+
+    @staticmethod
+    def _cambio_guardar_receta(receta, id_anterior=None):
+        def cambio(data):
+            recetas = data['recetas']
+            buscado = id_anterior if id_anterior is not None else receta['id']
+            _verificar_id_libre(recetas, receta['id'], buscado)
+            for i, r in enumerate(recetas):
+                if r['id'] == buscado:
+                    recetas[i] = receta
+                    return
+            recetas.append(receta)
+        return cambio
+
+    @staticmethod
+    def _cambio_guardar_recetas(nuevas):
+        def cambio(data):
+            recetas = data['recetas']
+            posiciones = {r['id']: i for i, r in enumerate(recetas)}
+            for receta in nuevas:
+                posicion = posiciones.get(receta['id'])
+                if posicion is None:
+                    posiciones[receta['id']] = len(recetas)
+                    recetas.append(receta)
+                else:
+                    recetas[posicion] = receta
+        return cambio
+
+    @staticmethod
+    def _cambio_eliminar_receta(receta_id):
+        def cambio(data):
+            data['recetas'] = [r for r in data['recetas'] if r['id'] != receta_id]
+        return cambio
+
+    @staticmethod
+    def _cambio_guardar_ingredientes(ingredientes, eliminar=()):
+        def cambio(data):
+            for nombre in eliminar:
+                data['ingredientes_globales'].pop(nombre, None)
+            data['ingredientes_globales'].update(ingredientes)
+        return cambio
+
+    def eliminar_ingredientes(self, nombres, version_esperada=None):
+        return self.guardar_ingredientes({}, eliminar=nombres, version_esperada=version_esperada)
+
+
+# --- BACKEND SQLITE ---
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    clave TEXT PRIMARY KEY,
+    valor TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ingredientes (
+    nombre TEXT PRIMARY KEY,
+    unidad_base TEXT,
+    costo_por_unidad REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS recetas (
+    id TEXT PRIMARY KEY,
+    posicion INTEGER NOT NULL,
+    nombre TEXT,
+    imagen TEXT,
+    cantidad_base NUMERIC,
+    unidad_base TEXT,
+    pasos TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS receta_ingredientes (
+    receta_id TEXT NOT NULL REFERENCES recetas(id) ON DELETE CASCADE,
+    posicion INTEGER NOT NULL,
+    nombre TEXT NOT NULL,
+    cantidad NUMERIC NOT NULL,
+    PRIMARY KEY (receta_id, posicion)
+);
+CREATE INDEX IF NOT EXISTS idx_receta_ingredientes_nombre ON receta_ingredientes(nombre);
+INSERT OR IGNORE INTO meta (clave, valor) VALUES ('version', '0');
+"""
+
+
+class AlmacenSQLite:
+    """Guarda el catálogo en SQLite, una fila por receta, línea e ingrediente."""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        con = self._conectar()
+        try:
+            con.executescript(_ESQUEMA)
+        finally:
+            con.close()
+
+    def _conectar(self):
+        con = sqlite3.connect(self.ruta, timeout=30, isolation_level=None)
+        con.execute("PRAGMA foreign_keys = ON")
+        con.execute("PRAGMA journal_mode = WAL")
+        return con
+
+    def version(self):
+        con = self._conectar()
+        try:
+            return con.execute("SELECT valor FROM meta WHERE clave = 'version'").fetchone()[0]
+        finally:
+            con.close()
+
+    def cargar(self):
+        """Devuelve ``(data, version)`` leídos en una misma transacción."""
+        con = self._conectar()
+        try:
+            con.execute("BEGIN")
+            version = con.execute("SELECT valor FROM meta WHERE clave = 'version'").fetchone()[0]
+            ingredientes = {
+                nombre: {"unidad_base": unidad, "costo_por_unidad": costo}
+                for nombre, unidad, costo in con.execute(
+                    "SELECT nombre, unidad_base, costo_por_unidad FROM ingredientes ORDER BY rowid")
+            }
+            lineas = {}
+            for receta_id, nombre, cantidad in con.execute(
+                    "SELECT receta_id, nombre, cantidad FROM receta_ingredientes ORDER BY receta_id, posicion"):
+                lineas.setdefault(receta_id, []).append({"nombre": nombre, "cantidad": cantidad})
+            recetas = [
+                {
+                    "id": receta_id,
+                    "nombre": nombre,
+                    "imagen": imagen,
+                    "cantidad_base": cantidad_base,
+                    "unidad_base": unidad_base,
+                    "ingredientes": lineas.get(receta_id, []),
+                    "pasos": json.loads(pasos),
+                }
+                for receta_id, nombre, imagen, cantidad_base, unidad_base, pasos in con.execute(
+                    "SELECT id, nombre, imagen, cantidad_base, unidad_base, pasos FROM recetas ORDER BY posicion")
+            ]
+            con.execute("COMMIT")
+        finally:
+            con.close()
+        return {"ingredientes_globales": ingredientes, "recetas": recetas}, version
+
+    def _transaccion(self, cambio, version_esperada):
+        """Ejecuta ``cambio(con)`` en una transacción exclusiva y sube la versión."""
+        con = self._conectar()
+        try:
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                actual = con.execute("SELECT valor FROM meta WHERE clave = 'version'").fetchone()[0]
+                if version_esperada is not None and version_esperada != actual:
+                    raise ConflictoDeVersion(self.ruta)
+                cambio(con)
+                nueva = str(int(actual) + 1)
+                con.execute("UPDATE meta SET valor = ? WHERE clave = 'version'", (nueva,))
+                con.execute("COMMIT")
+            except BaseException:
+                con.execute("ROLLBACK")
+                raise
+        finally:
+            con.close()
+        return nueva
+
+    @staticmethod
+    def _insertar_receta(con, receta, posicion):
+        con.execute(
+            "INSERT INTO recetas (id, posicion, nombre, imagen, cantidad_base, unidad_base, pasos) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (receta['id'], posicion, receta.get('nombre'), receta.get('imagen'),
+             receta.get('cantidad_base'), receta.get('unidad_base'),
+             json.dumps(receta.get('pasos', []), ensure_ascii=False)))
+        con.executemany(
+            "INSERT INTO receta_ingredientes (receta_id, posicion, nombre, cantidad) VALUES (?, ?, ?, ?)",
+            [(receta['id'], i, ing['nombre'], ing['cantidad'])
+             for i, ing in enumerate(receta.get('ingredientes', []))])
+
+    def guardar_todo(self, data, version_esperada=None):
+        return self._transaccion(self._cambio_guardar_todo(data), version_esperada)
+
+    def guardar_receta(self, receta, id_anterior=None, version_esperada=None):
+        return self._transaccion(self._cambio_guardar_receta(receta, id_anterior), version_esperada)
+
+    def guardar_recetas(self, recetas, version_esperada=None):
+        """Inserta o reemplaza (por ID) muchas recetas en una sola transacción."""
+        return self._transaccion(self._cambio_guardar_recetas(recetas), version_esperada)
+
+    def eliminar_receta(self, receta_id, version_esperada=None):
+        return self._transaccion(self._cambio_eliminar_receta(receta_id), version_esperada)
+
+    def guardar_ingredientes(self, ingredientes, eliminar=(), version_esperada=None):
+        return self._transaccion(self._cambio_guardar_ingredientes(ingredientes, eliminar), version_esperada)
+
+    def eliminar_ingredientes(self, nombres, version_esperada=None):
+        return self.guardar_ingredientes({}, eliminar=nombres, version_esperada=version_esperada)
+
+    def aplicar_lote(self, operaciones, version_esperada=None):
+        """Aplica varias operaciones ``(nombre, args, kwargs)`` en una sola transacción.
+
+        Devuelve ``(version, errores)`` como ``AlmacenJSON.aplicar_lote``; cada
+        operación va en su propio SAVEPOINT para poder descartar solo esa.
+        """
+        cambios = [getattr(self, f'_cambio_{nombre}')(*args, **kwargs) for nombre, args, kwargs in operaciones]
+        errores = [None] * len(cambios)
+
+        def cambio(con):
+            for i, c in enumerate(cambios):
+                con.execute("SAVEPOINT operacion")
+                try:
+                    c(con)
+                except ValueError as e:
+                    con.execute("ROLLBACK TO operacion")
+                    errores[i] = e
+                con.execute("RELEASE operacion")
+        return self._transaccion(cambio, version_esperada), errores
+
+    # Cada operación como función que modifica la base dentro de una transacción.
+
+    def _cambio_guardar_todo(self, data):
+        def cambio(con):
+            con.execute("DELETE FROM receta_ingredientes")
+            con.execute("DELETE FROM recetas")
+            con.execute("DELETE FROM ingredientes")
+            _upsert_ingredientes(con, data['ingredientes_globales'])
+            for posicion, receta in enumerate(data['recetas']):
+                self._insertar_receta(con, receta, posicion)
+        return cambio
+
+    def _cambio_guardar_receta(self, receta, id_anterior=None):
+        def cambio(con):
+            buscado = id_anterior if id_anterior is not None else receta['id']
+            if receta['id'] != buscado and con.execute(
+                    "SELECT 1 FROM recetas WHERE id = ?", (receta['id'],)).fetchone():
+                raise ValueError(f"Ya existe una receta con el ID '{receta['id']}'.")
+            fila = con.execute("SELECT posicion FROM recetas WHERE id = ?", (buscado,)).fetchone()
+            if fila:
+                posicion = fila[0]
+                con.execute("DELETE FROM recetas WHERE id = ?", (buscado,))
+            else:
+                posicion = con.execute("SELECT COALESCE(MAX(posicion), -1) + 1 FROM recetas").fetchone()[0]
+            self._insertar_receta(con, receta, posicion)
+        return cambio
+
+    def _cambio_guardar_recetas(self, recetas):
+        def cambio(con):
+            for receta in recetas:
+                self._cambio_guardar_receta(receta)(con)
+        return cambio
+
+    @staticmethod
+    def _cambio_eliminar_receta(receta_id):
+        def cambio(con):
+            con.execute("DELETE FROM recetas WHERE id = ?", (receta_id,))
+        return cambio
+
+    @staticmethod
+    def _cambio_guardar_ingredientes(ingredientes, eliminar=()):
+        def cambio(con):
+            con.executemany("DELETE FROM ingredientes WHERE nombre = ?", [(n,) for n in eliminar])
+            _upsert_ingredientes(con, ingredientes)
+        return cambio
+
+
+def _upsert_ingredientes(con, ingredientes):
+    con.executemany(
+        "INSERT INTO ingredientes (nombre, unidad_base, costo_por_unidad) VALUES (?, ?, ?) "
+        "ON CONFLICT(nombre) DO UPDATE SET unidad_base = excluded.unidad_base, "
+        "costo_por_unidad = excluded.costo_por_unidad",
+        [(nombre, info['unidad_base'], float(info['costo_por_unidad']))
+         for nombre, info in ingredientes.items()])
+
+
+# --- MIGRACIÓN ---
+
+def migrar_json_a_sqlite(ruta_json, ruta_db):
+    """Copia el contenido de ``ruta_json`` a una base SQLite nueva en ``ruta_db``."""
+    if os.path.exists(ruta_db):
+        raise FileExistsError(f"La base '{ruta_db}' ya existe.")
+    data, _ = AlmacenJSON(ruta_json).cargar()
+    almacen = AlmacenSQLite(ruta_db)
+    almacen.guardar_todo(data)
+    return almacen
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Migra recetas.json a una base SQLite.")
+    parser.add_argument('json', nargs='?', default='data/recetas.json')
+    parser.add_argument('db', nargs='?', default='data/recetas.db')
+    args = parser.parse_args()
+    migrar_json_a_sqlite(args.json, args.db)
+    print(f"Migración completada: {args.json} -> {args.db}")
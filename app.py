@@ -1,15 +1,38 @@
 import streamlit as st
-import json
-import pandas as pd
-from PIL import Image
-import io
+import os
+import re
+
+# pandas, NumPy, openpyxl y PIL se importan dentro de las funciones que los
+# usan: el menú (la primera pantalla de cada sesión) no los necesita.
+from almacenamiento import AlmacenJSON, AlmacenSQLite, ConflictoDeVersion, migrar_json_a_sqlite
+from busqueda import IndiceRecetas, normalizar
+from imagenes import miniatura
+from modelo import Catalogo
+from diagnostico import Diagnostico, etapa, evento
 
 # --- FUNCIONES AUXILIARES ---
 
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _leer_css(file_name, mtime_ns):
+    """Lee y compacta la hoja de estilos; se vuelve a leer solo si cambia su fecha."""
+    with open(file_name) as f:
+        css = re.sub(r'/\*.*?\*/', '', f.read(), flags=re.S)
+    return f"<style>{' '.join(css.split())}</style>"
+
 def local_css(file_name):
     """Carga un archivo CSS local para personalizar la app."""
-    with open(file_name) as f:
-        st.markdown(f'<style>{f.read()}</style>', unsafe_allow_html=True)
+    st.markdown(_leer_css(file_name, os.stat(file_name).st_mtime_ns), unsafe_allow_html=True)
+
+def mostrar_imagen(ruta, ancho, **kwargs):
+    """Muestra la miniatura de una receta, o un marcador si no tiene imagen.
+
+    Una ruta vacía (recetas importadas sin ``Imagen``) o un archivo local que
+    no existe harían fallar ``st.image`` y con él toda la página.
+    """
+    if not ruta or not (ruta.startswith(('http://', 'https://')) or os.path.exists(ruta)):
+        st.markdown("🧁 *Sin imagen*")
+        return
+    st.image(miniatura(ruta, ancho), **kwargs)
 
 # --- CONFIGURACIÓN ---
 st.set_page_config(
@@ -22,26 +45,286 @@ st.set_page_config(
 # --- CONSTANTES Y CONFIGURACIÓN ---
 # ¡ADVERTENCIA! Esto no es seguro para producción. Usa st.secrets para apps reales.
 ADMIN_PASSWORD = "admin123"
-DATA_FILE = 'data/recetas.json'
+DATA_FILE = os.environ.get('RECETAS_DATA_FILE', 'data/recetas.json')
+DB_FILE = os.environ.get('RECETAS_DB_FILE', 'data/recetas.db')
+THUMB_WIDTH_MENU = 400
+THUMB_WIDTH_DETALLE = 500
+MENU_PAGE_SIZES = [9, 18, 36, 72]
+PRECIOS_PAGE_SIZES = [25, 50, 100, 200]
+# Backend de almacenamiento: 'json' (archivo único) o 'sqlite' (por registro).
+STORAGE_BACKEND = os.environ.get('RECETAS_BACKEND', 'json')
+# Vigilar cambios hechos fuera de la app (edición manual del JSON, otro proceso).
+VIGILAR_CAMBIOS = os.environ.get('RECETAS_VIGILAR', '0') == '1'
+INTERVALO_VIGILANCIA = 2  # segundos
+# Medición de tiempos por rerun y por etapa (panel de diagnóstico y log).
+DIAGNOSTICO = os.environ.get('RECETAS_DIAGNOSTICO', '0') == '1'
+# Además, perfil de cProfile de los reruns más lentos (añade sobrecarga).
+PERFILAR = os.environ.get('RECETAS_PERFILAR', '0') == '1'
+DIAGNOSTICO_LOG = '.cache/diagnostico/reruns.jsonl'
+EXPORTACIONES_DIR = '.cache/exportaciones'
+# Historial de precios de solo anexado (ver historial.py).
+HISTORIAL_DIR = os.environ.get('RECETAS_HISTORIAL_DIR', 'data/historial_precios')
+# Escritura diferida: los guardados se encolan y un hilo los agrupa y los
+# escribe en segundo plano, sin bloquear la interfaz.
+ESCRITURA_DIFERIDA = os.environ.get('RECETAS_ESCRITURA_DIFERIDA', '0') == '1'
+VENTANA_ESCRITURA = 0.5  # segundos durante los que se juntan guardados
 
 # --- FUNCIONES DE MANEJO DE DATOS ---
-@st.cache_data(ttl=60) # Se actualiza cada 60 segundos para permitir cambios
-def load_data():
-    """Carga los datos desde el archivo JSON."""
-    try:
-        with open(DATA_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        st.error(f"El archivo '{DATA_FILE}' no fue encontrado.")
-        return {"ingredientes_globales": {}, "recetas": []}
-
-def save_data(data):
-    """Guarda los datos en el archivo JSON."""
-    with st.spinner('Guardando cambios...'):
-        with open(DATA_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
-        st.cache_data.clear()
-        st.toast("✅ ¡Cambios guardados con éxito!", icon="success")
+@st.cache_resource
+def get_storage():
+    """Devuelve el backend de almacenamiento configurado (uno por proceso)."""
+    if STORAGE_BACKEND == 'sqlite':
+        if not os.path.exists(DB_FILE) and os.path.exists(DATA_FILE):
+            almacen = migrar_json_a_sqlite(DATA_FILE, DB_FILE)
+        else:
+            almacen = AlmacenSQLite(DB_FILE)
+    else:
+        almacen = AlmacenJSON(DATA_FILE)
+    if ESCRITURA_DIFERIDA:
+        from escritura import EscrituraDiferida
+        return EscrituraDiferida(almacen, ventana=VENTANA_ESCRITURA)
+    return almacen
+
+@st.cache_resource
+def _catalogo():
+    return Catalogo()
+
+def load_data(version):
+    """Devuelve el catálogo en memoria (compartido entre sesiones) y su versión.
+
+    Solo se vuelve a leer del almacenamiento cuando ``version`` (ver
+    ``get_storage().version()``) no coincide con la del catálogo; las
+    escrituras de la app lo mantienen al día de forma incremental.
+    """
+    catalogo = _catalogo()
+    evento('catalogo', 'hit' if catalogo.al_dia(version) else 'miss')
+    if not catalogo.al_dia(version):
+        try:
+            data, version = get_storage().cargar()
+        except FileNotFoundError:
+            st.error(f"El archivo '{DATA_FILE}' no fue encontrado.")
+            return Catalogo(), None
+        catalogo.reconstruir(data, version)
+    return catalogo, catalogo.version
+
+def _al_dia(recurso, catalogo, nombre):
+    """Devuelve ``recurso`` (un ``Versionado``), reconstruyéndolo solo si cambió la versión de los datos."""
+    if recurso.al_dia(catalogo.version):
+        evento(nombre, 'hit')
+    else:
+        evento(nombre, 'miss')
+        with etapa(f'{nombre}.reconstruir'):
+            recurso.reconstruir(catalogo, catalogo.version)
+    return recurso
+
+@st.cache_resource
+def _indice_busqueda():
+    return IndiceRecetas()
+
+def get_search_index(catalogo):
+    """Devuelve el índice de búsqueda al día con ``catalogo``."""
+    return _al_dia(_indice_busqueda(), catalogo, 'indice')
+
+@st.cache_resource
+def _motor_costos():
+    from costos import MotorCostos
+    return MotorCostos()
+
+def get_cost_engine(catalogo):
+    """Devuelve el motor de costos al día con ``catalogo``."""
+    return _al_dia(_motor_costos(), catalogo, 'motor')
+
+@st.cache_resource
+def _historial():
+    from historial import HistorialPrecios
+    return HistorialPrecios(HISTORIAL_DIR)
+
+def get_historial(catalogo):
+    """Devuelve el historial de precios, conciliado con los precios del catálogo.
+
+    Los precios que cambiaron desde la última conciliación (guardados de la
+    app o cambios externos) se registran con la fecha actual.
+    """
+    historial = _historial()
+    if catalogo.version is not None and historial.version != catalogo.version:
+        with etapa('historial.conciliar'):
+            historial.conciliar(catalogo.ingredientes, catalogo.version)
+    return historial
+
+@st.cache_resource
+def get_diagnostico():
+    """Historial, log y perfiles de los reruns (uno por proceso)."""
+    return Diagnostico(DIAGNOSTICO_LOG)
+
+def _iniciar_edicion(edicion, objeto=None):
+    """Recuerda la versión de los datos con la que empieza la edición ``edicion``.
+
+    Si la edición ya estaba en curso sobre el mismo ``objeto`` (p. ej. el ID de
+    la receta) se conserva la versión original. Es la versión que se compara al
+    guardar, así que un cambio de otro administrador hecho mientras tanto no se
+    pisa.
+    """
+    ediciones = st.session_state.setdefault('ediciones', {})
+    if edicion not in ediciones or ediciones[edicion][0] != objeto:
+        ediciones[edicion] = (objeto, st.session_state.data_version)
+
+def _terminar_edicion(edicion):
+    """Olvida la edición ``edicion`` (al guardar o cancelar)."""
+    st.session_state.setdefault('ediciones', {}).pop(edicion, None)
+
+def _confirmar_cambios(edicion, operacion, *args, actualizar_catalogo=None, actualizar_indice=None,
+                       actualizar_motor=None, **kwargs):
+    """Ejecuta una escritura con control optimista de versión.
+
+    Se compara con la versión de los datos al empezar la edición ``edicion``
+    (ver ``_iniciar_edicion``), no con la del rerun actual. Devuelve True si se
+    guardó. Si otro administrador guardó antes, no pisa sus cambios: muestra un
+    error, termina la edición y fuerza la recarga de los datos. Las funciones
+    ``actualizar_catalogo``, ``actualizar_indice`` y ``actualizar_motor``
+    reciben el catálogo en memoria, el índice de búsqueda y el motor de costos
+    para aplicarles el mismo cambio de forma incremental; si se omiten, se
+    asume que el cambio no los afecta.
+    """
+    version_anterior = st.session_state.ediciones[edicion][1]
+    with st.spinner('Guardando cambios...'), etapa('guardado'):
+        try:
+            nueva_version = operacion(*args, version_esperada=version_anterior, **kwargs)
+        except ConflictoDeVersion:
+            _terminar_edicion(edicion)
+            st.error("Otro administrador modificó los datos mientras editabas. Revisa los cambios y vuelve a intentarlo.")
+            return False
+        except ValueError as e:
+            st.error(str(e))
+            return False
+        _terminar_edicion(edicion)
+        st.session_state.data_version = nueva_version
+        _catalogo().sincronizar(version_anterior, nueva_version, actualizar_catalogo)
+        _indice_busqueda().sincronizar(version_anterior, nueva_version, actualizar_indice)
+        _motor_costos().sincronizar(version_anterior, nueva_version, actualizar_motor)
+        if ESCRITURA_DIFERIDA:
+            # El resultado real lo informa ``estado_escrituras`` cuando el
+            # hilo de escritura termine.
+            st.session_state.setdefault('escrituras_pendientes', []).append(nueva_version)
+            st.toast("Cambios en cola para guardar...", icon="⏳")
+        else:
+            st.toast("¡Cambios guardados con éxito!", icon="✅")
+        return True
+
+def save_receta(edicion, receta, id_anterior=None):
+    """Inserta o actualiza una sola receta."""
+    return _confirmar_cambios(edicion, get_storage().guardar_receta, receta, id_anterior=id_anterior,
+                              actualizar_catalogo=lambda catalogo: catalogo.guardar_receta(receta, id_anterior),
+                              actualizar_indice=lambda indice: indice.actualizar(receta, id_anterior),
+                              actualizar_motor=lambda motor: motor.actualizar_receta(receta, id_anterior))
+
+def save_recetas(edicion, recetas):
+    """Inserta o reemplaza muchas recetas (importación en lote) en una sola escritura."""
+    return _confirmar_cambios(edicion, get_storage().guardar_recetas, recetas,
+                              actualizar_catalogo=lambda catalogo: catalogo.guardar_recetas(recetas),
+                              actualizar_indice=lambda indice: indice.actualizar_recetas(recetas),
+                              actualizar_motor=lambda motor: motor.actualizar_recetas(recetas))
+
+def delete_receta(edicion, receta_id):
+    """Elimina una sola receta."""
+    return _confirmar_cambios(edicion, get_storage().eliminar_receta, receta_id,
+                              actualizar_catalogo=lambda catalogo: catalogo.eliminar_receta(receta_id),
+                              actualizar_indice=lambda indice: indice.eliminar(receta_id),
+                              actualizar_motor=lambda motor: motor.eliminar_receta(receta_id))
+
+def save_ingredientes(edicion, ingredientes, eliminar=()):
+    """Inserta o actualiza ingredientes globales y borra ``eliminar``, en una sola escritura.
+
+    El motor de costos solo recalcula las recetas que usan esos ingredientes,
+    y los precios nuevos quedan en el historial con la fecha del guardado.
+    """
+    # Antes de escribir, el historial debe tener los precios que se van a reemplazar.
+    get_historial(_catalogo())
+    if _confirmar_cambios(edicion, get_storage().guardar_ingredientes, ingredientes, eliminar=eliminar,
+                          actualizar_catalogo=lambda c: c.guardar_ingredientes(ingredientes, eliminar),
+                          actualizar_motor=lambda motor: motor.actualizar_ingredientes(ingredientes, eliminar)):
+        get_historial(_catalogo())
+        return True
+    return False
+
+def delete_ingredientes(edicion, nombres):
+    """Elimina los ingredientes globales indicados."""
+    return save_ingredientes(edicion, {}, eliminar=nombres)
+
+def save_precios(edicion, catalogo, ingredientes, eliminar=()):
+    """Guarda cambios de precios y deja en sesión el reporte de recetas afectadas."""
+    motor = get_cost_engine(catalogo)
+    with etapa('costos'):
+        reporte = motor.impacto_precios(ingredientes, eliminar)
+    if save_ingredientes(edicion, ingredientes, eliminar):
+        st.session_state.reporte_impacto = reporte
+        return True
+    return False
+
+def show_reporte_impacto():
+    """Muestra las recetas cuyo costo cambió con el último guardado de precios."""
+    reporte = st.session_state.get('reporte_impacto')
+    if reporte is None:
+        return
+    with st.expander(f"📊 Recetas afectadas por el cambio de precios: {len(reporte)}", expanded=True):
+        if reporte.empty:
+            st.write("Ningún costo de receta cambió.")
+        else:
+            st.dataframe(
+                reporte.rename(columns={
+                    'id': 'ID', 'nombre': 'Receta', 'costo_anterior': 'Costo Anterior', 'costo_nuevo': 'Costo Nuevo',
+                    'diferencia': 'Diferencia', 'variacion_pct': 'Variación %'
+                }),
+                use_container_width=True,
+                hide_index=True,
+                column_config={
+                    'Costo Anterior': st.column_config.NumberColumn(format="$%.2f"),
+                    'Costo Nuevo': st.column_config.NumberColumn(format="$%.2f"),
+                    'Diferencia': st.column_config.NumberColumn(format="$%.2f"),
+                    'Variación %': st.column_config.NumberColumn(format="%.1f%%"),
+                }
+            )
+        if st.button("Cerrar reporte"):
+            del st.session_state.reporte_impacto
+            st.rerun()
+
+@st.fragment(run_every=INTERVALO_VIGILANCIA)
+def vigilar_cambios_externos():
+    """Relanza la app en cuanto los datos cambian fuera de ella.
+
+    Solo compara la versión del almacenamiento (un ``stat`` del archivo o una
+    consulta a SQLite); los datos se vuelven a leer únicamente si cambió.
+    """
+    if get_storage().version() != st.session_state.get('data_version'):
+        st.rerun()
+
+@st.fragment(run_every=1)
+def estado_escrituras():
+    """Informa a la sesión del resultado de sus escrituras diferidas.
+
+    Si alguna falló, el catálogo en memoria ya no coincide con el disco: se
+    muestra el error y se relanza la app para volver a cargarlo.
+    """
+    pendientes = st.session_state.get('escrituras_pendientes')
+    if not pendientes:
+        return
+    storage = get_storage()
+    fallidas = []
+    for version in list(pendientes):
+        terminada, error = storage.resultado(version)
+        if not terminada:
+            continue
+        pendientes.remove(version)
+        if error is None:
+            st.toast("¡Cambios guardados con éxito!", icon="✅")
+        else:
+            fallidas.append(error)
+    if fallidas:
+        st.session_state.errores_escritura = [
+            "Otro proceso modificó los datos; tus últimos cambios no se guardaron." if isinstance(e, ConflictoDeVersion)
+            else f"No se pudieron guardar los cambios: {e}"
+            for e in fallidas
+        ]
+        st.rerun(scope='app')
 
 # --- FUNCIONES DE PÁGINA ---
 
@@ -64,44 +347,98 @@ def show_login():
             st.session_state.current_page = 'menu'
             st.rerun()
 
-def page_menu(data):
-    """Muestra el menú principal de recetas con búsqueda."""
+def _reiniciar_paginacion():
+    """Vuelve a la primera página del menú (al cambiar la búsqueda o el tamaño)."""
+    st.session_state.menu_pagina = 0
+    st.session_state.menu_visibles = st.session_state.get('menu_tam_pagina', MENU_PAGE_SIZES[0])
+
+def _cambiar_pagina(delta):
+    st.session_state.menu_pagina += delta
+
+def _mostrar_mas():
+    st.session_state.menu_visibles += st.session_state.menu_tam_pagina
+
+def page_menu(catalogo):
+    """Muestra el menú principal de recetas con búsqueda y paginación."""
     st.title("🧁 Mis Recetas de Repostería")
     
     # --- Barra de búsqueda ---
-    search_query = st.text_input("🔍 Buscar recetas...", placeholder="Escribe el nombre de una receta...").lower()
+    search_query = st.text_input("🔍 Buscar recetas...", placeholder="Nombre, ingrediente o paso...",
+                                 key="menu_busqueda", on_change=_reiniciar_paginacion).strip()
     
-    # Filtrar recetas basadas en la búsqueda
+    # Filtrar recetas con el índice de búsqueda (ordenadas por relevancia). Solo
+    # se cuentan las coincidencias: más abajo se ordenan las del tramo visible.
+    recetas = catalogo.recetas
     if search_query:
-        recetas_filtradas = [r for r in data['recetas'] if search_query in r['nombre'].lower()]
+        indice = get_search_index(catalogo)
+        with etapa('busqueda'):
+            total = indice.contar(search_query)
     else:
-        recetas_filtradas = data['recetas']
+        total = len(recetas)
 
-    if not recetas_filtradas:
-        st.warning("No se encontraron recetas con ese nombre.")
+    if not total:
+        st.warning("No se encontraron recetas para esa búsqueda.")
         return
 
-    st.write(f"Mostrando {len(recetas_filtradas)} receta(s).")
+    # --- Controles de paginación ---
+    col_modo, col_tam = st.columns(2)
+    with col_modo:
+        modo = st.radio("Vista", ["Páginas", "Desplazamiento continuo"], horizontal=True,
+                        key="menu_modo", on_change=_reiniciar_paginacion)
+    with col_tam:
+        tam_pagina = st.selectbox("Recetas por página", MENU_PAGE_SIZES,
+                                  key="menu_tam_pagina", on_change=_reiniciar_paginacion)
+    if 'menu_pagina' not in st.session_state:
+        _reiniciar_paginacion()
+
+    if modo == "Páginas":
+        num_paginas = -(-total // tam_pagina)
+        pagina = min(st.session_state.menu_pagina, num_paginas - 1)
+        st.session_state.menu_pagina = pagina
+        inicio, fin = pagina * tam_pagina, min((pagina + 1) * tam_pagina, total)
+    else:
+        inicio, fin = 0, min(st.session_state.menu_visibles, total)
+
+    if search_query:
+        with etapa('busqueda'):
+            visibles = catalogo.recetas_por_ids(indice.buscar(search_query, limite=fin)[inicio:])
+    else:
+        visibles = recetas[inicio:fin]
+
+    # Solo se construyen los widgets (y se cargan las imágenes) del tramo visible.
+    st.write(f"Mostrando {inicio + 1}–{fin} de {total} receta(s).")
     
     cols = st.columns(3)
-    for i, receta in enumerate(recetas_filtradas):
+    for i, receta in enumerate(visibles):
         with cols[i % 3]:
             with st.container(border=True):
-                st.image(receta['imagen'], use_column_width='always')
-                st.subheader(receta['nombre'])
-                if st.button("Ver Receta", key=f"btn_{receta['id']}"):
-                    st.session_state.receta_seleccionada_id = receta['id']
+                mostrar_imagen(receta.imagen, THUMB_WIDTH_MENU, use_container_width=True)
+                st.subheader(receta.nombre)
+                if st.button("Ver Receta", key=f"btn_{receta.id}"):
+                    st.session_state.receta_seleccionada_id = receta.id
                     st.session_state.current_page = 'detalle'
                     st.rerun()
 
-def page_detalle(data):
+    if modo == "Páginas":
+        if num_paginas > 1:
+            col_ant, col_info, col_sig = st.columns([1, 2, 1])
+            with col_ant:
+                st.button("← Anterior", disabled=pagina == 0, on_click=_cambiar_pagina, args=(-1,))
+            with col_info:
+                st.write(f"Página {pagina + 1} de {num_paginas}")
+            with col_sig:
+                st.button("Siguiente →", disabled=pagina >= num_paginas - 1, on_click=_cambiar_pagina, args=(1,))
+    elif fin < total:
+        st.button(f"Mostrar más ({total - fin} restantes)", on_click=_mostrar_mas, use_container_width=True)
+
+def page_detalle(catalogo):
     """Muestra el detalle de una receta con edición mejorada y opción de borrar."""
-    receta_index = next((i for i, r in enumerate(data['recetas']) if r['id'] == st.session_state.receta_seleccionada_id), None)
-    if receta_index is None:
+    import pandas as pd
+
+    receta = catalogo.receta(st.session_state.receta_seleccionada_id)
+    if receta is None:
         st.error("Receta no encontrada.")
         return
-    
-    receta = data['recetas'][receta_index]
 
     if st.button("← Volver al menú"):
         st.session_state.current_page = 'menu'
@@ -110,25 +447,27 @@ def page_detalle(data):
     # --- MODO EDICIÓN ---
     if st.session_state.get('logged_in', False):
         edit_mode = st.sidebar.toggle("📝 Modo Edición", key="edit_toggle")
-        if edit_mode:
-            st.header(f"Editando: {receta['nombre']}")
+        if not edit_mode:
+            _terminar_edicion('receta')
+        else:
+            _iniciar_edicion('receta', receta.id)
+            st.header(f"Editando: {receta.nombre}")
             
             # Botón de eliminar receta
             if st.button("🗑️ Eliminar Esta Receta", type="secondary"):
-                st.session_state.receta_a_borrar_index = receta_index
+                st.session_state.receta_a_borrar_id = receta.id
                 st.session_state.mostrar_confirmacion_borrado = True
             
             # Confirmación de borrado
             if st.session_state.get('mostrar_confirmacion_borrado', False):
-                st.error(f"¿Estás seguro de que quieres eliminar '{receta['nombre']}'? Esta acción no se puede deshacer.")
+                st.error(f"¿Estás seguro de que quieres eliminar '{receta.nombre}'? Esta acción no se puede deshacer.")
                 col1, col2 = st.columns(2)
                 with col1:
                     if st.button("Sí, eliminar", type="primary"):
-                        data['recetas'].pop(receta_index)
-                        save_data(data)
-                        st.session_state.current_page = 'menu'
-                        st.session_state.mostrar_confirmacion_borrado = False
-                        st.rerun()
+                        if delete_receta('receta', receta.id):
+                            st.session_state.current_page = 'menu'
+                            st.session_state.mostrar_confirmacion_borrado = False
+                            st.rerun()
                 with col2:
                     if st.button("Cancelar"):
                         st.session_state.mostrar_confirmacion_borrado = False
@@ -137,8 +476,17 @@ def page_detalle(data):
 
             # Botones para añadir campos (FUERA del formulario)
             st.subheader("Ingredientes")
+            lineas = catalogo.lineas(receta)
+            opciones = catalogo.nombres_ingredientes
+            # Un ingrediente que ya no está en la lista global se ofrece igual:
+            # elegir otro en su lugar cambiaría la receta sin que nadie lo pida.
+            faltantes = list(dict.fromkeys(n for n, _ in lineas if catalogo.posicion_ingrediente(n) is None))
+            if faltantes:
+                st.warning("Ingredientes que no están en la lista global (se conservan, pero sin costo): "
+                           + ", ".join(faltantes))
+                opciones = list(opciones) + faltantes
             if 'num_ingredientes_edit' not in st.session_state:
-                st.session_state.num_ingredientes_edit = len(receta['ingredientes'])
+                st.session_state.num_ingredientes_edit = len(lineas)
             
             if st.button("➕ Añadir Ingrediente", key="add_edit_ing"):
                 st.session_state.num_ingredientes_edit += 1
@@ -146,24 +494,27 @@ def page_detalle(data):
 
             # Formulario de edición
             with st.form("edit_recipe_form"):
-                nuevo_id = st.text_input("ID Único", value=receta['id'])
-                nuevo_nombre = st.text_input("Nombre de la receta", value=receta['nombre'])
-                nueva_imagen = st.text_input("Ruta de la imagen", value=receta['imagen'])
+                nuevo_id = st.text_input("ID Único", value=receta.id)
+                nuevo_nombre = st.text_input("Nombre de la receta", value=receta.nombre)
+                nueva_imagen = st.text_input("Ruta de la imagen", value=receta.imagen)
                 
                 ingredientes_editados = []
                 for i in range(st.session_state.num_ingredientes_edit):
                     cols = st.columns([3, 1])
                     with cols[0]:
-                        current_nombre = receta['ingredientes'][i]['nombre'] if i < len(receta['ingredientes']) else list(data['ingredientes_globales'].keys())[0]
-                        nombre_ing = st.selectbox("Ingrediente", options=list(data['ingredientes_globales'].keys()), index=list(data['ingredientes_globales'].keys()).index(current_nombre), key=f"ing_name_{i}")
+                        current_nombre = lineas[i][0] if i < len(lineas) else None
+                        posicion = catalogo.posicion_ingrediente(current_nombre)
+                        if posicion is None and current_nombre in faltantes:
+                            posicion = len(opciones) - len(faltantes) + faltantes.index(current_nombre)
+                        nombre_ing = st.selectbox("Ingrediente", options=opciones, index=posicion or 0, key=f"ing_name_{i}")
                     with cols[1]:
-                        current_cantidad = receta['ingredientes'][i]['cantidad'] if i < len(receta['ingredientes']) else 1.0
+                        current_cantidad = lineas[i][1] if i < len(lineas) else 1.0
                         cantidad_ing = st.number_input("Cantidad", value=current_cantidad, key=f"ing_cant_{i}")
                     ingredientes_editados.append({"nombre": nombre_ing, "cantidad": cantidad_ing})
                 
                 st.subheader("Pasos")
                 if 'num_pasos_edit' not in st.session_state:
-                    st.session_state.num_pasos_edit = len(receta['pasos'])
+                    st.session_state.num_pasos_edit = len(receta.pasos)
 
                 if st.button("➕ Añadir Paso", key="add_edit_step"):
                     st.session_state.num_pasos_edit += 1
@@ -171,86 +522,177 @@ def page_detalle(data):
 
                 pasos_editados = []
                 for i in range(st.session_state.num_pasos_edit):
-                    paso_texto = receta['pasos'][i] if i < len(receta['pasos']) else ""
+                    paso_texto = receta.pasos[i] if i < len(receta.pasos) else ""
                     pasos_editados.append(st.text_area(f"Paso {i+1}", value=paso_texto, key=f"paso_{i}"))
                 
                 submitted = st.form_submit_button("💾 Guardar Cambios en esta Receta")
                 if submitted:
-                    receta['id'] = nuevo_id
-                    receta['nombre'] = nuevo_nombre
-                    receta['imagen'] = nueva_imagen
-                    receta['ingredientes'] = ingredientes_editados
-                    receta['pasos'] = pasos_editados
-                    save_data(data)
-                    del st.session_state.num_ingredientes_edit
-                    del st.session_state.num_pasos_edit
-                    st.rerun()
+                    receta_editada = dict(catalogo.a_dict(receta), id=nuevo_id, nombre=nuevo_nombre, imagen=nueva_imagen,
+                                          ingredientes=ingredientes_editados, pasos=pasos_editados)
+                    if save_receta('receta', receta_editada, id_anterior=receta.id):
+                        st.session_state.receta_seleccionada_id = nuevo_id
+                        del st.session_state.num_ingredientes_edit
+                        del st.session_state.num_pasos_edit
+                        st.rerun()
             return
 
     # --- MODO VISUALIZACIÓN NORMAL ---
-    st.title(receta['nombre'])
-    st.image(receta['imagen'], width=500)
+    st.title(receta.nombre)
+    mostrar_imagen(receta.imagen, THUMB_WIDTH_DETALLE, width=THUMB_WIDTH_DETALLE)
 
     st.header("🥄 Calculadora de Ingredientes y Costos")
-    cantidad_deseada = st.number_input(f"¿Cuántas {receta['unidad_base']} quieres hacer?", min_value=1, value=receta['cantidad_base'], step=1)
-    factor_escala = cantidad_deseada / receta['cantidad_base']
-
-    datos_tabla = []
-    costo_total_receta = 0.0
-    for ing_receta in receta['ingredientes']:
-        info_global = data['ingredientes_globales'].get(ing_receta['nombre'])
-        if not info_global:
-            st.error(f"No se encontró información global para el ingrediente: {ing_receta['nombre']}")
-            continue
-        
-        cantidad_final = ing_receta['cantidad'] * factor_escala
-        costo_total_ingrediente = cantidad_final * info_global['costo_por_unidad']
-        costo_total_receta += costo_total_ingrediente
-        
-        datos_tabla.append({
-            "Ingrediente": ing_receta['nombre'],
-            "Cantidad": f"{round(cantidad_final, 2)} {info_global['unidad_base']}",
-            "Costo Unitario": f"${info_global['costo_por_unidad']:.4f}/{info_global['unidad_base']}",
-            "Costo Total": f"${round(costo_total_ingrediente, 2):.2f}"
-        })
-    
-    df = pd.DataFrame(datos_tabla)
+    # number_input exige el mismo tipo en todos sus argumentos; la base puede ser decimal.
+    if float(receta.cantidad_base).is_integer():
+        minimo, base, paso = 1, max(1, int(receta.cantidad_base)), 1
+    else:
+        minimo, base, paso = 0.01, max(0.01, float(receta.cantidad_base)), 1.0
+    cantidad_deseada = st.number_input(f"¿Cuántas {receta.unidad_base} quieres hacer?", min_value=minimo, value=base, step=paso)
+
+    motor = get_cost_engine(catalogo)
+    with etapa('costos'):
+        desglose = motor.desglose(receta.id, cantidad_deseada)
+    for nombre in desglose.loc[~desglose['encontrado'], 'ingrediente']:
+        st.error(f"No se encontró información global para el ingrediente: {nombre}")
+    desglose = desglose[desglose['encontrado']]
+    costo_total_receta = desglose['costo_total'].sum()
+
+    df = pd.DataFrame({
+        "Ingrediente": desglose['ingrediente'],
+        "Cantidad": desglose['cantidad'].round(2).astype(str) + " " + desglose['unidad'],
+        "Costo Unitario": "$" + desglose['costo_unitario'].map("{:.4f}".format) + "/" + desglose['unidad'],
+        "Costo Total": "$" + desglose['costo_total'].round(2).map("{:.2f}".format),
+    })
     st.dataframe(df, use_container_width=True, hide_index=True)
     st.metric(label="💰 Costo Total de la Receta", value=f"${round(costo_total_receta, 2):.2f}")
 
     st.header("📝 Instrucciones")
-    for i, paso in enumerate(receta['pasos']):
+    for i, paso in enumerate(receta.pasos):
         st.write(f"{i+1}. {paso}")
 
-def page_editar_precios(data):
-    """Página para editar los precios de los ingredientes globales."""
+def _tabla_precios(catalogo):
+    """Tabla de ingredientes con el nombre normalizado para filtrar, una vez por versión."""
+    guardada = st.session_state.get('precios_tabla')
+    if guardada is None or guardada[0] != catalogo.version:
+        tabla = catalogo.tabla_ingredientes()
+        tabla['clave'] = tabla['nombre'].map(normalizar)
+        guardada = st.session_state.precios_tabla = (catalogo.version, tabla)
+    return guardada[1]
+
+def _reiniciar_pagina_precios():
+    st.session_state.precios_pagina = 1
+
+def _descartar_precios():
+    st.session_state.precios_pendientes = {}
+    _terminar_edicion('precios')
+    st.session_state.precios_generacion = st.session_state.get('precios_generacion', 0) + 1
+
+def page_editar_precios(catalogo):
+    """Página para editar los precios de los ingredientes globales.
+
+    Solo se dibuja la página visible de la tabla. Los cambios de cada página se
+    acumulan en ``precios_pendientes`` ({nombre: costo}) y se guardan juntos
+    como un único lote con las filas modificadas.
+    """
+    import pandas as pd
+
     st.title("💰 Editar Precios de Ingredientes")
     st.write("Modifica el costo por unidad base de cada ingrediente.")
-    
-    with st.form("edit_prices_form"):
-        ingredientes_editados = {}
-        for nombre, info in data['ingredientes_globales'].items():
-            cols = st.columns([2, 1, 1])
-            with cols[0]:
-                st.text(nombre)
-            with cols[1]:
-                st.text(f"({info['unidad_base']})")
-            with cols[2]:
-                nuevo_costo = st.number_input("Costo/Unidad", value=float(info['costo_por_unidad']), key=f"price_{nombre}", format="%.4f")
-                ingredientes_editados[nombre] = {
-                    "unidad_base": info['unidad_base'],
-                    "costo_por_unidad": nuevo_costo
-                }
-        
-        submitted = st.form_submit_button("Guardar Todos los Precios")
-        if submitted:
-            data['ingredientes_globales'] = ingredientes_editados
-            save_data(data)
-            st.rerun()
+    show_reporte_impacto()
+    pendientes = st.session_state.setdefault('precios_pendientes', {})
+
+    # --- Filtro, orden y paginación ---
+    col_filtro, col_orden, col_dir = st.columns([2, 1, 1])
+    with col_filtro:
+        filtro = st.text_input("🔍 Filtrar ingredientes", key="precios_filtro",
+                               on_change=_reiniciar_pagina_precios).strip()
+    with col_orden:
+        columnas_orden = {"Nombre": 'nombre', "Unidad": 'unidad_base', "Costo": 'costo_por_unidad'}
+        orden = st.selectbox("Ordenar por", list(columnas_orden), key="precios_orden")
+    with col_dir:
+        descendente = st.toggle("Descendente", key="precios_descendente")
+
+    tabla = _tabla_precios(catalogo)
+    if filtro:
+        tabla = tabla[tabla['clave'].str.contains(normalizar(filtro), regex=False)]
+    if not len(tabla):
+        st.warning("No hay ingredientes que coincidan con el filtro.")
+    else:
+        tabla = tabla.sort_values(columnas_orden[orden], ascending=not descendente, kind='stable')
+
+        col_tam, col_pag = st.columns(2)
+        with col_tam:
+            tam_pagina = st.selectbox("Filas por página", PRECIOS_PAGE_SIZES, key="precios_tam_pagina",
+                                      on_change=_reiniciar_pagina_precios)
+        num_paginas = -(-len(tabla) // tam_pagina)
+        with col_pag:
+            pagina = st.number_input(f"Página (de {num_paginas})", min_value=1, max_value=num_paginas,
+                                     value=min(st.session_state.get('precios_pagina', 1), num_paginas),
+                                     step=1)
+        st.session_state.precios_pagina = pagina
+        vista = tabla.iloc[(pagina - 1) * tam_pagina:pagina * tam_pagina]
+
+        # El editor recibe los precios guardados más los cambios pendientes de
+        # sus filas; la clave cambia con la vista, la versión y al descartar.
+        base = vista['costo_por_unidad'].to_numpy()
+        mostrado = vista[['nombre', 'unidad_base', 'costo_por_unidad']].copy()
+        mostrado['costo_por_unidad'] = vista['nombre'].map(pendientes).fillna(vista['costo_por_unidad'])
+        firma = (filtro, orden, descendente, tam_pagina, pagina)
+        clave = f"precios_editor_{catalogo.version}_{st.session_state.get('precios_generacion', 0)}_{hash(firma)}"
+        editado = st.data_editor(
+            mostrado.rename(columns={'nombre': 'Ingrediente', 'unidad_base': 'Unidad',
+                                     'costo_por_unidad': 'Costo/Unidad'}),
+            key=clave,
+            use_container_width=True,
+            hide_index=True,
+            disabled=['Ingrediente', 'Unidad'],
+            column_config={
+                'Costo/Unidad': st.column_config.NumberColumn(min_value=0.0, format="%.4f", required=True),
+            },
+        )
+        st.caption(f"Mostrando {len(vista)} de {len(tabla)} ingrediente(s).")
+
+        # Solo se comparan las filas visibles.
+        nuevos = editado['Costo/Unidad'].to_numpy(dtype=float)
+        for nombre, costo, distinto in zip(vista['nombre'], nuevos, nuevos != base):
+            if distinto:
+                pendientes[nombre] = float(costo)
+            else:
+                pendientes.pop(nombre, None)
 
-def page_crear_receta(data):
+    # --- Cambios pendientes ---
+    if not pendientes:
+        _terminar_edicion('precios')
+        st.info("No hay precios modificados.")
+        return
+    _iniciar_edicion('precios')
+    with st.expander(f"Cambios pendientes: {len(pendientes)}"):
+        st.dataframe(
+            pd.DataFrame({
+                'Ingrediente': list(pendientes),
+                'Costo Anterior': [catalogo.ingredientes[n].costo_por_unidad if n in catalogo.ingredientes else None
+                                   for n in pendientes],
+                'Costo Nuevo': list(pendientes.values()),
+            }),
+            use_container_width=True,
+            hide_index=True,
+        )
+    col_guardar, col_descartar = st.columns(2)
+    with col_guardar:
+        if st.button(f"💾 Guardar {len(pendientes)} cambio(s)", type="primary", use_container_width=True):
+            ingredientes_editados = {
+                nombre: {"unidad_base": catalogo.ingredientes[nombre].unidad_base, "costo_por_unidad": costo}
+                for nombre, costo in pendientes.items() if nombre in catalogo.ingredientes
+            }
+            if save_precios('precios', catalogo, ingredientes_editados):
+                _descartar_precios()
+                st.rerun()
+    with col_descartar:
+        st.button("Descartar cambios", on_click=_descartar_precios, use_container_width=True)
+
+def page_crear_receta(catalogo):
     """Página para crear una nueva receta desde cero."""
     st.title("➕ Crear Nueva Receta")
+    _iniciar_edicion('crear_receta')
 
     # Inicializar y manejar contadores fuera del formulario
     if 'num_ingredientes_new' not in st.session_state:
@@ -278,7 +720,7 @@ def page_crear_receta(data):
         for i in range(st.session_state.num_ingredientes_new):
             cols = st.columns([3, 1])
             with cols[0]:
-                nombre_ing = st.selectbox("Ingrediente", options=list(data['ingredientes_globales'].keys()), key=f"new_ing_name_{i}")
+                nombre_ing = st.selectbox("Ingrediente", options=catalogo.nombres_ingredientes, key=f"new_ing_name_{i}")
             with cols[1]:
                 cantidad_ing = st.number_input("Cantidad", value=100.0, key=f"new_ing_cant_{i}")
             ingredientes_nuevos.append({"nombre": nombre_ing, "cantidad": cantidad_ing})
@@ -290,7 +732,7 @@ def page_crear_receta(data):
 
         submitted = st.form_submit_button("✅ Crear Receta")
         if submitted:
-            if any(r['id'] == nuevo_id for r in data['recetas']):
+            if catalogo.existe(nuevo_id):
                 st.error(f"El ID '{nuevo_id}' ya existe. Por favor, elige otro.")
             else:
                 nueva_receta = {
@@ -302,17 +744,17 @@ def page_crear_receta(data):
                     "ingredientes": ingredientes_nuevos,
                     "pasos": pasos_nuevos
                 }
-                data['recetas'].append(nueva_receta)
-                save_data(data)
-                del st.session_state.num_ingredientes_new
-                del st.session_state.num_pasos_new
-                st.success(f"Receta '{nuevo_nombre}' creada con éxito.")
-                st.session_state.current_page = 'menu'
-                st.rerun()
+                if save_receta('crear_receta', nueva_receta):
+                    del st.session_state.num_ingredientes_new
+                    del st.session_state.num_pasos_new
+                    st.success(f"Receta '{nuevo_nombre}' creada con éxito.")
+                    st.session_state.current_page = 'menu'
+                    st.rerun()
 
-def page_gestionar_ingredientes(data):
+def page_gestionar_ingredientes(catalogo):
     """Página para añadir y eliminar ingredientes globales."""
     st.title("🛒 Gestionar Ingredientes Globales")
+    _iniciar_edicion('ingredientes')
     
     st.subheader("Añadir Nuevo Ingrediente")
     with st.form("add_ingredient_form"):
@@ -320,35 +762,35 @@ def page_gestionar_ingredientes(data):
         nueva_unidad = st.text_input("Unidad base (ej: kg, litros)")
         nuevo_costo = st.number_input("Costo por unidad", value=0.0, format="%.4f")
         if st.form_submit_button("➕ Añadir Ingrediente"):
-            if nuevo_nombre in data['ingredientes_globales']:
+            if nuevo_nombre in catalogo.ingredientes:
                 st.warning(f"El ingrediente '{nuevo_nombre}' ya existe.")
             else:
-                data['ingredientes_globales'][nuevo_nombre] = {
+                if save_ingredientes('ingredientes', {nuevo_nombre: {
                     "unidad_base": nueva_unidad,
                     "costo_por_unidad": nuevo_costo
-                }
-                save_data(data)
-                st.rerun()
+                }}):
+                    st.rerun()
 
     st.subheader("Eliminar Ingrediente")
-    ingrediente_a_borrar = st.selectbox("Selecciona un ingrediente para eliminar", options=list(data['ingredientes_globales'].keys()))
+    ingrediente_a_borrar = st.selectbox("Selecciona un ingrediente para eliminar", options=catalogo.nombres_ingredientes)
     if st.button("🗑️ Eliminar Seleccionado"):
-        if ingrediente_a_borrar:
-            del data['ingredientes_globales'][ingrediente_a_borrar]
-            save_data(data)
-            st.toast(f"Ingrediente '{ingrediente_a_borrar}' eliminado.", icon="success")
+        if ingrediente_a_borrar and delete_ingredientes('ingredientes', [ingrediente_a_borrar]):
+            st.toast(f"Ingrediente '{ingrediente_a_borrar}' eliminado.", icon="✅")
             st.rerun()
 
-def page_importar_excel(data):
-    """Página para importar y exportar ingredientes desde un archivo Excel."""
-    st.title("📊 Importar/Exportar Ingredientes con Excel")
+def page_importar_excel(catalogo):
+    """Página para importar y exportar ingredientes y el catálogo completo."""
+    import io
+
+    import pandas as pd
+    from importacion import ErrorImportacion, a_ingredientes, calcular_diferencias, leer_precios
+
+    st.title("📊 Importar/Exportar Datos")
     
     st.subheader("Exportar Ingredientes Actuales")
     if st.button("📥 Descargar Plantilla Excel"):
-        df = pd.DataFrame.from_dict(data['ingredientes_globales'], orient='index').reset_index()
-        df.rename(columns={'index': 'Nombre'}, inplace=True)
-        df = df[['Nombre', 'unidad_base', 'costo_por_unidad']]
-        df.rename(columns={'unidad_base': 'Unidad_Base', 'costo_por_unidad': 'Costo_Por_Unidad'}, inplace=True)
+        df = catalogo.tabla_ingredientes().rename(columns={
+            'nombre': 'Nombre', 'unidad_base': 'Unidad_Base', 'costo_por_unidad': 'Costo_Por_Unidad'})
         
         output = io.BytesIO()
         with pd.ExcelWriter(output, engine='openpyxl') as writer:
@@ -362,56 +804,578 @@ def page_importar_excel(data):
 
     st.divider()
     st.subheader("Importar Ingredientes desde Excel")
+    show_reporte_impacto()
     uploaded_file = st.file_uploader("Elige un archivo Excel", type="xlsx")
     
-    if uploaded_file:
+    if not uploaded_file:
+        _terminar_edicion('importacion_precios')
+    else:
+        # La lectura se hace una sola vez por archivo subido, no en cada rerun.
+        if st.session_state.get('importacion_archivo') != uploaded_file.file_id:
+            try:
+                with st.spinner("Leyendo archivo..."), etapa('importacion'):
+                    precios, errores = leer_precios(uploaded_file)
+            except ErrorImportacion as e:
+                st.error(str(e))
+                return
+            except Exception as e:
+                st.error(f"Ocurrió un error al leer el archivo: {e}")
+                return
+            st.session_state.importacion_archivo = uploaded_file.file_id
+            st.session_state.importacion_precios = precios
+            st.session_state.importacion_errores = errores
+        _iniciar_edicion('importacion_precios', uploaded_file.file_id)
+        errores = st.session_state.importacion_errores
+        clave_diferencias = (uploaded_file.file_id, st.session_state.data_version)
+        if st.session_state.get('importacion_clave_diferencias') != clave_diferencias:
+            st.session_state.importacion_diferencias = calcular_diferencias(
+                catalogo.tabla_ingredientes(), st.session_state.importacion_precios)
+            st.session_state.importacion_clave_diferencias = clave_diferencias
+        diferencias = st.session_state.importacion_diferencias
+        agregados, cambiados, eliminados = diferencias['agregados'], diferencias['cambiados'], diferencias['eliminados']
+
+        # --- Vista previa de los cambios ---
+        cols = st.columns(4)
+        cols[0].metric("Nuevos", len(agregados))
+        cols[1].metric("Precios cambiados", len(cambiados))
+        cols[2].metric("No están en el archivo", len(eliminados))
+        cols[3].metric("Filas con errores", len(errores))
+        tabs = st.tabs(["Nuevos", "Cambiados", "No están en el archivo", "Errores"])
+        with tabs[0]:
+            st.dataframe(agregados, use_container_width=True, hide_index=True)
+        with tabs[1]:
+            st.dataframe(cambiados, use_container_width=True, hide_index=True)
+        with tabs[2]:
+            st.dataframe(eliminados, use_container_width=True, hide_index=True)
+        with tabs[3]:
+            st.dataframe(errores, use_container_width=True)
+
+        eliminar = []
+        if not eliminados.empty:
+            if st.checkbox("Eliminar también los ingredientes que no están en el archivo"):
+                eliminar = list(eliminados['nombre'])
+                en_uso = get_cost_engine(catalogo).recetas_con(eliminar)
+                if en_uso:
+                    st.warning(f"{len(en_uso)} receta(s) usan ingredientes que se eliminarán y dejarán de tener costo para ellos.")
+
+        if agregados.empty and cambiados.empty and not eliminar:
+            st.info("El archivo no contiene cambios respecto a los ingredientes actuales.")
+        elif st.button("📤 Confirmar Importación"):
+            with st.spinner("Importando datos..."):
+                cambios = a_ingredientes(pd.concat([agregados, cambiados[agregados.columns]]))
+                if save_precios('importacion_precios', catalogo, cambios, eliminar):
+                    st.success("¡Ingredientes importados y guardados con éxito!")
+                    st.rerun()
+
+    st.divider()
+    exportar_catalogo(catalogo)
+    st.divider()
+    importar_recetas(catalogo)
+
+FORMATOS_EXPORTACION = {'xlsx': "Excel (.xlsx)", 'csv': "CSV (.zip)", 'parquet': "Parquet (.zip)"}
+
+@st.cache_resource
+def _proceso():
+    """Identificador de este proceso: las versiones de datos se repiten entre reinicios."""
+    import uuid
+    return uuid.uuid4().hex[:12]
+
+def _archivo_exportacion(catalogo, formato):
+    """Ruta de la exportación del catálogo en ``formato``, generándola si no existe.
+
+    El archivo se escribe en disco por bloques y se nombra con el proceso y la
+    versión de los datos, así que lo reutilizan todas las sesiones hasta el
+    próximo cambio. La versión sola no basta: la escritura diferida vuelve a
+    empezar en d0 al reiniciar y una nueva migración a SQLite repite contadores.
+    """
+    import glob
+    import tempfile
+
+    from intercambio import FORMATOS, exportar
+
+    extension = FORMATOS[formato][0]
+    ruta = os.path.join(EXPORTACIONES_DIR, f"catalogo-{formato}-{_proceso()}-{catalogo.version}{extension}")
+    if os.path.exists(ruta):
+        return ruta
+    os.makedirs(EXPORTACIONES_DIR, exist_ok=True)
+    for anterior in glob.glob(os.path.join(EXPORTACIONES_DIR, f"catalogo-{formato}-*")):
+        os.remove(anterior)
+    fd, tmp = tempfile.mkstemp(dir=EXPORTACIONES_DIR, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            exportar(catalogo, f, formato)
+        os.replace(tmp, ruta)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return ruta
+
+def exportar_catalogo(catalogo):
+    """Exporta recetas, líneas de ingredientes, pasos y costos como tablas."""
+    st.subheader("Exportar Catálogo Completo")
+    st.caption("Una tabla por hoja (Excel) o por archivo (CSV y Parquet): Recetas, Lineas, Pasos e Ingredientes, "
+               "con los costos calculados a los precios actuales. Parquet es el más rápido para catálogos grandes.")
+    import importlib.util
+
+    # Parquet necesita pyarrow; sin él, la opción no se ofrece.
+    formatos = [f for f in FORMATOS_EXPORTACION if f != 'parquet' or importlib.util.find_spec('pyarrow')]
+    formato = st.radio("Formato", formatos, format_func=FORMATOS_EXPORTACION.get,
+                       horizontal=True, key="exportacion_formato")
+    if st.button("📦 Generar exportación"):
         try:
-            df_importado = pd.read_excel(uploaded_file, sheet_name='Ingredientes')
-            required_columns = ['Nombre', 'Unidad_Base', 'Costo_Por_Unidad']
-            if not all(col in df_importado.columns for col in required_columns):
-                st.error(f"El archivo Excel debe tener las columnas: {', '.join(required_columns)}")
-            else:
-                st.dataframe(df_importado)
-                if st.button("📤 Confirmar Importación y Sobrescribir Precios"):
-                    with st.spinner("Importando datos..."):
-                        nuevos_ingredientes = {}
-                        for index, row in df_importado.iterrows():
-                            nombre = row['Nombre']
-                            if pd.isna(nombre):
-                                continue
-                            nuevos_ingredientes[nombre] = {
-                                "unidad_base": row['Unidad_Base'],
-                                "costo_por_unidad": float(row['Costo_Por_Unidad'])
-                            }
-                        data['ingredientes_globales'] = nuevos_ingredientes
-                        save_data(data)
-                        st.success("¡Ingredientes importados y guardados con éxito!")
-                        st.rerun()
+            with st.spinner("Exportando catálogo..."), etapa('exportacion'):
+                st.session_state.exportacion = (formato, catalogo.version, _archivo_exportacion(catalogo, formato))
+        except OSError as e:
+            st.error(f"No se pudo generar la exportación: {e}")
+    exportacion = st.session_state.get('exportacion')
+    if exportacion and exportacion[:2] == (formato, catalogo.version) and os.path.exists(exportacion[2]):
+        from intercambio import FORMATOS
+
+        extension, mime = FORMATOS[formato]
+        with open(exportacion[2], 'rb') as f:
+            st.download_button(f"Descargar catalogo{extension}", f, file_name=f"catalogo_{formato}{extension}",
+                               mime=mime)
+
+def importar_recetas(catalogo):
+    """Importa en lote recetas exportadas con ``exportar_catalogo`` (cualquier formato)."""
+    from importacion import ErrorImportacion
+    from intercambio import detectar_formato, leer_recetas
+
+    st.subheader("Importar Recetas")
+    st.caption("Las recetas con un ID existente se reemplazan y las demás se añaden. "
+               "Los costos del archivo se ignoran: se calculan con los precios actuales.")
+    archivo = st.file_uploader("Elige un archivo exportado", type=["xlsx", "zip"], key="importacion_recetas_archivo")
+    if not archivo:
+        _terminar_edicion('importacion_recetas')
+        return
+    if st.session_state.get('importacion_recetas_id') != archivo.file_id:
+        try:
+            with st.spinner("Leyendo archivo..."), etapa('importacion'):
+                recetas, errores = leer_recetas(archivo, detectar_formato(archivo.name, archivo))
+        except ErrorImportacion as e:
+            st.error(str(e))
+            return
         except Exception as e:
             st.error(f"Ocurrió un error al leer el archivo: {e}")
+            return
+        st.session_state.importacion_recetas_id = archivo.file_id
+        st.session_state.importacion_recetas = (recetas, errores)
+    recetas, errores = st.session_state.importacion_recetas
+    _iniciar_edicion('importacion_recetas', archivo.file_id)
+
+    nuevas = sum(not catalogo.existe(r['id']) for r in recetas)
+    sin_precio = sorted({ing['nombre'] for r in recetas for ing in r['ingredientes']} - set(catalogo.ingredientes))
+    cols = st.columns(4)
+    cols[0].metric("Recetas nuevas", nuevas)
+    cols[1].metric("Recetas a reemplazar", len(recetas) - nuevas)
+    cols[2].metric("Ingredientes sin precio", len(sin_precio))
+    cols[3].metric("Filas con errores", len(errores))
+    if sin_precio:
+        with st.expander("Ingredientes sin información global (su costo contará como 0)"):
+            st.write(", ".join(sin_precio))
+    if not errores.empty:
+        with st.expander("Filas con errores"):
+            st.dataframe(errores, use_container_width=True, hide_index=True)
+
+    if not recetas:
+        st.info("El archivo no contiene recetas válidas.")
+    elif st.button("📤 Confirmar Importación de Recetas"):
+        with st.spinner("Importando recetas..."):
+            if save_recetas('importacion_recetas', recetas):
+                st.success(f"¡{len(recetas)} recetas importadas con éxito!")
+                del st.session_state.importacion_recetas_id
+                st.rerun()
+
+def _vaciar_plan():
+    import pandas as pd
+
+    st.session_state.plan_produccion = pd.DataFrame({'ID': pd.Series(dtype=object), 'Cantidad': pd.Series(dtype=float)})
+    st.session_state.plan_generacion = st.session_state.get('plan_generacion', 0) + 1
+
+def page_plan_produccion(catalogo):
+    """Página para planificar la producción de varias recetas a la vez.
+
+    Suma lo que hace falta de cada ingrediente para todo el plan, agrupado por
+    unidad, con el motor de costos (una sola operación para todo el plan).
+    """
+    import io
+
+    import pandas as pd
+    
+    st.title("🧾 Plan de Producción")
+    st.write("Indica cuánto quieres producir de cada receta y obtén el total de ingredientes y su costo.")
+    if 'plan_produccion' not in st.session_state:
+        _vaciar_plan()
+
+    # --- Recetas del plan ---
+    st.subheader("Recetas del plan")
+    plan = st.data_editor(
+        st.session_state.plan_produccion,
+        key=f"plan_editor_{st.session_state.plan_generacion}",
+        num_rows="dynamic",
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            'ID': st.column_config.TextColumn("ID de receta", required=True),
+            'Cantidad': st.column_config.NumberColumn(min_value=0.0, required=True),
+        },
+    )
+
+    with st.expander("➕ Añadir receta al plan", expanded=plan.empty):
+        consulta = st.text_input("Buscar receta", key="plan_busqueda").strip()
+        if consulta:
+            opciones = get_search_index(catalogo).buscar(consulta, limite=50)
+        else:
+            opciones = [r.id for r in catalogo.recetas[:50]]
+        col_receta, col_cantidad = st.columns([3, 1])
+        with col_receta:
+            receta_id = st.selectbox("Receta", opciones, format_func=lambda r: catalogo.receta(r).nombre)
+        with col_cantidad:
+            cantidad = st.number_input("Cantidad", min_value=1, step=1,
+                                       value=max(1, int(catalogo.receta(receta_id).cantidad_base)) if receta_id else 1)
+        if st.button("Añadir", disabled=receta_id is None):
+            fila = pd.DataFrame({'ID': [receta_id], 'Cantidad': [float(cantidad)]})
+            st.session_state.plan_produccion = pd.concat([plan, fila], ignore_index=True)
+            st.session_state.plan_generacion += 1
+            st.rerun()
+
+    plan = plan.dropna()
+    plan = plan[plan['Cantidad'] > 0]
+    desconocidas = [r for r in plan['ID'] if not catalogo.existe(r)]
+    if desconocidas:
+        st.warning(f"Se ignoran recetas que no existen: {', '.join(map(str, desconocidas))}")
+    plan = plan[~plan['ID'].isin(desconocidas)]
+    if plan.empty:
+        st.info("El plan está vacío.")
+        return
+    st.button("Vaciar plan", on_click=_vaciar_plan)
+
+    # --- Requerimientos ---
+    pares = list(zip(plan['ID'], plan['Cantidad']))
+    motor = get_cost_engine(catalogo)
+    with etapa('costos'):
+        requerimientos = motor.plan_produccion(pares)
+        costos_recetas = motor.costos_lote(pares)
+    recetas = catalogo.recetas_por_ids(plan['ID'])
+    resumen_recetas = pd.DataFrame({
+        'ID': plan['ID'].to_numpy(),
+        'Receta': [r.nombre for r in recetas],
+        'Cantidad': plan['Cantidad'].to_numpy(),
+        'Unidad': [r.unidad_base for r in recetas],
+        'Costo': costos_recetas,
+    })
+    por_unidad = (requerimientos[requerimientos['encontrado']]
+                  .groupby('unidad', sort=True)
+                  .agg(ingredientes=('ingrediente', 'size'), cantidad=('cantidad', 'sum'), costo=('costo_total', 'sum'))
+                  .reset_index())
+
+    cols = st.columns(3)
+    cols[0].metric("Recetas", len(resumen_recetas))
+    cols[1].metric("Ingredientes", len(requerimientos))
+    cols[2].metric("💰 Costo Total", f"${resumen_recetas['Costo'].sum():.2f}")
+    for nombre in requerimientos.loc[~requerimientos['encontrado'], 'ingrediente']:
+        st.error(f"No se encontró información global para el ingrediente: {nombre}")
+
+    st.subheader("Ingredientes necesarios")
+    hoja_ingredientes = requerimientos[requerimientos['encontrado']].drop(columns='encontrado').rename(columns={
+        'ingrediente': 'Ingrediente', 'unidad': 'Unidad', 'cantidad': 'Cantidad',
+        'costo_unitario': 'Costo Unitario', 'costo_total': 'Costo Total'
+    })
+    st.dataframe(
+        hoja_ingredientes,
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            'Cantidad': st.column_config.NumberColumn(format="%.2f"),
+            'Costo Unitario': st.column_config.NumberColumn(format="$%.4f"),
+            'Costo Total': st.column_config.NumberColumn(format="$%.2f"),
+        }
+    )
+    st.subheader("Totales por unidad")
+    hoja_unidades = por_unidad.rename(columns={'unidad': 'Unidad', 'ingredientes': 'Ingredientes',
+                                               'cantidad': 'Cantidad', 'costo': 'Costo'})
+    st.dataframe(
+        hoja_unidades,
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            'Cantidad': st.column_config.NumberColumn(format="%.2f"),
+            'Costo': st.column_config.NumberColumn(format="$%.2f"),
+        }
+    )
+
+    if st.button("📥 Exportar plan a Excel"):
+        output = io.BytesIO()
+        with pd.ExcelWriter(output, engine='openpyxl') as writer:
+            resumen_recetas.to_excel(writer, sheet_name='Recetas', index=False)
+            hoja_ingredientes.to_excel(writer, sheet_name='Ingredientes', index=False)
+            hoja_unidades.to_excel(writer, sheet_name='Por Unidad', index=False)
+        st.download_button(
+            label="Descargar plan_produccion.xlsx",
+            data=output.getvalue(),
+            file_name="plan_produccion.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        )
+
+def page_costos(catalogo):
+    """Página con el costo de todas las recetas del catálogo."""
+    st.title("📈 Costos del Catálogo")
+    st.write("Costo de cada receta a su cantidad base, calculado para todo el catálogo a la vez.")
+
+    motor = get_cost_engine(catalogo)
+    with etapa('costos'):
+        df = motor.catalogo()
+    if df.empty:
+        st.info("No hay recetas en el catálogo.")
+        return
+    st.metric(label="Recetas", value=len(df))
+    st.dataframe(
+        df.rename(columns={
+            'id': 'ID', 'nombre': 'Receta', 'cantidad_base': 'Cantidad Base', 'unidad_base': 'Unidad',
+            'costo_total': 'Costo Total', 'costo_por_unidad': 'Costo por Unidad'
+        }),
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            'Costo Total': st.column_config.NumberColumn(format="$%.2f"),
+            'Costo por Unidad': st.column_config.NumberColumn(format="$%.4f"),
+        }
+    )
+
+
+FRECUENCIAS_HISTORIAL = {'D': "Diaria", 'W': "Semanal", 'MS': "Mensual"}
+
+def _fin_del_dia(fechas):
+    """Último segundo de cada día: "a la fecha X" incluye los cambios de ese día."""
+    import pandas as pd
+
+    return pd.DatetimeIndex(fechas).normalize() + pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
+
+def page_historial_precios(catalogo):
+    """Página con costos a cualquier fecha y su evolución, según el historial de precios."""
+    import datetime
+
+    import numpy as np
+    import pandas as pd
+
+    st.title("🕰️ Historial de Precios")
+    historial = get_historial(catalogo)
+    motor = get_cost_engine(catalogo)
+    if historial.inicio is None:
+        st.info("Todavía no hay precios registrados.")
+        return
+    inicio = historial.inicio.date()
+    hoy = max(datetime.date.today(), inicio)
+    cols = st.columns(3)
+    cols[0].metric("Registros", len(historial))
+    cols[1].metric("Ingredientes", len(historial.nombres))
+    cols[2].metric("Desde", inicio.strftime('%d/%m/%Y'))
+
+    # --- Costos a una fecha ---
+    st.subheader("Costos a una fecha")
+    fecha = st.date_input("Fecha", value=hoy, min_value=inicio, max_value=hoy, key="historial_fecha")
+    with etapa('costos'):
+        en_fecha = motor.costos_en(historial, _fin_del_dia([fecha])[0])
+        actuales = motor.catalogo()['costo_total'].to_numpy()
+    anterior = en_fecha['costo_total'].to_numpy()
+    comparacion = pd.DataFrame({
+        'ID': en_fecha['id'],
+        'Receta': en_fecha['nombre'],
+        'Costo a la Fecha': anterior,
+        'Costo Actual': actuales,
+        'Diferencia': actuales - anterior,
+        'Variación %': np.divide(100 * (actuales - anterior), anterior, out=np.full_like(anterior, np.nan),
+                                 where=anterior != 0),
+    })
+    st.dataframe(
+        comparacion.sort_values('Diferencia', key=lambda d: -d.abs(), na_position='last'),
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            'Costo a la Fecha': st.column_config.NumberColumn(format="$%.2f"),
+            'Costo Actual': st.column_config.NumberColumn(format="$%.2f"),
+            'Diferencia': st.column_config.NumberColumn(format="$%.2f"),
+            'Variación %': st.column_config.NumberColumn(format="%.1f%%"),
+        }
+    )
+
+    # --- Tendencia ---
+    st.subheader("Evolución de costos")
+    consulta = st.text_input("Buscar receta", key="historial_busqueda").strip()
+    if consulta:
+        opciones = [None] + get_search_index(catalogo).buscar(consulta, limite=50)
+    else:
+        opciones = [None] + [r.id for r in catalogo.recetas[:50]]
+    receta_id = st.selectbox("Receta", opciones, key="historial_receta",
+                             format_func=lambda r: "Todo el catálogo" if r is None else catalogo.receta(r).nombre)
+    periodo = st.date_input("Periodo", value=(max(inicio, hoy - datetime.timedelta(days=365)), hoy),
+                            min_value=inicio, max_value=hoy, key="historial_periodo")
+    frecuencia = st.radio("Frecuencia", list(FRECUENCIAS_HISTORIAL), index=1, horizontal=True,
+                          format_func=FRECUENCIAS_HISTORIAL.get, key="historial_frecuencia")
+    if len(periodo) != 2:
+        st.info("Elige la fecha final del periodo.")
+        return
+    # El periodo siempre incluye sus dos extremos.
+    dias = pd.date_range(periodo[0], periodo[1], freq=frecuencia).union(pd.DatetimeIndex(list(periodo)))
+    with etapa('costos'):
+        tendencia = motor.tendencia(historial, _fin_del_dia(dias), None if receta_id is None else [receta_id])
+    tendencia.index = dias
+
+    if receta_id is not None:
+        serie = tendencia[receta_id]
+        cols = st.columns(3)
+        cols[0].metric("Costo inicial", f"${serie.iloc[0]:.2f}")
+        cols[1].metric("Costo final", f"${serie.iloc[-1]:.2f}", delta=f"{serie.iloc[-1] - serie.iloc[0]:+.2f}",
+                       delta_color="inverse")
+        cols[2].metric("Máximo", f"${serie.max():.2f}")
+        st.line_chart(serie.rename("Costo"))
+    else:
+        total = tendencia.sum(axis=1, min_count=1)
+        st.caption("Suma del costo base de todas las recetas en cada fecha.")
+        st.line_chart(total.rename("Costo del catálogo"))
+        variacion = pd.DataFrame({
+            'ID': tendencia.columns,
+            'Receta': [r.nombre for r in catalogo.recetas_por_ids(tendencia.columns)],
+            'Costo Inicial': tendencia.iloc[0].to_numpy(),
+            'Costo Final': tendencia.iloc[-1].to_numpy(),
+        })
+        variacion['Variación %'] = (100 * (variacion['Costo Final'] - variacion['Costo Inicial'])
+                                    / variacion['Costo Inicial'].where(variacion['Costo Inicial'] != 0))
+        st.write("Recetas ordenadas por variación en el periodo:")
+        st.dataframe(
+            variacion.sort_values('Variación %', ascending=False, na_position='last'),
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                'Costo Inicial': st.column_config.NumberColumn(format="$%.2f"),
+                'Costo Final': st.column_config.NumberColumn(format="$%.2f"),
+                'Variación %': st.column_config.NumberColumn(format="%.1f%%"),
+            }
+        )
+
+    # --- Precio de un ingrediente ---
+    st.subheader("Precio de un ingrediente")
+    ingrediente = st.selectbox("Ingrediente", sorted(historial.nombres), key="historial_ingrediente")
+    if ingrediente:
+        serie = historial.serie(ingrediente).set_index('fecha')['costo_por_unidad']
+        st.line_chart(serie.rename("Costo por unidad"))
+        if serie.isna().any():
+            st.caption("Los huecos son periodos en que el ingrediente estaba eliminado.")
+
+def page_diagnostico():
+    """Panel de administración con los tiempos de los últimos reruns."""
+    import pandas as pd
+
+    st.title("🩺 Diagnóstico de Rendimiento")
+    if not DIAGNOSTICO:
+        st.info("La medición está desactivada. Inicia la app con RECETAS_DIAGNOSTICO=1 "
+                "(y RECETAS_PERFILAR=1 para guardar perfiles de cProfile de los reruns más lentos).")
+        return
+    diagnostico = get_diagnostico()
+    registros = diagnostico.registros()
+    if not registros:
+        st.info("Todavía no hay reruns medidos.")
+        return
+    st.caption(f"Log: {diagnostico.ruta_log}")
+
+    df = pd.DataFrame({
+        'fecha': [r['fecha'] for r in registros],
+        'pagina': [r['pagina'] for r in registros],
+        'total': [r['total'] for r in registros],
+    })
+    etapas = pd.DataFrame([r['etapas'] for r in registros])
+    ultimo = registros[-1]
+    cols = st.columns(3)
+    cols[0].metric("Reruns medidos", len(registros))
+    cols[1].metric("Último rerun", f"{ultimo['total'] * 1000:.0f} ms", help=f"Página: {ultimo['pagina']}")
+    cols[2].metric("p95", f"{df['total'].quantile(0.95) * 1000:.0f} ms")
+
+    def percentiles(columnas):
+        return pd.DataFrame({
+            'reruns': columnas.count(),
+            'media_ms': columnas.mean() * 1000,
+            'p50_ms': columnas.quantile(0.5) * 1000,
+            'p95_ms': columnas.quantile(0.95) * 1000,
+            'max_ms': columnas.max() * 1000,
+        })
+
+    st.subheader("Por etapa")
+    st.caption("'render' incluye las etapas de la página (búsqueda, costos, guardado...).")
+    st.dataframe(percentiles(etapas).sort_values('media_ms', ascending=False), use_container_width=True)
+
+    st.subheader("Por página")
+    por_pagina = df.groupby('pagina')['total']
+    st.dataframe(pd.DataFrame({
+        'reruns': por_pagina.size(),
+        'media_ms': por_pagina.mean() * 1000,
+        'p95_ms': por_pagina.quantile(0.95) * 1000,
+        'max_ms': por_pagina.max() * 1000,
+    }), use_container_width=True)
+
+    st.subheader("Cachés")
+    eventos = pd.DataFrame([r['eventos'] for r in registros])
+    if not eventos.empty:
+        st.dataframe(eventos.apply(lambda c: c.value_counts()).fillna(0).astype(int).T, use_container_width=True)
+
+    st.subheader("Últimos reruns")
+    st.dataframe(pd.concat([df, etapas * 1000], axis=1).iloc[::-1].head(50), use_container_width=True,
+                 hide_index=True)
+
+    if diagnostico.perfiles:
+        st.subheader("Perfiles de los reruns más lentos")
+        perfiles = list(diagnostico.perfiles)
+        elegido = st.selectbox("Perfil", perfiles,
+                               format_func=lambda p: f"{p['duracion'] * 1000:.0f} ms · {p['pagina']} · {p['fecha']}")
+        st.code(Diagnostico.resumen_perfil(elegido['ruta']))
+        with open(elegido['ruta'], 'rb') as f:
+            st.download_button("Descargar .prof", f.read(), file_name=os.path.basename(elegido['ruta']))
+    elif PERFILAR:
+        st.info("Todavía no hay perfiles guardados.")
 
 
 # --- LÓGICA PRINCIPAL ---
 def main():
     # Cargar el CSS personalizado
-    local_css("styles.css")
+    with etapa('css'):
+        local_css("styles.css")
 
     # Inicializar estado de la sesión
     if 'logged_in' not in st.session_state:
         st.session_state.logged_in = False
     if 'current_page' not in st.session_state:
         st.session_state.current_page = 'menu'
+    # Streamlit descarta el estado de los widgets que no se dibujan; al
+    # reasignarlo se conservan la búsqueda y la paginación al volver al menú.
+    for clave in ('menu_busqueda', 'menu_modo', 'menu_tam_pagina'):
+        if clave in st.session_state:
+            st.session_state[clave] = st.session_state[clave]
 
-    data = load_data()
+    with etapa('datos'):
+        catalogo, st.session_state.data_version = load_data(get_storage().version())
+    # Las ediciones en curso pertenecen a la página en la que empezaron.
+    if st.session_state.get('pagina_ediciones') != st.session_state.current_page:
+        st.session_state.ediciones = {}
+        st.session_state.pagina_ediciones = st.session_state.current_page
+    if VIGILAR_CAMBIOS:
+        vigilar_cambios_externos()
+    if ESCRITURA_DIFERIDA:
+        for mensaje in st.session_state.pop('errores_escritura', []):
+            st.error(mensaje)
+        if st.session_state.get('escrituras_pendientes'):
+            estado_escrituras()
 
     # --- BARRA LATERAL ---
-    with st.sidebar:
+    with st.sidebar, etapa('barra_lateral'):
         show_login()
 
         st.title("Navegación")
         if st.button("📖 Ver Recetas", use_container_width=True):
             st.session_state.current_page = 'menu'
             st.rerun()
+        if st.button("🧾 Plan de Producción", use_container_width=True):
+            st.session_state.current_page = 'plan_produccion'
+            st.rerun()
         
         if st.session_state.logged_in:
             st.divider()
@@ -425,23 +1389,45 @@ def main():
             if st.button("🛒 Gestionar Ingredientes", use_container_width=True):
                 st.session_state.current_page = 'gestionar_ingredientes'
                 st.rerun()
-            if st.button("📊 Importar/Exportar Excel", use_container_width=True):
+            if st.button("📊 Importar/Exportar Datos", use_container_width=True):
                 st.session_state.current_page = 'importar_excel'
                 st.rerun()
+            if st.button("📈 Costos del Catálogo", use_container_width=True):
+                st.session_state.current_page = 'costos'
+                st.rerun()
+            if st.button("🕰️ Historial de Precios", use_container_width=True):
+                st.session_state.current_page = 'historial_precios'
+                st.rerun()
+            if st.button("🩺 Diagnóstico", use_container_width=True):
+                st.session_state.current_page = 'diagnostico'
+                st.rerun()
 
     # --- CONTENIDO PRINCIPAL ---
-    if st.session_state.current_page == 'menu':
-        page_menu(data)
-    elif st.session_state.current_page == 'detalle':
-        page_detalle(data)
-    elif st.session_state.current_page == 'editar_precios':
-        page_editar_precios(data)
-    elif st.session_state.current_page == 'crear_receta':
-        page_crear_receta(data)
-    elif st.session_state.current_page == 'gestionar_ingredientes':
-        page_gestionar_ingredientes(data)
-    elif st.session_state.current_page == 'importar_excel':
-        page_importar_excel(data)
+    with etapa('render'):
+        if st.session_state.current_page == 'menu':
+            page_menu(catalogo)
+        elif st.session_state.current_page == 'detalle':
+            page_detalle(catalogo)
+        elif st.session_state.current_page == 'editar_precios':
+            page_editar_precios(catalogo)
+        elif st.session_state.current_page == 'crear_receta':
+            page_crear_receta(catalogo)
+        elif st.session_state.current_page == 'gestionar_ingredientes':
+            page_gestionar_ingredientes(catalogo)
+        elif st.session_state.current_page == 'importar_excel':
+            page_importar_excel(catalogo)
+        elif st.session_state.current_page == 'costos':
+            page_costos(catalogo)
+        elif st.session_state.current_page == 'historial_precios':
+            page_historial_precios(catalogo)
+        elif st.session_state.current_page == 'plan_produccion':
+            page_plan_produccion(catalogo)
+        elif st.session_state.current_page == 'diagnostico' and st.session_state.logged_in:
+            page_diagnostico()
 
 if __name__ == '__main__':
-    main()
+    if DIAGNOSTICO:
+        with get_diagnostico().rerun(st.session_state.get('current_page', 'menu'), perfilar=PERFILAR):
+            main()
+    else:
+        main()
@@ -0,0 +1,387 @@
+"""Benchmarks de los caminos de datos de la app a distintas escalas de catálogo.
+
+Para cada escala genera un catálogo sintético y mide:
+
+* almacenamiento: carga y guardado (completo y por receta) con JSON y SQLite;
+* modelo en memoria: conversión a ``Catalogo``, búsqueda de una receta por ID
+  y la búsqueda lineal anterior como referencia;
+* búsqueda del menú: construcción del índice, consultas y el filtro lineal
+  anterior como referencia;
+* costos: compilación del motor, desglose de una receta, catálogo completo,
+  un lote de recetas y un plan de producción;
+* importación de Excel: lectura de la lista de precios y cálculo de diferencias;
+* exportación del catálogo completo en cada formato (tiempo y tamaño del
+  archivo) y la importación de recetas de vuelta;
+* historial de precios: años de cambios diarios (``--historial-dias``),
+  apertura, precios y costos a una fecha y evolución de costos de una receta
+  y del catálogo completo;
+* la app completa, sin navegador, con ``AppTest`` de Streamlit: primera carga,
+  rerun del menú, búsqueda, detalle de receta y exportación de ingredientes;
+* arranque en frío: un intérprete nuevo que importa Streamlit y dibuja el menú
+  por primera vez, comparado con ``PRESUPUESTO``.
+
+Los resultados (segundos, mínimo y mediana de varias repeticiones) se escriben
+en JSON para compararlos entre versiones:
+
+    python benchmarks/bench.py --escalas 1000,10000 --salida antes.json
+    python benchmarks/bench.py --escalas 1000,10000 --salida despues.json --comparar antes.json
+
+Con ``--presupuesto`` el proceso termina con error si el arranque excede el
+presupuesto en alguna escala hasta ``ESCALA_PRESUPUESTO``.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generar_catalogo import generar_catalogo, guardar_catalogo, guardar_lista_precios  # noqa: E402
+
+# Segundos máximos de arranque en frío para catálogos de hasta ESCALA_PRESUPUESTO recetas.
+PRESUPUESTO = {
+    'arranque.proceso': 3.0,  # intérprete nuevo hasta terminar el primer render
+    'arranque.primer_render': 1.2,  # primer render del menú (primera pintura)
+    'arranque.rerun': 0.3,
+}
+ESCALA_PRESUPUESTO = 10000
+# Módulos que el código del menú no debería importar. Solo cuenta quien los
+# importa primero desde el repositorio: st.image, por ejemplo, carga NumPy por
+# su cuenta.
+MODULOS_DIFERIDOS = ['numpy', 'pandas', 'openpyxl', 'costos', 'importacion', 'historial']
+
+_SCRIPT_ARRANQUE = """
+import json, os, sys, time
+raiz = os.path.dirname(os.path.abspath(sys.argv[1]))
+vigilados = set(sys.argv[2:])
+importados = []
+
+class Vigia:
+    def find_spec(self, nombre, ruta=None, destino=None):
+        if nombre in vigilados:
+            marco = sys._getframe(1)
+            while marco.f_code.co_filename.startswith('<'):  # importlib
+                marco = marco.f_back
+            if marco.f_code.co_filename.startswith(raiz + os.sep):
+                importados.append(nombre)
+        return None
+
+sys.meta_path.insert(0, Vigia())
+inicio = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+importar = time.perf_counter() - inicio
+at = AppTest.from_file(sys.argv[1], default_timeout=3600)
+t = time.perf_counter()
+at.run()
+primer_render = time.perf_counter() - t
+t = time.perf_counter()
+at.run()
+rerun = time.perf_counter() - t
+print(json.dumps({
+    'importar_streamlit': importar,
+    'primer_render': primer_render,
+    'rerun': rerun,
+    'error': str(at.exception[0].value) if at.exception else None,
+    'modulos': importados,
+}))
+"""
+
+CONSULTAS = ["chocolate", "tarta fresa", "azucar", "hornear", "pistacho 12", "inexistente"]
+
+
+def medir(fn, repeticiones=3):
+    """Ejecuta ``fn`` varias veces y devuelve el mínimo y la mediana en segundos."""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        fn()
+        tiempos.append(time.perf_counter() - inicio)
+    return {'min': min(tiempos), 'mediana': statistics.median(tiempos), 'repeticiones': repeticiones}
+
+
+def bench_almacenamiento(data, directorio, r, repeticiones):
+    from almacenamiento import AlmacenJSON, AlmacenSQLite, migrar_json_a_sqlite
+
+    ruta = os.path.join(directorio, 'recetas.json')
+    almacen = AlmacenJSON(ruta)
+    receta = dict(data['recetas'][len(data['recetas']) // 2], nombre="Receta editada")
+    ingrediente = {next(iter(data['ingredientes_globales'])): {"unidad_base": "gramos", "costo_por_unidad": 0.123}}
+    r['load_data.json'] = medir(almacen.cargar, repeticiones)
+    r['save_data.json.completo'] = medir(lambda: almacen.guardar_todo(data), repeticiones)
+    r['save_data.json.receta'] = medir(lambda: almacen.guardar_receta(receta), repeticiones)
+
+    ruta_db = os.path.join(directorio, 'recetas.db')
+    r['save_data.sqlite.migrar'] = medir(lambda: migrar_json_a_sqlite(ruta, ruta_db), 1)
+    sqlite = AlmacenSQLite(ruta_db)
+    r['load_data.sqlite'] = medir(sqlite.cargar, repeticiones)
+    r['save_data.sqlite.receta'] = medir(lambda: sqlite.guardar_receta(receta), repeticiones)
+    r['save_data.sqlite.ingrediente'] = medir(lambda: sqlite.guardar_ingredientes(ingrediente), repeticiones)
+
+
+def bench_modelo(data, r, repeticiones):
+    from modelo import Catalogo
+
+    catalogo = Catalogo()
+    r['modelo.construir'] = medir(lambda: catalogo.reconstruir(data, 1), 1)
+    receta_id = data['recetas'][-1]['id']
+    r['modelo.receta_por_id'] = medir(lambda: catalogo.receta(receta_id), repeticiones)
+    r['modelo.receta_lineal'] = medir(
+        lambda: next(x for x in data['recetas'] if x['id'] == receta_id), repeticiones)
+    return catalogo
+
+
+def bench_busqueda(catalogo, data, r, repeticiones):
+    from busqueda import IndiceRecetas
+
+    indice = IndiceRecetas()
+    r['busqueda.indexar'] = medir(lambda: indice.reconstruir(catalogo, 1), 1)
+    for consulta in CONSULTAS:
+        r[f'busqueda.consulta[{consulta}]'] = medir(lambda: indice.buscar(consulta), repeticiones)
+        # Lo que hace el menú: contar y ordenar solo hasta la página visible.
+        r[f'busqueda.pagina[{consulta}]'] = medir(
+            lambda: (indice.contar(consulta), indice.buscar(consulta, limite=18)[9:]), repeticiones)
+        r[f'busqueda.lineal[{consulta}]'] = medir(
+            lambda: [x for x in data['recetas'] if consulta in x['nombre'].lower()], repeticiones)
+
+
+def bench_costos(catalogo, data, r, repeticiones):
+    from costos import MotorCostos
+
+    motor = MotorCostos()
+    r['costos.compilar'] = medir(lambda: motor.reconstruir(catalogo, 1), 1)
+    receta_id = data['recetas'][0]['id']
+    r['costos.desglose'] = medir(lambda: motor.desglose(receta_id, 10), repeticiones)
+    r['costos.catalogo'] = medir(motor.catalogo, repeticiones)
+    pares = [(x['id'], 10) for x in data['recetas'][:1000]]
+    r['costos.lote_1000'] = medir(lambda: motor.costos_lote(pares), repeticiones)
+    r['costos.plan_produccion_500'] = medir(lambda: motor.plan_produccion(pares[:500]), repeticiones)
+    cambios = {n: {"unidad_base": i['unidad_base'], "costo_por_unidad": i['costo_por_unidad'] * 1.1}
+               for n, i in list(data['ingredientes_globales'].items())[:10]}
+    r['costos.impacto_10_precios'] = medir(lambda: motor.impacto_precios(cambios), repeticiones)
+
+
+def bench_importacion(catalogo, data, directorio, filas, r, repeticiones):
+    from importacion import calcular_diferencias, leer_precios
+
+    ruta = os.path.join(directorio, 'precios.xlsx')
+    guardar_lista_precios(data['ingredientes_globales'], filas, ruta)
+    r['importar.filas'] = filas
+    r['importar.leer'] = medir(lambda: leer_precios(ruta), 1)
+    precios, _ = leer_precios(ruta)
+    r['importar.diferencias'] = medir(lambda: calcular_diferencias(catalogo.tabla_ingredientes(), precios),
+                                      repeticiones)
+
+
+def bench_intercambio(catalogo, directorio, r):
+    from intercambio import FORMATOS, exportar, leer_recetas
+
+    for formato, (extension, _) in FORMATOS.items():
+        ruta = os.path.join(directorio, f'catalogo-{formato}{extension}')
+        r[f'intercambio.exportar.{formato}'] = medir(lambda: exportar(catalogo, ruta, formato), 1)
+        r[f'intercambio.bytes.{formato}'] = os.path.getsize(ruta)
+        r[f'intercambio.importar.{formato}'] = medir(lambda: leer_recetas(ruta, formato), 1)
+
+
+def bench_historial(catalogo, directorio, dias, r, repeticiones):
+    """Historial sintético: cada día cambia el precio de un 10 % de los ingredientes."""
+    import random
+
+    import pandas as pd
+    from costos import MotorCostos
+    from historial import HistorialPrecios
+
+    ruta = os.path.join(directorio, 'historial')
+    historial = HistorialPrecios(ruta)
+    nombres = list(catalogo.ingredientes)
+    fechas = pd.date_range('2020-01-01', periods=dias, freq='D')
+    aleatorio = random.Random(0)
+
+    def registrar():
+        historial.conciliar(catalogo.ingredientes, 1, fecha=fechas[0])
+        for fecha in fechas[1:]:
+            historial.registrar({n: catalogo.ingredientes[n].costo_por_unidad * aleatorio.uniform(0.9, 1.1)
+                                 for n in aleatorio.sample(nombres, max(1, len(nombres) // 10))}, fecha=fecha)
+    r['historial.registrar_todo'] = medir(registrar, 1)
+    r['historial.registros'] = len(historial)
+    r['historial.abrir'] = medir(lambda: HistorialPrecios(ruta).precios_en(fechas[-1]), 1)
+
+    motor = MotorCostos(catalogo, 1)
+    medio = fechas[len(fechas) // 2]
+    r['historial.precios_en'] = medir(lambda: historial.precios_en(medio), repeticiones)
+    r['historial.costos_en'] = medir(lambda: motor.costos_en(historial, medio), repeticiones)
+    receta_id = catalogo.recetas[0].id
+    r['historial.tendencia_receta_diaria'] = medir(lambda: motor.tendencia(historial, fechas, [receta_id]),
+                                                   repeticiones)
+    semanas = pd.date_range(fechas[0], fechas[-1], freq='W')
+    r['historial.tendencia_catalogo_semanal'] = medir(lambda: motor.tendencia(historial, semanas), repeticiones)
+
+
+def bench_app(data, directorio, r):
+    """Mide la app completa con AppTest, apuntándola al catálogo sintético."""
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    os.environ['RECETAS_DATA_FILE'] = os.path.join(directorio, 'recetas.json')
+    os.environ['RECETAS_BACKEND'] = 'json'
+    st.cache_data.clear()
+    st.cache_resource.clear()
+
+    def correr(at):
+        inicio = time.perf_counter()
+        at.run()
+        duracion = time.perf_counter() - inicio
+        if at.exception:
+            raise RuntimeError(at.exception[0].value)
+        return {'min': duracion, 'mediana': duracion, 'repeticiones': 1}
+
+    at = AppTest.from_file(os.path.join(RAIZ, 'app.py'), default_timeout=3600)
+    r['app.menu.primera_carga'] = correr(at)
+    r['app.menu.rerun'] = correr(at)
+    at.text_input(key='menu_busqueda').set_value("chocolate")
+    r['app.menu.busqueda'] = correr(at)
+
+    at.session_state.receta_seleccionada_id = data['recetas'][0]['id']
+    at.session_state.current_page = 'detalle'
+    r['app.detalle'] = correr(at)
+
+    at.session_state.logged_in = True
+    at.session_state.current_page = 'importar_excel'
+    correr(at)
+    next(b for b in at.button if b.label.startswith("📥")).click()
+    r['app.importar_excel.exportar'] = correr(at)
+
+
+def bench_arranque(directorio, r):
+    """Arranque en frío: un proceso nuevo importa Streamlit y dibuja el menú."""
+    entorno = dict(os.environ, RECETAS_DATA_FILE=os.path.join(directorio, 'recetas.json'), RECETAS_BACKEND='json')
+    inicio = time.perf_counter()
+    salida = subprocess.run([sys.executable, '-c', _SCRIPT_ARRANQUE, os.path.join(RAIZ, 'app.py'), *MODULOS_DIFERIDOS],
+                            cwd=RAIZ, env=entorno, capture_output=True, text=True, check=True)
+    proceso = time.perf_counter() - inicio
+    datos = json.loads(salida.stdout.strip().splitlines()[-1])
+    if datos['error']:
+        raise RuntimeError(datos['error'])
+    for nombre, valor in (('proceso', proceso), ('importar_streamlit', datos['importar_streamlit']),
+                          ('primer_render', datos['primer_render']), ('rerun', datos['rerun'])):
+        r[f'arranque.{nombre}'] = {'min': valor, 'mediana': valor, 'repeticiones': 1}
+    r['arranque.modulos_cargados'] = datos['modulos']
+
+
+def excesos_presupuesto(resultados):
+    """Mediciones de arranque que superan ``PRESUPUESTO``, como textos."""
+    excesos = []
+    for escala, mediciones in resultados.items():
+        if int(escala) > ESCALA_PRESUPUESTO:
+            continue
+        for nombre, limite in PRESUPUESTO.items():
+            if nombre in mediciones and mediciones[nombre]['min'] > limite:
+                excesos.append(f"{escala} recetas: {nombre} = {mediciones[nombre]['min']:.3f} s (límite {limite} s)")
+        for modulo in mediciones.get('arranque.modulos_cargados', []):
+            excesos.append(f"{escala} recetas: el menú importó '{modulo}'")
+    return excesos
+
+
+def ejecutar(escala, args):
+    r = {}
+    data = generar_catalogo(escala, ingredientes=args.ingredientes or max(50, escala // 10),
+                            pasos=args.pasos, lineas=args.lineas)
+    with tempfile.TemporaryDirectory() as directorio:
+        guardar_catalogo(data, os.path.join(directorio, 'recetas.json'))
+        r['catalogo.bytes'] = os.path.getsize(os.path.join(directorio, 'recetas.json'))
+        bench_almacenamiento(data, directorio, r, args.repeticiones)
+        catalogo = bench_modelo(data, r, args.repeticiones)
+        bench_busqueda(catalogo, data, r, args.repeticiones)
+        bench_costos(catalogo, data, r, args.repeticiones)
+        bench_importacion(catalogo, data, directorio, args.precios or len(data['ingredientes_globales']), r, args.repeticiones)
+        if not args.sin_intercambio:
+            bench_intercambio(catalogo, directorio, r)
+        bench_historial(catalogo, directorio, args.historial_dias, r, args.repeticiones)
+        if not args.sin_app:
+            bench_arranque(directorio, r)
+            bench_app(data, directorio, r)
+    return r
+
+
+def metadatos():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True,
+                                text=True).stdout.strip()
+    except OSError:
+        commit = None
+    import numpy
+    import pandas
+    import streamlit
+    return {
+        'fecha': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'streamlit': streamlit.__version__,
+        'pandas': pandas.__version__,
+        'numpy': numpy.__version__,
+    }
+
+
+def comparar(actual, anterior):
+    """Imprime la relación actual/anterior de cada medición común."""
+    print(f"{'escala':>8}  {'medición':<45} {'anterior':>10} {'actual':>10} {'x':>7}")
+    for escala, mediciones in actual['resultados'].items():
+        previas = anterior['resultados'].get(escala, {})
+        for nombre, valor in mediciones.items():
+            previo = previas.get(nombre)
+            if not isinstance(valor, dict) or not isinstance(previo, dict):
+                continue
+            relacion = valor['min'] / previo['min'] if previo['min'] else float('inf')
+            print(f"{escala:>8}  {nombre:<45} {previo['min']:>10.4f} {valor['min']:>10.4f} {relacion:>7.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--escalas', default='1000,10000,100000', help="Número de recetas, separados por comas.")
+    parser.add_argument('--ingredientes', type=int, default=0, help="Ingredientes globales (por defecto recetas/10).")
+    parser.add_argument('--pasos', type=int, default=6)
+    parser.add_argument('--lineas', type=int, default=8)
+    parser.add_argument('--precios', type=int, default=0, help="Filas de la lista de precios (por defecto, una por ingrediente).")
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--sin-app', action='store_true', help="No ejecutar las mediciones con AppTest.")
+    parser.add_argument('--historial-dias', type=int, default=3 * 365,
+                        help="Días de cambios de precios del historial sintético.")
+    parser.add_argument('--sin-intercambio', action='store_true',
+                        help="No medir la exportación e importación del catálogo (Excel es lento a gran escala).")
+    parser.add_argument('--salida', default=os.path.join(RAIZ, 'benchmarks', 'resultados.json'))
+    parser.add_argument('--comparar', help="Resultados anteriores con los que comparar.")
+    parser.add_argument('--presupuesto', action='store_true',
+                        help="Terminar con error si el arranque supera PRESUPUESTO.")
+    args = parser.parse_args()
+
+    os.chdir(RAIZ)
+    resultado = {'meta': metadatos(), 'resultados': {}}
+    for escala in (int(e) for e in args.escalas.split(',')):
+        print(f"Escala {escala} recetas...", flush=True)
+        resultado['resultados'][str(escala)] = ejecutar(escala, args)
+
+    with open(args.salida, 'w', encoding='utf-8') as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    print(f"Resultados guardados en {args.salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            comparar(resultado, json.load(f))
+
+    excesos = excesos_presupuesto(resultado['resultados'])
+    for exceso in excesos:
+        print(f"Presupuesto excedido: {exceso}")
+    if args.presupuesto and excesos:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
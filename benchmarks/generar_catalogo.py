@@ -0,0 +1,96 @@
+"""Generador de catálogos sintéticos con el formato de ``data/recetas.json``.
+
+Uso:
+    python benchmarks/generar_catalogo.py --recetas 10000 --ingredientes 2000 salida.json
+"""
+
+import argparse
+import json
+import random
+
+PALABRAS = [
+    "harina", "azúcar", "chocolate", "vainilla", "mantequilla", "huevo", "leche", "fresa", "limón",
+    "canela", "nuez", "almendra", "crema", "queso", "miel", "avena", "coco", "café", "naranja",
+    "manzana", "frambuesa", "caramelo", "pistacho", "jengibre", "calabaza", "plátano", "cereza",
+]
+TIPOS = ["Pastel", "Galletas", "Tarta", "Bizcocho", "Brownie", "Flan", "Mousse", "Pan", "Magdalenas", "Trufas"]
+VERBOS = ["Mezclar", "Batir", "Incorporar", "Hornear", "Tamizar", "Refrigerar", "Decorar", "Fundir"]
+UNIDADES = ["gramos", "ml", "unidad"]
+IMAGENES = ["images/galletas_chocolate.jpg", "images/pastel_vainilla.jpg"]
+
+
+def generar_ingredientes(n, semilla=0):
+    """Devuelve ``ingredientes_globales`` con ``n`` ingredientes."""
+    rnd = random.Random(semilla)
+    return {
+        f"{rnd.choice(PALABRAS).capitalize()} {i}": {
+            "unidad_base": rnd.choice(UNIDADES),
+            "costo_por_unidad": round(rnd.uniform(0.0005, 0.5), 4),
+        }
+        for i in range(n)
+    }
+
+
+def generar_catalogo(recetas=1000, ingredientes=500, pasos=6, lineas=8, semilla=0):
+    """Genera un catálogo con el número indicado de recetas e ingredientes.
+
+    ``pasos`` y ``lineas`` son el promedio de pasos e ingredientes por receta.
+    """
+    rnd = random.Random(semilla)
+    globales = generar_ingredientes(ingredientes, semilla)
+    nombres = list(globales)
+    lista = []
+    for i in range(recetas):
+        usados = rnd.sample(nombres, min(len(nombres), max(1, int(rnd.gauss(lineas, 2)))))
+        lista.append({
+            "id": f"receta_{i}",
+            "nombre": f"{rnd.choice(TIPOS)} de {rnd.choice(PALABRAS)} y {rnd.choice(PALABRAS)} {i}",
+            "imagen": rnd.choice(IMAGENES),
+            "cantidad_base": rnd.randint(1, 24),
+            "unidad_base": rnd.choice(["unidades", "porciones"]),
+            "ingredientes": [{"nombre": n, "cantidad": round(rnd.uniform(1, 500), 1)} for n in usados],
+            "pasos": [
+                f"{rnd.choice(VERBOS)} {rnd.choice(PALABRAS)} con {rnd.choice(PALABRAS)} durante {rnd.randint(1, 60)} minutos."
+                for _ in range(max(1, int(rnd.gauss(pasos, 2))))
+            ],
+        })
+    return {"ingredientes_globales": globales, "recetas": lista}
+
+
+def guardar_catalogo(data, ruta):
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=4, ensure_ascii=False)
+
+
+def guardar_lista_precios(ingredientes, filas, ruta, semilla=0):
+    """Escribe una hoja 'Ingredientes' con ``filas`` precios para importar.
+
+    Reutiliza los nombres de ``ingredientes`` (con precios nuevos) y completa
+    con ingredientes nuevos si ``filas`` es mayor.
+    """
+    from openpyxl import Workbook
+
+    rnd = random.Random(semilla)
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet('Ingredientes')
+    hoja.append(['Nombre', 'Unidad_Base', 'Costo_Por_Unidad'])
+    nombres = list(ingredientes)
+    for i in range(filas):
+        if i < len(nombres):
+            hoja.append([nombres[i], ingredientes[nombres[i]]['unidad_base'], round(rnd.uniform(0.0005, 0.5), 4)])
+        else:
+            hoja.append([f"Nuevo {i}", rnd.choice(UNIDADES), round(rnd.uniform(0.0005, 0.5), 4)])
+    libro.save(ruta)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('salida')
+    parser.add_argument('--recetas', type=int, default=1000)
+    parser.add_argument('--ingredientes', type=int, default=500)
+    parser.add_argument('--pasos', type=int, default=6)
+    parser.add_argument('--lineas', type=int, default=8)
+    parser.add_argument('--semilla', type=int, default=0)
+    args = parser.parse_args()
+    guardar_catalogo(generar_catalogo(args.recetas, args.ingredientes, args.pasos, args.lineas, args.semilla),
+                     args.salida)
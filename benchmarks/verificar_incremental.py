@@ -0,0 +1,247 @@
+"""Comprueba que las actualizaciones incrementales equivalen a reconstruir.
+
+Aplica ediciones aleatorias al ``Catalogo``, al ``IndiceRecetas`` y al
+``MotorCostos`` tal como lo hacen los guardados de la app (``sincronizar`` con
+el mismo cambio para los tres): lotes de recetas importadas, altas, reemplazos
+y renombres de recetas sueltas, bajas, y cambios y bajas de precios. Tras cada
+edición compara los tres con una reconstrucción completa desde el mismo estado
+en formato dict: el catálogo, los arrays del motor, los costos, el informe de
+``impacto_precios`` y los resultados de búsqueda (con su orden).
+
+Después somete el ``Catalogo`` a recargas y guardados continuos desde un hilo
+mientras otros lo leen, como varias sesiones a la vez: cada lectura (las líneas
+de una receta, una exportación completa) debe ver un único estado coherente,
+nunca una mezcla de la versión anterior y la nueva (copia en escritura).
+
+Uso:
+    python benchmarks/verificar_incremental.py --pasos 200 --semilla 0 --segundos 5
+
+Termina con error en la primera diferencia, indicando el paso y la edición.
+"""
+
+import argparse
+import copy
+import os
+import random
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from busqueda import IndiceRecetas  # noqa: E402
+from costos import MotorCostos  # noqa: E402
+from modelo import Catalogo  # noqa: E402
+
+PALABRAS = ["harina", "azúcar", "huevo", "leche", "mantequilla", "cacao", "hornear", "batir", "mezclar",
+            "vainilla", "limón", "nuez"]
+CONSULTAS = ["har", "azucar hornear", "nuez", "limon leche", "vai", "x", "inexistente"]
+# Arrays del motor que deben coincidir exactamente con los de una compilación nueva. ``indices`` no está:
+# las bajas de ingredientes dejan su columna vacía y las altas van al final, así que se compara a qué
+# ingrediente y precio apunta cada línea.
+ARRAYS_MOTOR = ['nombres', 'unidades_receta', 'cantidad_base', 'indptr', 'nombres_linea', 'cantidades', 'fila']
+
+
+def _receta(rnd, receta_id, ingredientes):
+    """Receta aleatoria; algunas líneas usan ingredientes que no están en la lista global."""
+    return {
+        "id": receta_id,
+        "nombre": " ".join(rnd.sample(PALABRAS, 2)),
+        "imagen": "",
+        "cantidad_base": rnd.choice([rnd.randint(1, 20), round(rnd.uniform(0.5, 20), 2)]),
+        "unidad_base": "unidades",
+        "ingredientes": [{"nombre": f"i{rnd.randrange(ingredientes + 20)}", "cantidad": round(rnd.uniform(0, 100), 3)}
+                         for _ in range(rnd.randint(0, 10))],
+        "pasos": [" ".join(rnd.sample(PALABRAS, 3)) for _ in range(rnd.randint(0, 3))],
+    }
+
+
+def _precio(rnd):
+    return {"unidad_base": "g", "costo_por_unidad": round(rnd.random(), 4)}
+
+
+def _editar(rnd, data, paso, ingredientes):
+    """Elige una edición, la aplica a ``data`` y devuelve (descripción, cambios por recurso, cambios de precio)."""
+    recetas = data['recetas']
+    op = rnd.random()
+    if op < 0.3:
+        lote = [_receta(rnd, rnd.choice(recetas)['id'] if recetas and rnd.random() < 0.6 else f"n{paso}_{i}",
+                        ingredientes) for i in range(rnd.randint(0, 15))]
+        lote = list({r['id']: r for r in lote}.values())  # como leer_recetas: un ID por receta, gana la última
+        posiciones = {r['id']: i for i, r in enumerate(recetas)}
+        for receta in lote:
+            if receta['id'] in posiciones:
+                recetas[posiciones[receta['id']]] = receta
+            else:
+                posiciones[receta['id']] = len(recetas)
+                recetas.append(receta)
+        return (f"importar {len(lote)} recetas",
+                (lambda c: c.guardar_recetas(lote), lambda i: i.actualizar_recetas(lote),
+                 lambda m: m.actualizar_recetas(lote)), None)
+    if op < 0.55:
+        if recetas and rnd.random() < 0.7:
+            i = rnd.randrange(len(recetas))
+            anterior = recetas[i]['id']
+            receta = _receta(rnd, anterior if rnd.random() < 0.5 else f"x{paso}", ingredientes)
+            recetas[i] = receta
+        else:
+            anterior = None
+            receta = _receta(rnd, f"x{paso}", ingredientes)
+            recetas.append(receta)
+        return (f"guardar receta {receta['id']} (antes {anterior})",
+                (lambda c: c.guardar_receta(receta, anterior), lambda i: i.actualizar(receta, anterior),
+                 lambda m: m.actualizar_receta(receta, anterior)), None)
+    if op < 0.7 and recetas:
+        receta_id = recetas.pop(rnd.randrange(len(recetas)))['id']
+        return (f"eliminar receta {receta_id}",
+                (lambda c: c.eliminar_receta(receta_id), lambda i: i.eliminar(receta_id),
+                 lambda m: m.eliminar_receta(receta_id)), None)
+    cambios = {f"i{rnd.randrange(ingredientes + 25)}": _precio(rnd) for _ in range(rnd.randint(1, 5))}
+    eliminar = [n for n in (f"i{rnd.randrange(ingredientes + 25)}" for _ in range(rnd.randint(0, 2)))
+                if n not in cambios]
+    data['ingredientes_globales'].update(cambios)
+    for nombre in eliminar:
+        data['ingredientes_globales'].pop(nombre, None)
+    return (f"precios: {len(cambios)} cambios, {len(eliminar)} bajas",
+            (lambda c: c.guardar_ingredientes(cambios, eliminar), None,
+             lambda m: m.actualizar_ingredientes(cambios, eliminar)), (cambios, eliminar))
+
+
+def _columnas(motor):
+    """Ingrediente (None si no tiene precio) y precio de cada línea del motor."""
+    nombres = np.array(motor.ingredientes + [None], dtype=object)
+    return nombres[motor.indices], motor._precios_ext()[motor.indices]
+
+
+def _comparar(data, catalogo, indice, motor):
+    """Lanza ``AssertionError`` si algún recurso difiere de reconstruirlo desde ``data``."""
+    referencia = Catalogo(copy.deepcopy(data))
+    assert catalogo.a_data() == data, "el catálogo no coincide"
+    assert all(catalogo.receta(r['id']).id == r['id'] for r in data['recetas']), "búsqueda por ID"
+
+    compilado = MotorCostos(referencia)
+    assert motor.recetas == compilado.recetas, "orden de recetas del motor"
+    assert motor.indice_receta == {r: i for i, r in enumerate(motor.recetas)}, "indice_receta"
+    for nombre in ARRAYS_MOTOR:
+        assert np.array_equal(getattr(motor, nombre), getattr(compilado, nombre)), f"motor.{nombre}"
+    assert set(motor.indice_ingrediente) == set(compilado.indice_ingrediente), "ingredientes del motor"
+    for a, b, nombre in zip(_columnas(motor), _columnas(compilado), ("ingrediente", "precio")):
+        assert np.array_equal(a, b), f"{nombre} de cada línea"
+    assert np.allclose(motor.costos_base, compilado.costos_base), "costos_base"
+
+    reindexado = IndiceRecetas()
+    reindexado.reconstruir(referencia, None)
+    for consulta in CONSULTAS:
+        assert indice.buscar(consulta) == reindexado.buscar(consulta), f"buscar({consulta!r})"
+        assert indice.buscar(consulta, limite=3) == reindexado.buscar(consulta, limite=3), f"buscar({consulta!r}, 3)"
+        assert indice.contar(consulta) == reindexado.contar(consulta), f"contar({consulta!r})"
+
+
+def verificar(pasos, semilla, recetas=300, ingredientes=60):
+    rnd = random.Random(semilla)
+    data = {
+        "ingredientes_globales": {f"i{i}": _precio(rnd) for i in range(ingredientes)},
+        "recetas": [_receta(rnd, f"r{i}", ingredientes) for i in range(recetas)],
+    }
+    version = 0
+    catalogo = Catalogo(copy.deepcopy(data), version)
+    indice = IndiceRecetas()
+    indice.reconstruir(catalogo, version)
+    motor = MotorCostos(catalogo, version)
+    for paso in range(pasos):
+        descripcion, cambios, precios = _editar(rnd, data, paso, ingredientes)
+        if precios:
+            impacto = motor.impacto_precios(*precios)
+            antes = dict(zip(motor.recetas, motor.costos_base.copy()))
+        for recurso, cambio in zip((catalogo, indice, motor), cambios):
+            recurso.sincronizar(version, version + 1, cambio)
+        version += 1
+        try:
+            assert catalogo.version == indice.version == motor.version == version, "versiones"
+            _comparar(data, catalogo, indice, motor)
+            if precios:
+                despues = dict(zip(motor.recetas, motor.costos_base))
+                cambiadas = {r for r in antes if not np.isclose(antes[r], despues[r])}
+                assert cambiadas <= set(impacto['id']), "impacto_precios omite recetas"
+                for fila in impacto.itertuples():
+                    assert np.isclose(fila.costo_nuevo, despues[fila.id]), f"impacto_precios de {fila.id}"
+        except AssertionError as e:
+            raise AssertionError(f"paso {paso} ({descripcion}): {e}") from None
+    return len(data['recetas'])
+
+
+def _version(k, recetas=3000, ingredientes=200):
+    """Catálogo cuya versión ``k`` se reconoce en cada nombre: receta 'v{k}', ingredientes 'v{k}_j'."""
+    return {
+        "ingredientes_globales": {f"v{k}_{j}": {"unidad_base": "g", "costo_por_unidad": 1.0}
+                                  for j in range(ingredientes)},
+        "recetas": [{"id": f"r{i}", "nombre": f"v{k}", "imagen": "", "cantidad_base": 1, "unidad_base": "u",
+                     "ingredientes": [{"nombre": f"v{k}_{(i + j) % ingredientes}", "cantidad": 1.0} for j in range(8)],
+                     "pasos": []} for i in range(recetas)],
+    }
+
+
+def verificar_concurrencia(segundos, lectores=3):
+    """Recargas y guardados en un hilo y lecturas en otros; devuelve cuántas lecturas se hicieron."""
+    from intercambio import _Instantanea
+
+    versiones = [_version(k) for k in range(6)]
+    catalogo = Catalogo(versiones[0], 0)
+    fin = time.monotonic() + segundos
+    errores = []
+    lecturas = [0] * lectores
+
+    def escritor():
+        k = 0
+        while time.monotonic() < fin and not errores:
+            k += 1
+            if k % 2:
+                catalogo.reconstruir(versiones[k % 6], k)
+            else:
+                catalogo.guardar_recetas(versiones[k % 6]['recetas'])
+
+    def lector(n):
+        rnd = random.Random(n)
+        while time.monotonic() < fin and not errores:
+            try:
+                receta = rnd.choice(catalogo.recetas)
+                nombres = [nombre for nombre, _ in catalogo.lineas(receta)]
+                assert all(nombre.startswith(receta.nombre + '_') for nombre in nombres), \
+                    f"receta {receta.id} ({receta.nombre}) con líneas {nombres[:2]}"
+                prefijos = set()
+                for bloque in _Instantanea(catalogo).bloques('Lineas', 1000):
+                    prefijos.update(nombre.split('_')[0] for nombre in bloque['Ingrediente'])
+                assert len(prefijos) == 1, f"exportación que mezcla versiones: {sorted(prefijos)}"
+                lecturas[n] += 1
+            except Exception as e:
+                errores.append(repr(e))
+
+    hilos = [threading.Thread(target=escritor)] + [threading.Thread(target=lector, args=(n,)) for n in range(lectores)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    if errores:
+        raise AssertionError(f"lectura concurrente: {errores[0]}")
+    return sum(lecturas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pasos', type=int, default=200, help="Ediciones aleatorias por semilla.")
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--semillas', type=int, default=3, help="Semillas consecutivas a partir de --semilla.")
+    parser.add_argument('--segundos', type=float, default=5, help="Duración de la prueba de lecturas concurrentes.")
+    args = parser.parse_args()
+    for semilla in range(args.semilla, args.semilla + args.semillas):
+        total = verificar(args.pasos, semilla)
+        print(f"semilla {semilla}: {args.pasos} ediciones, {total} recetas al final, sin diferencias")
+    if args.segundos:
+        lecturas = verificar_concurrencia(args.segundos)
+        print(f"concurrencia: {lecturas} lecturas durante {args.segundos:g} s de recargas, todas coherentes")
+
+
+if __name__ == '__main__':
+    main()
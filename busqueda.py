@@ -0,0 +1,231 @@
+"""Índice invertido para buscar recetas por nombre, ingrediente o paso.
+
+El texto se normaliza sin acentos ni mayúsculas ("Azúcar" -> "azucar") y se
+parte en palabras. Cada palabra apunta a las recetas que la contienen junto con
+un peso según el campo donde aparece, de modo que una coincidencia en el nombre
+pesa más que una en los pasos. Las palabras de la consulta se buscan como
+prefijo sobre el vocabulario ordenado (búsqueda binaria).
+
+Cada receta ocupa una posición fija (su orden en el catálogo) y los postings
+se guardan por posición; al consultar se convierten en arrays de NumPy (una
+vez por palabra y versión) y la puntuación de todas las recetas se calcula con
+operaciones vectorizadas. Con ``limite`` solo se ordenan las mejores. NumPy
+se importa al consultar: indexar no lo necesita, y el menú sin búsqueda tampoco.
+"""
+
+import bisect
+import functools
+import re
+import unicodedata
+
+from versionado import Versionado
+
+PESOS = {'nombre': 3.0, 'ingrediente': 2.0, 'paso': 1.0}
+# Las palabras más cortas solo coinciden completas: un prefijo de una o dos
+# letras abarcaría medio vocabulario.
+MIN_PREFIJO = 3
+_PALABRA = re.compile(r'\w+')
+
+
+def normalizar(texto):
+    """Pasa a minúsculas y elimina acentos y diacríticos."""
+    texto = texto.casefold()
+    if texto.isascii():
+        return texto
+    descompuesto = unicodedata.normalize('NFKD', texto)
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+def tokenizar(texto):
+    """Devuelve las palabras normalizadas de ``texto``."""
+    return _PALABRA.findall(normalizar(texto or ''))
+
+
+@functools.lru_cache(maxsize=65536)
+def _tokens_ingrediente(nombre):
+    # Los nombres de ingredientes se repiten en muchas recetas.
+    return tuple(tokenizar(nombre))
+
+
+def _pesos_receta(nombre, ingredientes, pasos):
+    """Calcula ``{palabra: peso}`` de una receta sumando un peso por campo."""
+    campos = {
+        'nombre': tokenizar(nombre),
+        'ingrediente': [t for ing in ingredientes for t in _tokens_ingrediente(ing)],
+        'paso': [t for paso in pasos for t in tokenizar(paso)],
+    }
+    pesos = {}
+    for campo, palabras in campos.items():
+        for palabra in set(palabras):
+            pesos[palabra] = pesos.get(palabra, 0.0) + PESOS[campo]
+    return pesos
+
+
+class IndiceRecetas(Versionado):
+    """Índice de búsqueda compartido entre sesiones y ligado a una versión de datos."""
+
+    def __init__(self):
+        super().__init__()
+        self._postings = {}  # palabra -> {posición: peso}
+        self._arrays = {}  # palabra -> (posiciones, pesos) como arrays, se arma al consultar
+        self._pesos_por_receta = {}
+        self._orden = {}  # ID -> posición
+        self._ids = []  # posición -> ID (None si la receta se eliminó)
+        self._vocabulario = []
+        self._ultima = None  # (consulta, resultado de _puntuar)
+
+    def reconstruir(self, catalogo, version):
+        """Vuelve a indexar todo el ``Catalogo``."""
+        with self._lock:
+            self._postings = {}
+            self._arrays = {}
+            self._pesos_por_receta = {}
+            self._orden = {}
+            self._ids = []
+            self._ultima = None
+            nombres = catalogo.nombres_internos
+            for receta in catalogo.recetas:
+                ingredientes = [nombres[i] for i in receta.ingredientes]
+                self._agregar(receta.id, _pesos_receta(receta.nombre, ingredientes, receta.pasos))
+            self._vocabulario = sorted(self._postings)
+            self.version = version
+
+    def _agregar(self, receta_id, pesos, orden=None):
+        self._ultima = None
+        self._pesos_por_receta[receta_id] = pesos
+        if orden is None:
+            orden = len(self._ids)
+            self._ids.append(receta_id)
+        else:
+            self._ids[orden] = receta_id
+        self._orden[receta_id] = orden
+        for palabra, peso in pesos.items():
+            self._postings.setdefault(palabra, {})[orden] = peso
+            self._arrays.pop(palabra, None)
+
+    def _quitar(self, receta_id):
+        pesos = self._pesos_por_receta.pop(receta_id, None)
+        if pesos is None:
+            return None
+        self._ultima = None
+        orden = self._orden.pop(receta_id)
+        self._ids[orden] = None
+        for palabra in pesos:
+            posting = self._postings[palabra]
+            del posting[orden]
+            self._arrays.pop(palabra, None)
+            if not posting:
+                del self._postings[palabra]
+                i = bisect.bisect_left(self._vocabulario, palabra)
+                if i < len(self._vocabulario) and self._vocabulario[i] == palabra:
+                    self._vocabulario.pop(i)
+        return orden
+
+    def actualizar(self, receta, id_anterior=None):
+        """Indexa una receta nueva (en formato dict) o reemplaza la versión previa."""
+        pesos = _pesos_receta(receta.get('nombre'), [ing.get('nombre') for ing in receta.get('ingredientes', [])],
+                              receta.get('pasos', []))
+        with self._lock:
+            orden = self._quitar(id_anterior if id_anterior is not None else receta['id'])
+            self._agregar(receta['id'], pesos, orden)
+            for palabra in self._pesos_por_receta[receta['id']]:
+                i = bisect.bisect_left(self._vocabulario, palabra)
+                if i == len(self._vocabulario) or self._vocabulario[i] != palabra:
+                    self._vocabulario.insert(i, palabra)
+
+    def actualizar_recetas(self, recetas):
+        """Indexa o reemplaza (por ID) muchas recetas en formato dict."""
+        with self._lock:
+            for receta in recetas:
+                self.actualizar(receta)
+
+    def eliminar(self, receta_id):
+        """Quita una receta del índice."""
+        with self._lock:
+            self._quitar(receta_id)
+
+    def _array(self, palabra):
+        import numpy as np
+
+        arrays = self._arrays.get(palabra)
+        if arrays is None:
+            posting = self._postings[palabra]
+            arrays = self._arrays[palabra] = (
+                np.fromiter(posting.keys(), dtype=np.int64, count=len(posting)),
+                np.fromiter(posting.values(), dtype=np.float64, count=len(posting)),
+            )
+        return arrays
+
+    def _puntos(self, palabra):
+        """Peso de ``palabra`` en cada posición, uniendo las palabras del vocabulario con ese prefijo."""
+        import numpy as np
+
+        puntos = np.zeros(len(self._ids))
+        if palabra in self._postings:
+            posiciones, pesos = self._array(palabra)
+            puntos[posiciones] = pesos
+        if len(palabra) < MIN_PREFIJO:
+            return puntos
+        i = bisect.bisect_right(self._vocabulario, palabra)
+        while i < len(self._vocabulario) and self._vocabulario[i].startswith(palabra):
+            posiciones, pesos = self._array(self._vocabulario[i])
+            # Un prefijo puntúa algo menos que la palabra completa.
+            puntos[posiciones] = np.maximum(puntos[posiciones], pesos * 0.8)
+            i += 1
+        return puntos
+
+    def _puntuar(self, consulta):
+        """Posiciones (en orden de catálogo) que contienen todas las palabras y su puntuación.
+
+        Se recuerda la última consulta: el menú cuenta y luego pide una página.
+        """
+        import numpy as np
+
+        if self._ultima is not None and self._ultima[0] == consulta:
+            return self._ultima[1]
+        puntuacion = None
+        for palabra in dict.fromkeys(tokenizar(consulta)):
+            puntos = self._puntos(palabra)
+            if puntuacion is None:
+                puntuacion, todas = puntos, puntos > 0
+            else:
+                puntuacion += puntos
+                todas &= puntos > 0
+        if puntuacion is None:
+            resultado = np.zeros(0, dtype=np.int64), np.zeros(0)
+        else:
+            candidatas = np.flatnonzero(todas)
+            resultado = candidatas, puntuacion[candidatas]
+        self._ultima = (consulta, resultado)
+        return resultado
+
+    def _mejores(self, candidatas, valores, limite):
+        """IDs de las ``limite`` mejores candidatas (todas si es None), por relevancia."""
+        import numpy as np
+
+        if limite is not None and limite < len(candidatas):
+            # Solo las que superan la puntuación de la ``limite``-ésima, más
+            # las empatadas con ella que van primero en el catálogo.
+            umbral = np.partition(valores, len(valores) - limite)[len(valores) - limite]
+            mayores = valores > umbral
+            iguales = np.flatnonzero(valores == umbral)[:limite - np.count_nonzero(mayores)]
+            mayores[iguales] = True
+            candidatas, valores = candidatas[mayores], valores[mayores]
+        # candidatas está en orden de catálogo: el orden estable lo conserva en los empates.
+        ids = self._ids
+        return [ids[i] for i in candidatas[np.argsort(-valores, kind='stable')]]
+
+    def buscar(self, consulta, limite=None):
+        """Devuelve los IDs de las recetas que contienen todas las palabras, por relevancia.
+
+        A igual relevancia se respeta el orden del catálogo. Con ``limite``
+        devuelve solo las ``limite`` primeras, sin ordenar el resto.
+        """
+        with self._lock:
+            candidatas, valores = self._puntuar(consulta)
+            return self._mejores(candidatas, valores, limite)
+
+    def contar(self, consulta):
+        """Cuántas recetas contienen todas las palabras."""
+        with self._lock:
+            return len(self._puntuar(consulta)[0])
@@ -0,0 +1,501 @@
+"""Motor de costos vectorizado.
+
+Compila el catálogo en una matriz dispersa receta × ingrediente en formato CSR
+(``indptr``, ``indices``, ``cantidades``) y un vector de precios por ingrediente.
+Con eso el costo de todas las recetas es una sola suma ponderada con NumPy, y
+como el costo es lineal en la cantidad, escalar una receta o un lote de
+recetas es multiplicar el costo base por el factor de escala.
+
+El motor guarda además el costo base de cada receta y un índice inverso
+ingrediente -> líneas de receta (la misma matriz ordenada por columna), de modo
+que un cambio de precios solo recalcula las recetas que usan esos ingredientes.
+"""
+
+import numpy as np
+import pandas as pd
+
+from modelo import Catalogo
+from versionado import Versionado
+
+# Índice de las líneas cuyo ingrediente no existe en ingredientes_globales;
+# apunta a un precio 0 añadido al final del vector de precios.
+SIN_INGREDIENTE = -1
+# Líneas afectadas por cambios de precio que ``tendencia`` procesa de una vez.
+TAM_BLOQUE_TENDENCIA = 4_000_000
+
+
+def _rangos(inicios, fines):
+    """Concatena ``arange(inicio, fin)`` para cada par, sin bucles de Python."""
+    longitudes = fines - inicios
+    total = int(longitudes.sum())
+    if not total:
+        return np.zeros(0, dtype=np.int64)
+    desplazamientos = inicios - np.concatenate(([0], np.cumsum(longitudes)[:-1]))
+    return np.arange(total) + np.repeat(desplazamientos, longitudes)
+
+
+class MotorCostos(Versionado):
+    """Catálogo compilado para calcular costos en bloque.
+
+    Se comparte entre sesiones: ``version`` indica la versión de los datos que
+    refleja y todas las operaciones se hacen bajo un candado.
+    """
+
+    def __init__(self, catalogo=None, version=None):
+        super().__init__()
+        self.reconstruir(catalogo if catalogo is not None else Catalogo(), version)
+
+    # --- Compilación ---
+
+    def reconstruir(self, catalogo, version):
+        """Compila de nuevo todo el ``Catalogo``.
+
+        Las líneas de receta ya vienen como arrays de IDs internos de
+        ingrediente, así que la matriz se arma concatenando esos arrays y
+        traduciendo cada ID a su columna con una sola indexación.
+        """
+        with self._lock:
+            ingredientes = catalogo.ingredientes
+            recetas = catalogo.recetas
+
+            self.ingredientes = list(ingredientes)
+            self.indice_ingrediente = {nombre: i for i, nombre in enumerate(self.ingredientes)}
+            self.unidades = np.array([info.unidad_base for info in ingredientes.values()], dtype=object)
+            self.precios = np.fromiter((info.costo_por_unidad for info in ingredientes.values()),
+                                       dtype=np.float64, count=len(ingredientes))
+
+            self.recetas = [r.id for r in recetas]
+            self.indice_receta = {receta_id: i for i, receta_id in enumerate(self.recetas)}
+            self.nombres = np.array([r.nombre for r in recetas], dtype=object)
+            self.unidades_receta = np.array([r.unidad_base for r in recetas], dtype=object)
+            self.cantidad_base = np.fromiter((r.cantidad_base for r in recetas), dtype=np.float64,
+                                             count=len(recetas))
+
+            longitudes = np.fromiter((len(r.ingredientes) for r in recetas), dtype=np.int64, count=len(recetas))
+            self.indptr = np.concatenate(([0], np.cumsum(longitudes)))
+            internos = catalogo.nombres_internos
+            columna = np.full(len(internos) + 1, SIN_INGREDIENTE, dtype=np.int64)
+            columna[[catalogo.id_ingrediente(n) for n in self.ingredientes]] = np.arange(len(self.ingredientes))
+            ids = np.frombuffer(b''.join(r.ingredientes.tobytes() for r in recetas), dtype=np.int64)
+            self.indices = columna[ids]
+            self.nombres_linea = np.array(internos, dtype=object)[ids] if len(ids) else np.zeros(0, dtype=object)
+            self.cantidades = np.frombuffer(b''.join(r.cantidades.tobytes() for r in recetas), dtype=np.float64).copy()
+            self.fila = np.repeat(np.arange(len(recetas)), longitudes)
+            self._inverso = None
+
+            self.costos_base = self._costos_base()
+            self.version = version
+
+    def _compilar_lineas(self, lineas):
+        nombres = np.array([ing['nombre'] for ing in lineas], dtype=object)
+        indices = np.fromiter((self.indice_ingrediente.get(ing['nombre'], SIN_INGREDIENTE) for ing in lineas),
+                              dtype=np.int64, count=len(lineas))
+        cantidades = np.fromiter((ing['cantidad'] for ing in lineas), dtype=np.float64, count=len(lineas))
+        return nombres, indices, cantidades
+
+    def _precios_ext(self):
+        return np.append(self.precios, 0.0)
+
+    def _costos_base(self):
+        """Costo de cada receta a su cantidad base."""
+        return np.bincount(self.fila, weights=self.cantidades * self._precios_ext()[self.indices],
+                           minlength=len(self.recetas))
+
+    def _recalcular(self, filas):
+        """Recalcula el costo base solo de las recetas en ``filas``."""
+        if not len(filas):
+            return
+        lineas = _rangos(self.indptr[filas], self.indptr[filas + 1])
+        grupos = np.repeat(np.arange(len(filas)), self.indptr[filas + 1] - self.indptr[filas])
+        pesos = self.cantidades[lineas] * self._precios_ext()[self.indices[lineas]]
+        self.costos_base[filas] = np.bincount(grupos, weights=pesos, minlength=len(filas))
+
+    # --- Índice inverso ingrediente -> recetas ---
+
+    def _lineas_de(self, posiciones):
+        """Líneas de receta que usan los ingredientes en ``posiciones``."""
+        if self._inverso is None:
+            orden = np.argsort(self.indices, kind='stable')
+            inicio = np.searchsorted(self.indices[orden], np.arange(len(self.precios) + 1))
+            self._inverso = (orden, inicio)
+        orden, inicio = self._inverso
+        posiciones = np.asarray(posiciones, dtype=np.int64)
+        return orden[_rangos(inicio[posiciones], inicio[posiciones + 1])]
+
+    def _lineas_faltantes_con(self, nombres):
+        """Líneas sin ingrediente global cuyo nombre está en ``nombres``."""
+        faltantes = np.flatnonzero(self.indices == SIN_INGREDIENTE)
+        if not len(faltantes) or not nombres:
+            return faltantes[:0]
+        return faltantes[np.isin(self.nombres_linea[faltantes], list(nombres))]
+
+    def recetas_con(self, nombres):
+        """IDs de las recetas que usan alguno de los ingredientes indicados."""
+        with self._lock:
+            posiciones = [self.indice_ingrediente[n] for n in nombres if n in self.indice_ingrediente]
+            filas = np.unique(self.fila[self._lineas_de(posiciones)])
+            return [self.recetas[f] for f in filas]
+
+    def impacto_precios(self, ingredientes, eliminar=()):
+        """Recetas cuyo costo cambiaría al guardar ``ingredientes`` y borrar ``eliminar``.
+
+        No modifica el motor. Devuelve un DataFrame con el costo base anterior
+        y el nuevo de cada receta afectada, ordenado por la diferencia absoluta.
+        """
+        with self._lock:
+            nuevos_precios = {n: float(info['costo_por_unidad']) for n, info in ingredientes.items()}
+            nuevos_precios.update({n: 0.0 for n in eliminar})
+            existentes = [n for n in nuevos_precios if n in self.indice_ingrediente]
+            lineas = np.concatenate((
+                self._lineas_de([self.indice_ingrediente[n] for n in existentes]),
+                self._lineas_faltantes_con(set(nuevos_precios) - set(existentes) - set(eliminar)),
+            ))
+            filas = np.unique(self.fila[lineas])
+            if not len(filas):
+                return pd.DataFrame(columns=['id', 'nombre', 'costo_anterior', 'costo_nuevo',
+                                             'diferencia', 'variacion_pct'])
+
+            todas = _rangos(self.indptr[filas], self.indptr[filas + 1])
+            grupos = np.repeat(np.arange(len(filas)), self.indptr[filas + 1] - self.indptr[filas])
+            precios = self._precios_ext()[self.indices[todas]]
+            cambia = np.isin(self.nombres_linea[todas], list(nuevos_precios))
+            precios[cambia] = pd.Series(self.nombres_linea[todas][cambia]).map(nuevos_precios).to_numpy()
+            costo_nuevo = np.bincount(grupos, weights=self.cantidades[todas] * precios, minlength=len(filas))
+            costo_anterior = self.costos_base[filas]
+
+        reporte = pd.DataFrame({
+            'id': [self.recetas[f] for f in filas],
+            'nombre': self.nombres[filas],
+            'costo_anterior': costo_anterior,
+            'costo_nuevo': costo_nuevo,
+            'diferencia': costo_nuevo - costo_anterior,
+            'variacion_pct': np.divide(100 * (costo_nuevo - costo_anterior), costo_anterior,
+                                       out=np.zeros_like(costo_nuevo), where=costo_anterior != 0),
+        })
+        reporte = reporte[reporte['diferencia'] != 0]
+        return reporte.iloc[np.argsort(-reporte['diferencia'].abs().to_numpy(), kind='stable')].reset_index(drop=True)
+
+    # --- Actualizaciones incrementales ---
+
+    def actualizar_ingredientes(self, ingredientes, eliminar=()):
+        """Aplica altas, cambios de precio y bajas recalculando solo las recetas afectadas."""
+        with self._lock:
+            afectadas = []
+            posiciones_eliminadas = [self.indice_ingrediente.pop(n) for n in eliminar if n in self.indice_ingrediente]
+            if posiciones_eliminadas:
+                lineas = self._lineas_de(posiciones_eliminadas)
+                self.indices[lineas] = SIN_INGREDIENTE
+                self.precios[posiciones_eliminadas] = 0.0
+                afectadas.append(lineas)
+                self._inverso = None
+
+            nuevos = {}
+            for nombre, info in ingredientes.items():
+                posicion = self.indice_ingrediente.get(nombre)
+                if posicion is None:
+                    nuevos[nombre] = info
+                    continue
+                self.precios[posicion] = float(info['costo_por_unidad'])
+                self.unidades[posicion] = info['unidad_base']
+                afectadas.append(self._lineas_de([posicion]))
+
+            if nuevos:
+                # Los ingredientes nuevos se añaden al final y se enlazan con las
+                # líneas de receta que los usaban sin existir todavía.
+                primera = len(self.precios)
+                for i, nombre in enumerate(nuevos):
+                    self.indice_ingrediente[nombre] = primera + i
+                self.ingredientes.extend(nuevos)
+                self.precios = np.concatenate((self.precios, [float(info['costo_por_unidad']) for info in nuevos.values()]))
+                self.unidades = np.concatenate((self.unidades, np.array([info['unidad_base'] for info in nuevos.values()], dtype=object)))
+                lineas = self._lineas_faltantes_con(set(nuevos))
+                self.indices[lineas] = [self.indice_ingrediente[n] for n in self.nombres_linea[lineas]]
+                afectadas.append(lineas)
+                self._inverso = None
+
+            if afectadas:
+                self._recalcular(np.unique(self.fila[np.concatenate(afectadas)]))
+
+    def actualizar_receta(self, receta, id_anterior=None):
+        """Reemplaza (o añade al final) las líneas de una receta en la matriz."""
+        with self._lock:
+            buscado = id_anterior if id_anterior is not None else receta['id']
+            fila = self.indice_receta.get(buscado)
+            nombres, indices, cantidades = self._compilar_lineas(receta['ingredientes'])
+            if fila is None:
+                fila = len(self.recetas)
+                inicio = fin = self.indptr[-1]
+                self.recetas.append(receta['id'])
+                self.nombres = np.append(self.nombres, np.array([receta['nombre']], dtype=object))
+                self.unidades_receta = np.append(self.unidades_receta, np.array([receta['unidad_base']], dtype=object))
+                self.cantidad_base = np.append(self.cantidad_base, float(receta['cantidad_base']))
+                self.costos_base = np.append(self.costos_base, 0.0)
+                self.indptr = np.append(self.indptr, self.indptr[-1])
+            else:
+                inicio, fin = self.indptr[fila], self.indptr[fila + 1]
+                del self.indice_receta[buscado]
+                self.recetas[fila] = receta['id']
+                self.nombres[fila] = receta['nombre']
+                self.unidades_receta[fila] = receta['unidad_base']
+                self.cantidad_base[fila] = float(receta['cantidad_base'])
+            self.indice_receta[receta['id']] = fila
+            self._reemplazar_lineas(fila, inicio, fin, nombres, indices, cantidades)
+            self._recalcular(np.array([fila]))
+
+    def actualizar_recetas(self, recetas):
+        """Reemplaza o añade (por ID) muchas recetas, como ``Catalogo.guardar_recetas``.
+
+        A diferencia de llamar a ``actualizar_receta`` por cada una, los arrays
+        de líneas se rehacen una sola vez: las líneas conservadas y las nuevas
+        se intercalan por fila con un único ordenamiento estable.
+        """
+        with self._lock:
+            por_fila = {}
+            for receta in recetas:
+                fila = self.indice_receta.get(receta['id'])
+                if fila is None:
+                    fila = self.indice_receta[receta['id']] = len(self.recetas)
+                    self.recetas.append(receta['id'])
+                por_fila[fila] = receta
+            if not por_fila:
+                return
+            agregadas = len(self.recetas) - len(self.nombres)
+            if agregadas:
+                self.nombres = np.concatenate((self.nombres, np.empty(agregadas, dtype=object)))
+                self.unidades_receta = np.concatenate((self.unidades_receta, np.empty(agregadas, dtype=object)))
+                self.cantidad_base = np.concatenate((self.cantidad_base, np.zeros(agregadas)))
+                self.costos_base = np.concatenate((self.costos_base, np.zeros(agregadas)))
+            filas = np.fromiter(por_fila, dtype=np.int64, count=len(por_fila))
+            nuevas = list(por_fila.values())
+            self.nombres[filas] = np.array([r['nombre'] for r in nuevas], dtype=object)
+            self.unidades_receta[filas] = np.array([r['unidad_base'] for r in nuevas], dtype=object)
+            self.cantidad_base[filas] = [float(r['cantidad_base']) for r in nuevas]
+
+            nombres, indices, cantidades = self._compilar_lineas([ing for r in nuevas for ing in r['ingredientes']])
+            longitudes = np.concatenate((np.diff(self.indptr), np.zeros(agregadas, dtype=np.int64)))
+            conservadas = np.ones(len(self.recetas), dtype=bool)
+            conservadas[filas] = False
+            conservadas = conservadas[self.fila]
+            longitudes[filas] = [len(r['ingredientes']) for r in nuevas]
+            fila = np.concatenate((self.fila[conservadas], np.repeat(filas, longitudes[filas])))
+            orden = np.argsort(fila, kind='stable')
+            self.fila = fila[orden]
+            self.nombres_linea = np.concatenate((self.nombres_linea[conservadas], nombres))[orden]
+            self.indices = np.concatenate((self.indices[conservadas], indices))[orden]
+            self.cantidades = np.concatenate((self.cantidades[conservadas], cantidades))[orden]
+            self.indptr = np.concatenate(([0], np.cumsum(longitudes)))
+            self._inverso = None
+            self._recalcular(filas)
+
+    def eliminar_receta(self, receta_id):
+        """Quita una receta de la matriz."""
+        with self._lock:
+            fila = self.indice_receta.get(receta_id)
+            if fila is None:
+                return
+            inicio, fin = self.indptr[fila], self.indptr[fila + 1]
+            vacio = np.zeros(0)
+            self._reemplazar_lineas(fila, inicio, fin, vacio.astype(object), vacio.astype(np.int64), vacio)
+            del self.recetas[fila]
+            self.indice_receta = {r: i for i, r in enumerate(self.recetas)}
+            self.nombres = np.delete(self.nombres, fila)
+            self.unidades_receta = np.delete(self.unidades_receta, fila)
+            self.cantidad_base = np.delete(self.cantidad_base, fila)
+            self.costos_base = np.delete(self.costos_base, fila)
+            self.indptr = np.delete(self.indptr, fila + 1)
+            self.fila = np.repeat(np.arange(len(self.recetas)), np.diff(self.indptr))
+
+    def _reemplazar_lineas(self, fila, inicio, fin, nombres, indices, cantidades):
+        self.nombres_linea = np.concatenate((self.nombres_linea[:inicio], nombres, self.nombres_linea[fin:]))
+        self.indices = np.concatenate((self.indices[:inicio], indices, self.indices[fin:]))
+        self.cantidades = np.concatenate((self.cantidades[:inicio], cantidades, self.cantidades[fin:]))
+        self.indptr[fila + 1:] += len(indices) - (fin - inicio)
+        self.fila = np.repeat(np.arange(len(self.indptr) - 1), np.diff(self.indptr))
+        self._inverso = None
+
+    # --- Consultas ---
+
+    def factores(self, filas, cantidades):
+        """Factor de escala ``cantidad / cantidad_base`` (0 si la base es 0)."""
+        base = self.cantidad_base[filas]
+        cantidades = np.asarray(cantidades, dtype=np.float64)
+        return np.divide(cantidades, base, out=np.zeros_like(cantidades), where=base != 0)
+
+    def filas(self, receta_ids):
+        """Posición de cada receta en la matriz. Lanza KeyError si alguna no existe."""
+        return np.fromiter((self.indice_receta[r] for r in receta_ids), dtype=np.int64, count=len(receta_ids))
+
+    def costo(self, receta_id, cantidad=None):
+        """Costo de una receta, escalado a ``cantidad`` si se indica."""
+        with self._lock:
+            fila = self.indice_receta[receta_id]
+            if cantidad is None:
+                return float(self.costos_base[fila])
+            return float(self.costos_lote([(receta_id, cantidad)])[0])
+
+    def costos_lote(self, pares):
+        """Costos de una lista de pares ``(receta_id, cantidad)`` en una sola operación."""
+        if not len(pares):
+            return np.zeros(0)
+        receta_ids, cantidades = zip(*pares)
+        with self._lock:
+            filas = self.filas(receta_ids)
+            return self.costos_base[filas] * self.factores(filas, cantidades)
+
+    def plan_produccion(self, pares):
+        """Requerimiento total por ingrediente de un plan ``[(receta_id, cantidad), ...]``.
+
+        Escala las líneas de todas las recetas del plan a la vez y las suma por
+        ingrediente (una receta repetida se suma). Devuelve un DataFrame con
+        ``ingrediente``, ``unidad``, ``cantidad``, ``costo_unitario``,
+        ``costo_total`` y ``encontrado``, ordenado por unidad e ingrediente. Los
+        ingredientes que no existen en ``ingredientes_globales`` se agrupan por
+        nombre, con unidad vacía y costo 0. Lanza KeyError si una receta no existe.
+        """
+        columnas = ['ingrediente', 'unidad', 'cantidad', 'costo_unitario', 'costo_total', 'encontrado']
+        if not len(pares):
+            return pd.DataFrame(columns=columnas)
+        receta_ids, cantidades = zip(*pares)
+        with self._lock:
+            filas = self.filas(receta_ids)
+            longitudes = self.indptr[filas + 1] - self.indptr[filas]
+            lineas = _rangos(self.indptr[filas], self.indptr[filas + 1])
+            escaladas = self.cantidades[lineas] * np.repeat(self.factores(filas, cantidades), longitudes)
+            indices = self.indices[lineas]
+
+            encontradas = indices != SIN_INGREDIENTE
+            totales = np.bincount(indices[encontradas], weights=escaladas[encontradas], minlength=len(self.precios))
+            usados = np.flatnonzero(np.bincount(indices[encontradas], minlength=len(self.precios)))
+            plan = pd.DataFrame({
+                'ingrediente': [self.ingredientes[i] for i in usados],
+                'unidad': self.unidades[usados],
+                'cantidad': totales[usados],
+                'costo_unitario': self.precios[usados],
+                'encontrado': True,
+            })
+            faltantes = pd.Series(escaladas[~encontradas]).groupby(self.nombres_linea[lineas][~encontradas]).sum()
+
+        if len(faltantes):
+            plan = pd.concat([plan, pd.DataFrame({
+                'ingrediente': faltantes.index.astype(object),
+                'unidad': '',
+                'cantidad': faltantes.to_numpy(),
+                'costo_unitario': 0.0,
+                'encontrado': False,
+            })], ignore_index=True)
+        plan['costo_total'] = plan['cantidad'] * plan['costo_unitario']
+        return plan[columnas].sort_values(['unidad', 'ingrediente'], kind='stable').reset_index(drop=True)
+
+    def desglose(self, receta_id, cantidad):
+        """Líneas de una receta escalada: cantidad, unidad, costo unitario y total por ingrediente.
+
+        La columna ``encontrado`` es False para ingredientes que no existen en
+        ``ingredientes_globales``; su costo se cuenta como 0.
+        """
+        with self._lock:
+            fila = self.indice_receta[receta_id]
+            inicio, fin = self.indptr[fila], self.indptr[fila + 1]
+            factor = self.factores(np.array([fila]), [cantidad])[0]
+            indices = self.indices[inicio:fin]
+            cantidades = self.cantidades[inicio:fin] * factor
+            precios = self._precios_ext()[indices]
+            return pd.DataFrame({
+                'ingrediente': self.nombres_linea[inicio:fin],
+                'cantidad': cantidades,
+                'unidad': np.append(self.unidades, '')[indices],
+                'costo_unitario': precios,
+                'costo_total': cantidades * precios,
+                'encontrado': indices != SIN_INGREDIENTE,
+            })
+
+    def tendencia(self, historial, fechas, receta_ids=None):
+        """Costo base de las recetas en cada fecha, con los precios de ``historial``.
+
+        Usa la composición actual de las recetas y el precio que tenía cada
+        ingrediente en cada fecha (``HistorialPrecios.precios``), buscado por
+        nombre: un ingrediente eliminado hoy conserva su precio en las fechas
+        en que existía. Devuelve un DataFrame con una fila por fecha y una
+        columna por receta (todas si ``receta_ids`` es None); las fechas
+        anteriores al historial quedan en NaN.
+
+        Solo se calcula completo el costo de la primera fecha; para las
+        siguientes se suman los cambios de precio multiplicados por las líneas
+        que usan cada ingrediente, así que el trabajo depende de cuántos
+        precios cambian y no de fechas × líneas.
+        """
+        with self._lock:
+            filas = np.arange(len(self.recetas)) if receta_ids is None else self.filas(receta_ids)
+            lineas = _rangos(self.indptr[filas], self.indptr[filas + 1])
+            grupos = np.repeat(np.arange(len(filas)), self.indptr[filas + 1] - self.indptr[filas])
+            cantidades = self.cantidades[lineas]
+            indices = self.indices[lineas]
+            # Ingredientes usados: los globales por su columna y los que no
+            # existen hoy por nombre (pueden haber existido en esas fechas).
+            globales = np.unique(indices[indices != SIN_INGREDIENTE])
+            faltantes, columna_faltante = np.unique(
+                self.nombres_linea[lineas][indices == SIN_INGREDIENTE].astype(str), return_inverse=True)
+            columna = np.empty(len(lineas), dtype=np.int64)
+            columna[indices != SIN_INGREDIENTE] = np.searchsorted(globales, indices[indices != SIN_INGREDIENTE])
+            columna[indices == SIN_INGREDIENTE] = len(globales) + columna_faltante
+            nombres = [self.ingredientes[i] for i in globales] + list(faltantes)
+            ids = [self.recetas[f] for f in filas]
+
+        fechas = pd.DatetimeIndex(pd.to_datetime(np.atleast_1d(fechas)), name='fecha')
+        costos = np.full((len(fechas), len(filas)), np.nan)
+        con_datos = np.flatnonzero(historial.cubre(fechas))
+        if len(con_datos):
+            precios = historial.precios(fechas[con_datos], nombres)  # fechas × ingredientes usados
+            costos[con_datos[0]] = np.bincount(grupos, weights=cantidades * precios[0, columna], minlength=len(filas))
+            # Cambios de precio entre fechas consecutivas y las líneas afectadas por cada uno.
+            cambios = np.diff(precios, axis=0)
+            dias, usados = np.nonzero(cambios)
+            delta = cambios[dias, usados]
+            orden = np.argsort(columna, kind='stable')
+            inicio = np.searchsorted(columna[orden], np.arange(len(nombres) + 1))
+            por_cambio = inicio[usados + 1] - inicio[usados]
+            acumulado = np.cumsum(por_cambio)
+            variacion = np.zeros((len(con_datos) - 1, len(filas)))
+            desde = 0
+            while desde < len(dias):
+                # Bloques de cambios (consecutivos en fecha) de hasta TAM_BLOQUE_TENDENCIA líneas.
+                hasta = max(desde + 1, int(np.searchsorted(acumulado, acumulado[desde] - por_cambio[desde]
+                                                           + TAM_BLOQUE_TENDENCIA, side='right')))
+                afectadas = orden[_rangos(inicio[usados[desde:hasta]], inicio[usados[desde:hasta] + 1])]
+                repetir = por_cambio[desde:hasta]
+                primero, ultimo = dias[desde], dias[hasta - 1]
+                destino = (np.repeat(dias[desde:hasta] - primero, repetir)) * len(filas) + grupos[afectadas]
+                pesos = np.repeat(delta[desde:hasta], repetir) * cantidades[afectadas]
+                variacion[primero:ultimo + 1] += np.bincount(
+                    destino, weights=pesos, minlength=(ultimo - primero + 1) * len(filas)
+                ).reshape(ultimo - primero + 1, len(filas))
+                desde = hasta
+            costos[con_datos[1:]] = costos[con_datos[0]] + np.cumsum(variacion, axis=0)
+        return pd.DataFrame(costos, index=fechas, columns=pd.Index(ids, dtype=object))
+
+    def costos_en(self, historial, fecha):
+        """Como ``catalogo()``, pero con los precios vigentes en ``fecha``."""
+        with self._lock:
+            costos = self.tendencia(historial, [fecha]).iloc[0].to_numpy()
+            base = self.cantidad_base.copy()
+            return pd.DataFrame({
+                'id': list(self.recetas),
+                'nombre': self.nombres.copy(),
+                'cantidad_base': base,
+                'unidad_base': self.unidades_receta.copy(),
+                'costo_total': costos,
+                'costo_por_unidad': np.divide(costos, base, out=np.zeros_like(base), where=base != 0),
+            })
+
+    def catalogo(self):
+        """Costo base y costo por unidad producida de todas las recetas."""
+        with self._lock:
+            base = self.cantidad_base.copy()
+            costos = self.costos_base.copy()
+            return pd.DataFrame({
+                'id': list(self.recetas),
+                'nombre': self.nombres.copy(),
+                'cantidad_base': base,
+                'unidad_base': self.unidades_receta.copy(),
+                'costo_total': costos,
+                'costo_por_unidad': np.divide(costos, base, out=np.zeros_like(base), where=base != 0),
+            })
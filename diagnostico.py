@@ -0,0 +1,163 @@
+"""Instrumentación opcional de los reruns de la app.
+
+Cada interacción con Streamlit vuelve a ejecutar ``main()`` completo. Con el
+diagnóstico activado, ``Diagnostico.rerun`` mide cada rerun y las funciones
+``etapa`` y ``evento`` registran dentro de él el tiempo de cada etapa (CSS,
+datos, búsqueda, costos, render, guardado...) y los aciertos o fallos de las
+cachés. Cada rerun termina en:
+
+* un historial en memoria (los últimos ``HISTORIAL``) para el panel de
+  diagnóstico;
+* una línea JSON en un log que rota al superar ``max_bytes``;
+* opcionalmente, un perfil de cProfile, que solo se conserva si el rerun
+  está entre los ``perfiles`` más lentos.
+
+Sin un rerun en curso, ``etapa`` y ``evento`` no hacen nada.
+"""
+
+import collections
+import contextlib
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+
+HISTORIAL = 500
+
+# Cada rerun se ejecuta en el hilo de su sesión.
+_actual = threading.local()
+_NULO = contextlib.nullcontext()
+
+
+class _Medicion:
+    __slots__ = ('inicio', 'etapas', 'eventos')
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.etapas = {}
+        self.eventos = {}
+
+
+@contextlib.contextmanager
+def _medir_etapa(medicion, nombre):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        medicion.etapas[nombre] = medicion.etapas.get(nombre, 0.0) + time.perf_counter() - inicio
+
+
+def etapa(nombre):
+    """Context manager que suma el tiempo del bloque a la etapa ``nombre`` del rerun actual."""
+    medicion = getattr(_actual, 'medicion', None)
+    if medicion is None:
+        return _NULO
+    return _medir_etapa(medicion, nombre)
+
+
+def evento(clave, valor):
+    """Anota un evento del rerun actual, p. ej. ``evento('catalogo', 'hit')``."""
+    medicion = getattr(_actual, 'medicion', None)
+    if medicion is not None:
+        medicion.eventos[clave] = valor
+
+
+class Diagnostico:
+    """Historial, log rotativo y perfiles de los reruns (uno por proceso)."""
+
+    def __init__(self, ruta_log, max_bytes=5 * 1024 * 1024, copias=3, directorio_perfiles=None, perfiles=5):
+        self.ruta_log = ruta_log
+        self.max_bytes = max_bytes
+        self.copias = copias
+        self.directorio_perfiles = directorio_perfiles or os.path.join(os.path.dirname(ruta_log), 'perfiles')
+        self.max_perfiles = perfiles
+        self.historial = collections.deque(maxlen=HISTORIAL)
+        self.perfiles = []  # dicts con duracion, pagina, fecha y ruta, del más lento al más rápido
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def rerun(self, pagina, perfilar=False):
+        """Mide un rerun completo. ``pagina`` es la página que se va a dibujar."""
+        medicion = _actual.medicion = _Medicion()
+        perfil = None
+        if perfilar:
+            perfil = cProfile.Profile()
+            try:
+                perfil.enable()
+            except ValueError:
+                # Ya hay otro perfilador activo (otra sesión en Python 3.12+).
+                perfil = None
+        interrumpido = False
+        try:
+            yield
+        except BaseException:
+            # st.rerun() y st.stop() terminan el script con una excepción.
+            interrumpido = True
+            raise
+        finally:
+            if perfil is not None:
+                perfil.disable()
+            _actual.medicion = None
+            total = time.perf_counter() - medicion.inicio
+            registro = {
+                'fecha': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'pagina': pagina,
+                'total': total,
+                'etapas': medicion.etapas,
+                'eventos': medicion.eventos,
+                'interrumpido': interrumpido,
+            }
+            with self._lock:
+                self.historial.append(registro)
+                self._escribir_log(registro)
+                if perfil is not None:
+                    self._guardar_perfil(perfil, registro)
+
+    def _escribir_log(self, registro):
+        linea = json.dumps(registro, ensure_ascii=False) + '\n'
+        try:
+            os.makedirs(os.path.dirname(self.ruta_log) or '.', exist_ok=True)
+            if os.path.exists(self.ruta_log) and os.path.getsize(self.ruta_log) + len(linea) > self.max_bytes:
+                for i in range(self.copias - 1, 0, -1):
+                    if os.path.exists(f"{self.ruta_log}.{i}"):
+                        os.replace(f"{self.ruta_log}.{i}", f"{self.ruta_log}.{i + 1}")
+                os.replace(self.ruta_log, f"{self.ruta_log}.1")
+            with open(self.ruta_log, 'a', encoding='utf-8') as f:
+                f.write(linea)
+        except OSError:
+            # El diagnóstico nunca debe tumbar la app.
+            pass
+
+    def _guardar_perfil(self, perfil, registro):
+        """Conserva el perfil si el rerun está entre los más lentos."""
+        if len(self.perfiles) >= self.max_perfiles and registro['total'] <= self.perfiles[-1]['duracion']:
+            return
+        nombre = f"{time.strftime('%Y%m%d-%H%M%S')}_{registro['pagina']}_{registro['total'] * 1000:.0f}ms.prof"
+        ruta = os.path.join(self.directorio_perfiles, nombre)
+        try:
+            os.makedirs(self.directorio_perfiles, exist_ok=True)
+            perfil.dump_stats(ruta)
+        except OSError:
+            return
+        self.perfiles.append({'duracion': registro['total'], 'pagina': registro['pagina'],
+                              'fecha': registro['fecha'], 'ruta': ruta})
+        self.perfiles.sort(key=lambda p: -p['duracion'])
+        for sobrante in self.perfiles[self.max_perfiles:]:
+            with contextlib.suppress(OSError):
+                os.remove(sobrante['ruta'])
+        del self.perfiles[self.max_perfiles:]
+
+    def registros(self):
+        """Copia del historial en memoria, del más antiguo al más reciente."""
+        with self._lock:
+            return list(self.historial)
+
+    @staticmethod
+    def resumen_perfil(ruta, lineas=25):
+        """Texto de pstats con las funciones de mayor tiempo acumulado."""
+        salida = io.StringIO()
+        pstats.Stats(ruta, stream=salida).strip_dirs().sort_stats('cumulative').print_stats(lineas)
+        return salida.getvalue()
@@ -0,0 +1,176 @@
+"""Escritura diferida (write-behind) sobre un almacenamiento.
+
+``EscrituraDiferida`` envuelve un ``AlmacenJSON`` o ``AlmacenSQLite`` con la
+misma interfaz, pero las operaciones de escritura no tocan el disco: se validan
+contra la versión, se encolan y devuelven enseguida una versión nueva. Un hilo
+en segundo plano espera ``ventana`` segundos desde la primera operación
+pendiente para juntar las que lleguen mientras tanto y las aplica todas con un
+solo ``aplicar_lote`` (una lectura y una escritura atómica del JSON, o una
+transacción de SQLite).
+
+Las versiones que devuelve son lógicas ("d1", "d2"...): la app mantiene su
+catálogo en memoria al día con ellas sin esperar al disco. Si una escritura
+falla, la versión lógica avanza para que la app vuelva a cargar lo que de
+verdad quedó guardado. El resultado de cada operación se consulta con
+``resultado(version)``.
+
+Al cerrar el proceso (``atexit``) se escriben las operaciones pendientes, así
+que una operación aceptada solo se pierde si el proceso muere sin salir
+(``kill -9``, corte de luz).
+"""
+
+import atexit
+import threading
+import time
+
+from almacenamiento import ConflictoDeVersion
+
+VENTANA = 0.5  # segundos
+MAX_RESULTADOS = 1000
+
+
+class EscrituraDiferida:
+    """Cola de escrituras con un hilo que las agrupa y las persiste."""
+
+    def __init__(self, almacen, ventana=VENTANA):
+        self.almacen = almacen
+        self.ventana = ventana
+        self._lock = threading.Lock()
+        self._hay_pendientes = threading.Condition(self._lock)
+        self._escritura = threading.Lock()  # serializa los accesos al disco
+        self._pendientes = []  # (version, nombre, args, kwargs)
+        self._resultados = {}  # version -> None (ok) o la excepción
+        self._logica = 0
+        self._version_disco = almacen.version()
+        self._escribiendo = False
+        self._cerrado = False
+        self._hilo = threading.Thread(target=self._trabajar, name='escritura-diferida', daemon=True)
+        self._hilo.start()
+        atexit.register(self.cerrar)
+
+    # --- Interfaz del almacenamiento ---
+
+    def version(self):
+        """Versión lógica; avanza también si el archivo cambió fuera de la app."""
+        with self._lock:
+            if not self._pendientes and not self._escribiendo:
+                disco = self.almacen.version()
+                if disco != self._version_disco:
+                    self._version_disco = disco
+                    self._logica += 1
+            return f"d{self._logica}"
+
+    def cargar(self):
+        """Escribe lo pendiente y devuelve ``(data, version)`` del disco."""
+        with self._escritura:
+            self._escribir_pendientes()
+            data, disco = self.almacen.cargar()
+            with self._lock:
+                if disco != self._version_disco:
+                    self._version_disco = disco
+                    self._logica += 1
+                return data, f"d{self._logica}"
+
+    def guardar_todo(self, data, version_esperada=None):
+        return self._encolar('guardar_todo', (data,), {}, version_esperada)
+
+    def guardar_receta(self, receta, id_anterior=None, version_esperada=None):
+        return self._encolar('guardar_receta', (receta,), {'id_anterior': id_anterior}, version_esperada)
+
+    def guardar_recetas(self, recetas, version_esperada=None):
+        return self._encolar('guardar_recetas', (recetas,), {}, version_esperada)
+
+    def eliminar_receta(self, receta_id, version_esperada=None):
+        return self._encolar('eliminar_receta', (receta_id,), {}, version_esperada)
+
+    def guardar_ingredientes(self, ingredientes, eliminar=(), version_esperada=None):
+        return self._encolar('guardar_ingredientes', (ingredientes,), {'eliminar': tuple(eliminar)},
+                             version_esperada)
+
+    def eliminar_ingredientes(self, nombres, version_esperada=None):
+        return self.guardar_ingredientes({}, eliminar=nombres, version_esperada=version_esperada)
+
+    # --- Cola ---
+
+    def _encolar(self, nombre, args, kwargs, version_esperada):
+        with self._lock:
+            if self._cerrado:
+                raise RuntimeError("La escritura diferida ya está cerrada.")
+            if version_esperada is not None and version_esperada != f"d{self._logica}":
+                raise ConflictoDeVersion(nombre)
+            self._logica += 1
+            version = f"d{self._logica}"
+            self._pendientes.append((version, nombre, args, kwargs))
+            self._hay_pendientes.notify()
+            return version
+
+    def resultado(self, version):
+        """Estado de la operación que devolvió ``version``.
+
+        Devuelve ``(True, None)`` si ya se guardó, ``(True, excepcion)`` si
+        falló y ``(False, None)`` si sigue pendiente. Un resultado entregado
+        se olvida.
+        """
+        with self._lock:
+            if version in self._resultados:
+                return True, self._resultados.pop(version)
+            return False, None
+
+    def pendientes(self):
+        with self._lock:
+            return len(self._pendientes)
+
+    def _trabajar(self):
+        while True:
+            with self._lock:
+                while not self._pendientes and not self._cerrado:
+                    self._hay_pendientes.wait()
+                if self._cerrado:
+                    return
+            # Se espera la ventana para juntar las operaciones que lleguen.
+            time.sleep(self.ventana)
+            with self._escritura:
+                self._escribir_pendientes()
+
+    def _escribir_pendientes(self):
+        """Aplica toda la cola en un lote. Requiere tener ``_escritura``."""
+        with self._lock:
+            lote, self._pendientes = self._pendientes, []
+            if not lote:
+                return
+            self._escribiendo = True
+        errores = [None] * len(lote)
+        try:
+            disco, errores = self.almacen.aplicar_lote([(n, a, k) for _, n, a, k in lote],
+                                                       version_esperada=self._version_disco)
+        except Exception as e:
+            # ConflictoDeVersion (el archivo cambió fuera de la app), disco
+            # lleno, permisos...: nada del lote quedó guardado. La versión del
+            # disco conocida no cambia: si hubo un cambio externo, los lotes
+            # siguientes también chocan hasta que ``cargar`` lo lea.
+            disco, errores = None, [e] * len(lote)
+        with self._lock:
+            self._escribiendo = False
+            if disco is not None:
+                self._version_disco = disco
+            if any(errores):
+                # El catálogo en memoria ya no coincide con el disco: se
+                # fuerza que la app lo vuelva a cargar, aunque haya más
+                # operaciones en cola (``cargar`` las escribe antes de leer).
+                self._logica += 1
+            for (version, *_), error in zip(lote, errores):
+                self._resultados[version] = error
+            while len(self._resultados) > MAX_RESULTADOS:
+                del self._resultados[next(iter(self._resultados))]
+
+    def vaciar(self):
+        """Escribe ya todo lo pendiente (sin esperar la ventana)."""
+        with self._escritura:
+            self._escribir_pendientes()
+
+    def cerrar(self):
+        """Escribe lo pendiente y detiene el hilo. Se llama al salir del proceso."""
+        with self._lock:
+            self._cerrado = True
+            self._hay_pendientes.notify()
+        self.vaciar()
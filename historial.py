@@ -0,0 +1,246 @@
+"""Historial de precios de los ingredientes globales.
+
+Guardar precios reemplaza ``costo_por_unidad``; el historial conserva cada
+valor con su fecha para poder calcular costos en cualquier fecha pasada. Se
+guarda en un directorio como columnas de solo anexado:
+
+* ``fecha.i8``: segundos desde 1970 (hora local, sin zona) de cada registro;
+* ``ingrediente.i4``: ID del ingrediente;
+* ``precio.f8``: precio, o NaN si el ingrediente se eliminó;
+* ``ingredientes.jsonl``: nombre de cada ID, una línea por ingrediente.
+
+Registrar un cambio es añadir unos bytes al final de cada archivo; nada se
+reescribe. En memoria las columnas son arrays de NumPy y se ordenan una sola
+vez por (ingrediente, fecha) en una clave combinada, de modo que "el precio
+de estos ingredientes en estas fechas" es un único ``np.searchsorted`` para
+todas las combinaciones a la vez.
+
+Si un proceso muere a mitad de un anexado, al abrir se descartan los
+registros incompletos: cada archivo se recorta al último registro completo.
+"""
+
+import datetime
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+_COLUMNAS = {'fecha': np.int64, 'ingrediente': np.int32, 'precio': np.float64}
+_BITS_FECHA = 40  # la clave combinada es ingrediente << 40 | segundos desde el primer registro
+
+
+def a_segundos(fechas):
+    """Fechas (``datetime``, ``date``, texto o lista de ellos) como segundos desde 1970."""
+    return pd.DatetimeIndex(pd.to_datetime(np.atleast_1d(fechas))).as_unit('s').asi8
+
+
+class HistorialPrecios:
+    """Historial de solo anexado, compartido entre sesiones (uno por proceso).
+
+    ``version`` es la versión del catálogo con la que se concilió por última
+    vez (ver ``conciliar``).
+    """
+
+    def __init__(self, directorio):
+        self.directorio = directorio
+        self.version = None
+        self._lock = threading.RLock()
+        os.makedirs(directorio, exist_ok=True)
+        self._nombres = []
+        self._ids = {}
+        ruta = self._ruta('ingredientes.jsonl')
+        if os.path.exists(ruta):
+            completo = 0
+            with open(ruta, 'rb') as f:
+                for linea in f:
+                    if not linea.endswith(b'\n'):  # una línea sin terminar es un anexado interrumpido
+                        break
+                    nombre = json.loads(linea)
+                    self._ids[nombre] = len(self._nombres)
+                    self._nombres.append(nombre)
+                    completo += len(linea)
+            if completo != os.path.getsize(ruta):
+                os.truncate(ruta, completo)
+        self._columnas = self._leer_columnas()
+        self._indice = None
+
+    def _ruta(self, nombre):
+        return os.path.join(self.directorio, nombre)
+
+    def _archivo(self, columna):
+        tipo = np.dtype(_COLUMNAS[columna])
+        return self._ruta(f'{columna}.{tipo.kind}{tipo.itemsize}')
+
+    def _leer_columnas(self):
+        rutas = {nombre: self._archivo(nombre) for nombre in _COLUMNAS}
+        tamanos = {nombre: os.path.getsize(ruta) if os.path.exists(ruta) else 0 for nombre, ruta in rutas.items()}
+        # Se cuenta por bytes: un anexado interrumpido puede dejar un registro a medias al final.
+        registros = min(tamanos[nombre] // np.dtype(tipo).itemsize for nombre, tipo in _COLUMNAS.items())
+        columnas = {}
+        for nombre, tipo in _COLUMNAS.items():
+            if tamanos[nombre] != registros * np.dtype(tipo).itemsize:
+                os.truncate(rutas[nombre], registros * np.dtype(tipo).itemsize)
+            columnas[nombre] = (np.fromfile(rutas[nombre], dtype=tipo) if registros
+                                else np.zeros(0, dtype=tipo))
+        return columnas
+
+    def __len__(self):
+        return len(self._columnas['fecha'])
+
+    @property
+    def inicio(self):
+        """Fecha del primer registro, o None si el historial está vacío."""
+        with self._lock:
+            if not len(self):
+                return None
+            return pd.Timestamp(int(self._columnas['fecha'].min()), unit='s')
+
+    @property
+    def nombres(self):
+        return list(self._nombres)
+
+    # --- Escritura ---
+
+    def registrar(self, precios, fecha=None):
+        """Anexa precios ``{nombre: precio}`` con fecha ``fecha`` (por defecto, ahora).
+
+        Un precio None registra que el ingrediente se eliminó. Se pueden
+        registrar fechas anteriores a las existentes (p. ej. para cargar
+        listas de precios antiguas).
+        """
+        if not precios:
+            return
+        segundos = int(a_segundos(fecha or datetime.datetime.now().replace(microsecond=0))[0])
+        with self._lock:
+            nuevos = [n for n in precios if n not in self._ids]
+            if nuevos:
+                # Primero los nombres: un registro nunca apunta a un ID sin nombre.
+                with open(self._ruta('ingredientes.jsonl'), 'a', encoding='utf-8') as f:
+                    for nombre in nuevos:
+                        f.write(json.dumps(nombre, ensure_ascii=False) + '\n')
+                for nombre in nuevos:
+                    self._ids[nombre] = len(self._nombres)
+                    self._nombres.append(nombre)
+            nuevas = {
+                'fecha': np.full(len(precios), segundos, dtype=np.int64),
+                'ingrediente': np.fromiter((self._ids[n] for n in precios), dtype=np.int32, count=len(precios)),
+                'precio': np.fromiter((np.nan if p is None else p for p in precios.values()), dtype=np.float64,
+                                      count=len(precios)),
+            }
+            # La fecha va al final: marca el registro como completo.
+            for nombre in ('precio', 'ingrediente', 'fecha'):
+                with open(self._archivo(nombre), 'ab') as f:
+                    f.write(nuevas[nombre].tobytes())
+                self._columnas[nombre] = np.concatenate((self._columnas[nombre], nuevas[nombre]))
+            self._indice = None
+
+    def conciliar(self, ingredientes, version, fecha=None):
+        """Registra las diferencias entre el historial y los ingredientes actuales.
+
+        ``ingredientes`` es ``Catalogo.ingredientes``. Se anexan los precios
+        nuevos o cambiados y las bajas, todos con la misma fecha. Con el
+        historial vacío, registra el precio actual de todos los ingredientes.
+        """
+        with self._lock:
+            ultimos = self._ultimos()
+            cambios = {}
+            for nombre, info in ingredientes.items():
+                ingrediente_id = self._ids.get(nombre)
+                if ingrediente_id is None or not ultimos[ingrediente_id] == info.costo_por_unidad:
+                    cambios[nombre] = info.costo_por_unidad
+            for ingrediente_id in np.flatnonzero(~np.isnan(ultimos)):
+                if self._nombres[ingrediente_id] not in ingredientes:
+                    cambios[self._nombres[ingrediente_id]] = None
+            self.registrar(cambios, fecha)
+            self.version = version
+
+    # --- Consultas ---
+
+    def _orden(self):
+        """Clave combinada ordenada, precios en ese orden y fecha base."""
+        if self._indice is None:
+            fechas = self._columnas['fecha']
+            base = int(fechas.min()) if len(fechas) else 0
+            claves = (self._columnas['ingrediente'].astype(np.int64) << _BITS_FECHA) | (fechas - base)
+            orden = np.argsort(claves, kind='stable')  # a igual fecha gana el último anexado
+            self._indice = (claves[orden], self._columnas['precio'][orden], base)
+        return self._indice
+
+    def _ultimos(self):
+        """Último precio registrado de cada ID (NaN si se eliminó o no tiene registros)."""
+        claves, precios, _ = self._orden()
+        ultimos = np.full(len(self._nombres), np.nan)
+        if len(claves):
+            ids = claves >> _BITS_FECHA
+            fin = np.append(ids[1:] != ids[:-1], True)
+            ultimos[ids[fin]] = precios[fin]
+        return ultimos
+
+    def cubre(self, fechas):
+        """Qué ``fechas`` son posteriores al primer registro (tienen datos)."""
+        segundos = a_segundos(fechas)
+        with self._lock:
+            if not len(self):
+                return np.zeros(len(segundos), dtype=bool)
+            return segundos >= self._orden()[2]
+
+    def _buscar(self, segundos, nombres):
+        """Posición del registro vigente de cada (fecha, ingrediente), y si existe."""
+        claves, precios, base = self._orden()
+        ids = np.fromiter((self._ids.get(n, -1) for n in nombres), dtype=np.int64, count=len(nombres))
+        desplazamiento = np.clip(segundos - base, 0, (1 << _BITS_FECHA) - 1)
+        consulta = (np.maximum(ids, 0)[None, :] << _BITS_FECHA) | desplazamiento[:, None]
+        posicion = np.searchsorted(claves, consulta, side='right') - 1
+        valida = (posicion >= 0) & (ids[None, :] >= 0)
+        valida &= (claves[np.maximum(posicion, 0)] >> _BITS_FECHA) == ids[None, :]
+        return posicion, valida
+
+    def precios(self, fechas, nombres):
+        """Matriz fechas × ingredientes con el precio vigente en cada fecha.
+
+        ``fechas`` son instantes (un ``date`` es su medianoche). Un
+        ingrediente sin registros hasta esa fecha, o eliminado, vale 0, igual
+        que un ingrediente que no existe en ``ingredientes_globales``. Las
+        filas anteriores al primer registro del historial son NaN: no hay datos.
+        """
+        segundos = a_segundos(fechas)
+        resultado = np.zeros((len(segundos), len(nombres)))
+        with self._lock:
+            if not len(self):
+                resultado[:] = np.nan
+                return resultado
+            posicion, valida = self._buscar(segundos, nombres)
+            _, precios, base = self._orden()
+        encontrados = precios[posicion[valida]]
+        resultado[valida] = np.where(np.isnan(encontrados), 0.0, encontrados)
+        resultado[segundos < base] = np.nan
+        return resultado
+
+    def precios_en(self, fecha):
+        """Precios vigentes en ``fecha`` de los ingredientes que existían entonces, como Series."""
+        segundos = a_segundos(fecha)
+        with self._lock:
+            nombres = np.array(self._nombres, dtype=object)
+            if not len(self) or segundos[0] < self._orden()[2]:
+                return pd.Series(dtype='float64', name='costo_por_unidad')
+            posicion, valida = self._buscar(segundos, nombres)
+            precios = self._orden()[1]
+        vigentes = np.full(len(nombres), np.nan)
+        vigentes[valida[0]] = precios[posicion[0][valida[0]]]
+        existia = ~np.isnan(vigentes)
+        return pd.Series(vigentes[existia], index=pd.Index(nombres[existia], name='nombre'), name='costo_por_unidad')
+
+    def serie(self, nombre):
+        """Registros de un ingrediente en orden cronológico: ``fecha`` y ``costo_por_unidad``."""
+        with self._lock:
+            ingrediente_id = self._ids.get(nombre)
+            claves, precios, base = self._orden()
+        if ingrediente_id is None:
+            return pd.DataFrame({'fecha': pd.Series(dtype='datetime64[s]'), 'costo_por_unidad': pd.Series(dtype=float)})
+        inicio, fin = np.searchsorted(claves, [ingrediente_id << _BITS_FECHA, (ingrediente_id + 1) << _BITS_FECHA])
+        return pd.DataFrame({
+            'fecha': pd.to_datetime((claves[inicio:fin] & ((1 << _BITS_FECHA) - 1)) + base, unit='s'),
+            'costo_por_unidad': precios[inicio:fin],
+        })
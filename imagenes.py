@@ -0,0 +1,106 @@
+"""Miniaturas de las imágenes de recetas con caché en disco.
+
+Cada miniatura se identifica por la ruta de origen, su fecha de modificación,
+el ancho y el formato de salida, así que al reemplazar una imagen se genera una
+nueva sin invalidar nada a mano. La caché tiene un tamaño máximo en bytes y,
+al superarlo, se borran primero las miniaturas usadas hace más tiempo (LRU por
+fecha de modificación, que se actualiza en cada acierto).
+"""
+
+import functools
+import hashlib
+import os
+import tempfile
+import threading
+
+CACHE_DIR = '.cache/miniaturas'
+CACHE_MAX_BYTES = 200 * 1024 * 1024
+FORMATO = None  # None: WEBP si Pillow lo soporta, si no JPEG
+CALIDAD = 80
+
+_EXTENSIONES = {'WEBP': '.webp', 'JPEG': '.jpg'}
+_OPCIONES = {'WEBP': {'method': 4}, 'JPEG': {'optimize': True, 'progressive': True}}
+_lock = threading.Lock()
+
+
+@functools.cache
+def _formato_por_defecto():
+    # PIL se importa solo cuando hace falta una miniatura, no al arrancar la app.
+    from PIL import features
+    return 'WEBP' if features.check('webp') else 'JPEG'
+
+
+def _clave(ruta, mtime_ns, ancho, formato, calidad):
+    texto = f"{os.path.abspath(ruta)}|{mtime_ns}|{ancho}|{formato}|{calidad}"
+    return hashlib.sha1(texto.encode('utf-8')).hexdigest()
+
+
+def _generar(ruta, destino, ancho, formato, calidad):
+    from PIL import Image, ImageOps
+
+    with Image.open(ruta) as img:
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ('RGB', 'RGBA') or (formato == 'JPEG' and img.mode == 'RGBA'):
+            img = img.convert('RGB')
+        if img.width > ancho:
+            img.thumbnail((ancho, ancho * 10), Image.Resampling.LANCZOS)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(destino), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                img.save(f, formato, quality=calidad, **_OPCIONES[formato])
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, destino)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+
+def _recortar(directorio, limite_bytes, conservar):
+    """Borra las miniaturas menos usadas hasta quedar bajo ``limite_bytes``."""
+    entradas = []
+    total = 0
+    with os.scandir(directorio) as it:
+        for entrada in it:
+            if entrada.is_file() and not entrada.name.endswith('.tmp'):
+                st = entrada.stat()
+                total += st.st_size
+                if entrada.path != conservar:
+                    entradas.append((st.st_mtime_ns, st.st_size, entrada.path))
+    if total <= limite_bytes:
+        return
+    for _, tamano, ruta in sorted(entradas):
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
+        total -= tamano
+        if total <= limite_bytes:
+            break
+
+
+def miniatura(ruta, ancho, formato=FORMATO, calidad=CALIDAD, directorio=CACHE_DIR, limite_bytes=CACHE_MAX_BYTES):
+    """Devuelve la ruta de una versión reducida de ``ruta`` con ``ancho`` píxeles como máximo.
+
+    Si ``ruta`` no es un archivo local (por ejemplo una URL) o no se puede
+    procesar, devuelve ``ruta`` sin cambios para que se muestre el original.
+    """
+    try:
+        mtime_ns = os.stat(ruta).st_mtime_ns
+    except (OSError, TypeError, ValueError):
+        return ruta
+    formato = formato or _formato_por_defecto()
+    destino = os.path.join(directorio, _clave(ruta, mtime_ns, ancho, formato, calidad) + _EXTENSIONES[formato])
+    try:
+        os.utime(destino)
+        return destino
+    except FileNotFoundError:
+        pass
+    try:
+        os.makedirs(directorio, exist_ok=True)
+        _generar(ruta, destino, ancho, formato, calidad)
+    except OSError:
+        return ruta
+    with _lock:
+        _recortar(directorio, limite_bytes, destino)
+    return destino
@@ -0,0 +1,124 @@
+"""Importación de listas de precios desde Excel.
+
+La hoja se lee en modo ``read_only`` de openpyxl, que recorre el XML fila a
+fila sin cargar el libro entero, y se convierte en bloques de ``TAM_BLOQUE``
+filas con operaciones vectorizadas de pandas. Antes de guardar se calcula la
+diferencia con los ingredientes actuales (altas, bajas y cambios) para mostrarla
+y escribir solo las filas que cambian.
+"""
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+HOJA = 'Ingredientes'
+COLUMNAS = ['Nombre', 'Unidad_Base', 'Costo_Por_Unidad']
+TAM_BLOQUE = 10000
+
+
+class ErrorImportacion(Exception):
+    """El archivo no tiene el formato esperado."""
+
+
+def _convertir_bloque(filas, primera_fila):
+    """Valida y convierte un bloque de filas crudas. Devuelve ``(validas, errores)``."""
+    bloque = pd.DataFrame(filas, columns=COLUMNAS)
+    bloque.index = pd.RangeIndex(primera_fila, primera_fila + len(bloque), name='fila')
+
+    nombre = bloque['Nombre'].astype('string').str.strip()
+    vacio = nombre.isna() | (nombre == '')
+    costo = pd.to_numeric(bloque['Costo_Por_Unidad'], errors='coerce')
+    costo_invalido = ~vacio & (costo.isna() | ~np.isfinite(costo) | (costo < 0))
+
+    errores = pd.DataFrame({
+        'Nombre': nombre[costo_invalido],
+        'Costo_Por_Unidad': bloque.loc[costo_invalido, 'Costo_Por_Unidad'],
+        'motivo': 'Costo vacío, no numérico o negativo',
+    })
+    ok = ~vacio & ~costo_invalido
+    validas = pd.DataFrame({
+        'nombre': nombre[ok].astype(object),
+        'unidad_base': bloque.loc[ok, 'Unidad_Base'].astype('string').str.strip().fillna('').astype(object),
+        'costo_por_unidad': costo[ok].astype(np.float64),
+    })
+    return validas, errores
+
+
+def leer_precios(archivo, hoja=HOJA, tam_bloque=TAM_BLOQUE):
+    """Lee la hoja de precios en streaming.
+
+    Devuelve ``(precios, errores)``: un DataFrame con columnas ``nombre``,
+    ``unidad_base`` y ``costo_por_unidad`` (una fila por ingrediente; si un
+    nombre se repite gana la última fila) y otro con las filas descartadas y
+    el motivo. Lanza ``ErrorImportacion`` si falta la hoja o alguna columna.
+    """
+    libro = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        if hoja not in libro.sheetnames:
+            raise ErrorImportacion(f"El archivo Excel debe tener una hoja llamada '{hoja}'.")
+        filas = libro[hoja].iter_rows(values_only=True)
+        encabezado = [str(c).strip() if c is not None else '' for c in next(filas, ())]
+        faltantes = [c for c in COLUMNAS if c not in encabezado]
+        if faltantes:
+            raise ErrorImportacion(f"El archivo Excel debe tener las columnas: {', '.join(COLUMNAS)}")
+        posiciones = [encabezado.index(c) for c in COLUMNAS]
+
+        validas, errores, bloque = [], [], []
+        primera_fila = 2  # fila 1 = encabezado, como la numera Excel
+        for fila in filas:
+            bloque.append(tuple(fila[p] if p < len(fila) else None for p in posiciones))
+            if len(bloque) == tam_bloque:
+                v, e = _convertir_bloque(bloque, primera_fila)
+                validas.append(v)
+                errores.append(e)
+                primera_fila += len(bloque)
+                bloque = []
+        if bloque:
+            v, e = _convertir_bloque(bloque, primera_fila)
+            validas.append(v)
+            errores.append(e)
+    finally:
+        libro.close()
+
+    vacio_precios = pd.DataFrame({'nombre': pd.Series(dtype=object), 'unidad_base': pd.Series(dtype=object),
+                                  'costo_por_unidad': pd.Series(dtype=np.float64)})
+    precios = pd.concat(validas) if validas else vacio_precios
+    precios = precios.drop_duplicates('nombre', keep='last').reset_index(drop=True)
+    errores = pd.concat(errores) if errores else pd.DataFrame(columns=['Nombre', 'Costo_Por_Unidad', 'motivo'])
+    return precios, errores
+
+
+def calcular_diferencias(actuales, precios):
+    """Compara los ingredientes actuales con los precios importados.
+
+    ``actuales`` tiene el mismo formato que ``precios`` (columnas ``nombre``,
+    ``unidad_base`` y ``costo_por_unidad``), como ``Catalogo.tabla_ingredientes``.
+
+    Devuelve un dict con tres DataFrames: ``agregados`` y ``cambiados``
+    (columnas ``nombre``, ``unidad_base``, ``costo_por_unidad`` y, en los
+    cambiados, ``unidad_anterior`` y ``costo_anterior``) y ``eliminados``
+    (ingredientes actuales que no aparecen en el archivo). Si la unidad viene
+    vacía se conserva la actual.
+    """
+    actual = actuales.rename(columns={'unidad_base': 'unidad_anterior', 'costo_por_unidad': 'costo_anterior'})
+    union = actual.merge(precios, on='nombre', how='outer', indicator=True, sort=False)
+    sin_unidad = union['unidad_base'].isna() | (union['unidad_base'] == '')
+    union['unidad_base'] = union['unidad_base'].where(~sin_unidad, union['unidad_anterior'].fillna(''))
+
+    ambos = union['_merge'] == 'both'
+    distinto = (union['costo_por_unidad'] != union['costo_anterior']) | (union['unidad_base'] != union['unidad_anterior'])
+    columnas = ['nombre', 'unidad_base', 'costo_por_unidad']
+    return {
+        'agregados': union.loc[union['_merge'] == 'right_only', columnas].reset_index(drop=True),
+        'cambiados': union.loc[ambos & distinto, columnas + ['unidad_anterior', 'costo_anterior']].reset_index(drop=True),
+        'eliminados': union.loc[union['_merge'] == 'left_only', ['nombre', 'unidad_anterior', 'costo_anterior']]
+                           .reset_index(drop=True),
+    }
+
+
+def a_ingredientes(df):
+    """Convierte filas ``nombre/unidad_base/costo_por_unidad`` al formato de ``ingredientes_globales``."""
+    return {
+        nombre: {"unidad_base": unidad, "costo_por_unidad": float(costo)}
+        for nombre, unidad, costo in zip(df['nombre'], df['unidad_base'], df['costo_por_unidad'])
+    }
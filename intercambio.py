@@ -0,0 +1,354 @@
+"""Exportación e importación del catálogo completo.
+
+El catálogo se exporta como cuatro tablas normalizadas:
+
+* ``recetas``: una fila por receta, con su costo total y por unidad;
+* ``lineas``: una fila por ingrediente de cada receta, con su costo;
+* ``pasos``: una fila por paso de cada receta;
+* ``ingredientes``: los ingredientes globales (la misma hoja que lee la
+  importación de precios).
+
+Hay tres formatos: un libro de Excel con una hoja por tabla (openpyxl en modo
+``write_only``), y un ZIP con un CSV o un Parquet por tabla. En los tres las
+tablas se generan y se escriben en bloques de ``TAM_BLOQUE`` recetas, así que
+la memoria usada no depende del tamaño del catálogo. ``leer_recetas`` lee los
+mismos formatos, también por bloques, para importar recetas en lote.
+"""
+
+import contextlib
+import io
+import zipfile
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+
+from importacion import ErrorImportacion
+
+TAM_BLOQUE = 5000
+
+# Hoja (o archivo dentro del ZIP) -> columnas, en el orden de exportación.
+TABLAS = {
+    'Recetas': ['ID', 'Nombre', 'Imagen', 'Cantidad_Base', 'Unidad_Base', 'Costo_Total', 'Costo_Por_Unidad'],
+    'Lineas': ['Receta_ID', 'Posicion', 'Ingrediente', 'Cantidad', 'Unidad', 'Costo_Unitario', 'Costo'],
+    'Pasos': ['Receta_ID', 'Numero', 'Texto'],
+    'Ingredientes': ['Nombre', 'Unidad_Base', 'Costo_Por_Unidad'],
+}
+# Columnas que hacen falta para importar; los costos se recalculan siempre.
+REQUERIDAS = {
+    'Recetas': ['ID', 'Nombre', 'Cantidad_Base', 'Unidad_Base'],
+    'Lineas': ['Receta_ID', 'Ingrediente', 'Cantidad'],
+    'Pasos': ['Receta_ID', 'Texto'],
+}
+_TEXTO = {'ID', 'Nombre', 'Imagen', 'Unidad_Base', 'Receta_ID', 'Ingrediente', 'Unidad', 'Texto'}
+_ENTERO = {'Posicion', 'Numero'}
+
+FORMATOS = {
+    'xlsx': ('.xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'csv': ('.zip', 'application/zip'),
+    'parquet': ('.zip', 'application/zip'),
+}
+
+
+# --- EXPORTACIÓN ---
+
+class _Instantanea:
+    """Recetas e ingredientes del catálogo en un momento dado.
+
+    El catálogo reemplaza sus listas y mapas en cada cambio (copia en
+    escritura), así que basta con guardar las referencias para exportar un
+    estado coherente aunque otra sesión guarde mientras tanto.
+    """
+
+    def __init__(self, catalogo):
+        self.recetas = catalogo.recetas
+        self.ingredientes = catalogo.ingredientes
+        self.nombres = np.array(catalogo.nombres_internos, dtype=object)
+        total = len(self.nombres)
+        # Precio y unidad por ID interno; los ingredientes sin datos globales cuestan 0.
+        self.precio = np.zeros(total)
+        self.unidad = np.full(total, '', dtype=object)
+        for nombre, info in self.ingredientes.items():
+            i = catalogo.id_ingrediente(nombre)
+            self.precio[i] = info.costo_por_unidad
+            self.unidad[i] = info.unidad_base
+
+    def bloques(self, tabla, tam_bloque):
+        """DataFrames sucesivos de ``tabla`` con las columnas de ``TABLAS``."""
+        if tabla == 'Ingredientes':
+            nombres = list(self.ingredientes)
+            for inicio in range(0, len(nombres), tam_bloque):
+                parte = nombres[inicio:inicio + tam_bloque]
+                yield pd.DataFrame({
+                    'Nombre': pd.Series(parte, dtype=object),
+                    'Unidad_Base': pd.Series([self.ingredientes[n].unidad_base for n in parte], dtype=object),
+                    'Costo_Por_Unidad': pd.Series([self.ingredientes[n].costo_por_unidad for n in parte],
+                                                  dtype='float64'),
+                })
+            return
+        for inicio in range(0, len(self.recetas), tam_bloque):
+            yield getattr(self, f'_{tabla.lower()}')(self.recetas[inicio:inicio + tam_bloque])
+
+    @staticmethod
+    def _longitudes(recetas, atributo):
+        return np.fromiter((len(getattr(r, atributo)) for r in recetas), dtype=np.int64, count=len(recetas))
+
+    def _lineas_bloque(self, recetas):
+        longitudes = self._longitudes(recetas, 'ingredientes')
+        ids = np.frombuffer(b''.join(r.ingredientes.tobytes() for r in recetas), dtype=np.int64)
+        cantidades = np.frombuffer(b''.join(r.cantidades.tobytes() for r in recetas), dtype=np.float64)
+        return longitudes, ids, cantidades, cantidades * self.precio[ids]
+
+    def _recetas(self, recetas):
+        longitudes, _, _, costos = self._lineas_bloque(recetas)
+        total = np.bincount(np.repeat(np.arange(len(recetas)), longitudes), weights=costos, minlength=len(recetas))
+        base = np.fromiter((r.cantidad_base for r in recetas), dtype=np.float64, count=len(recetas))
+        return pd.DataFrame({
+            'ID': pd.Series([r.id for r in recetas], dtype=object),
+            'Nombre': pd.Series([r.nombre for r in recetas], dtype=object),
+            'Imagen': pd.Series([r.imagen for r in recetas], dtype=object),
+            'Cantidad_Base': base,
+            'Unidad_Base': pd.Series([r.unidad_base for r in recetas], dtype=object),
+            'Costo_Total': total,
+            'Costo_Por_Unidad': np.divide(total, base, out=np.zeros_like(base), where=base != 0),
+        })
+
+    def _lineas(self, recetas):
+        longitudes, ids, cantidades, costos = self._lineas_bloque(recetas)
+        inicios = np.repeat(np.cumsum(longitudes) - longitudes, longitudes)
+        return pd.DataFrame({
+            'Receta_ID': np.repeat(np.array([r.id for r in recetas], dtype=object), longitudes),
+            'Posicion': np.arange(len(ids), dtype=np.int64) - inicios + 1,
+            'Ingrediente': self.nombres[ids],
+            'Cantidad': cantidades,
+            'Unidad': self.unidad[ids],
+            'Costo_Unitario': self.precio[ids],
+            'Costo': costos,
+        })
+
+    def _pasos(self, recetas):
+        longitudes = self._longitudes(recetas, 'pasos')
+        inicios = np.repeat(np.cumsum(longitudes) - longitudes, longitudes)
+        return pd.DataFrame({
+            'Receta_ID': np.repeat(np.array([r.id for r in recetas], dtype=object), longitudes),
+            'Numero': np.arange(int(longitudes.sum()), dtype=np.int64) - inicios + 1,
+            'Texto': pd.Series([p for r in recetas for p in r.pasos], dtype=object),
+        })
+
+
+def _exportar_xlsx(instantanea, destino, tam_bloque):
+    # En modo write_only cada hoja se vuelca a disco a medida que se añaden filas.
+    libro = Workbook(write_only=True)
+    for tabla, columnas in TABLAS.items():
+        hoja = libro.create_sheet(tabla)
+        hoja.append(columnas)
+        for bloque in instantanea.bloques(tabla, tam_bloque):
+            for fila in bloque.itertuples(index=False, name=None):
+                hoja.append(fila)
+    libro.save(destino)
+
+
+def _exportar_csv(instantanea, destino, tam_bloque):
+    with zipfile.ZipFile(destino, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for tabla in TABLAS:
+            with zf.open(f'{tabla.lower()}.csv', 'w') as f, io.TextIOWrapper(f, encoding='utf-8', newline='') as texto:
+                texto.write(','.join(TABLAS[tabla]) + '\n')
+                for bloque in instantanea.bloques(tabla, tam_bloque):
+                    bloque.to_csv(texto, header=False, index=False)
+
+
+def _esquema_parquet(tabla):
+    import pyarrow as pa
+
+    def tipo(columna):
+        if columna in _TEXTO:
+            return pa.string()
+        return pa.int64() if columna in _ENTERO else pa.float64()
+    return pa.schema([(c, tipo(c)) for c in TABLAS[tabla]])
+
+
+def _exportar_parquet(instantanea, destino, tam_bloque):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # Parquet ya va comprimido: el ZIP solo agrupa los archivos.
+    with zipfile.ZipFile(destino, 'w', zipfile.ZIP_STORED) as zf:
+        for tabla in TABLAS:
+            esquema = _esquema_parquet(tabla)
+            with zf.open(f'{tabla.lower()}.parquet', 'w') as f, pq.ParquetWriter(f, esquema) as escritor:
+                for bloque in instantanea.bloques(tabla, tam_bloque):
+                    # Un grupo de filas por bloque.
+                    escritor.write_table(pa.Table.from_pandas(bloque, schema=esquema, preserve_index=False))
+
+
+def exportar(catalogo, destino, formato, tam_bloque=TAM_BLOQUE):
+    """Escribe el catálogo completo en ``destino`` (ruta o archivo binario).
+
+    ``formato`` es una clave de ``FORMATOS``: ``'xlsx'``, ``'csv'`` o
+    ``'parquet'``. Los costos se calculan con los precios del momento.
+    """
+    escritores = {'xlsx': _exportar_xlsx, 'csv': _exportar_csv, 'parquet': _exportar_parquet}
+    escritores[formato](_Instantanea(catalogo), destino, tam_bloque)
+
+
+# --- IMPORTACIÓN ---
+
+def detectar_formato(nombre_archivo, archivo):
+    """Formato de un archivo exportado: por extensión, o por el contenido del ZIP."""
+    if nombre_archivo.lower().endswith('.xlsx'):
+        return 'xlsx'
+    try:
+        with zipfile.ZipFile(archivo) as zf:
+            nombres = zf.namelist()
+    except zipfile.BadZipFile:
+        raise ErrorImportacion("El archivo debe ser un Excel (.xlsx) o un ZIP exportado desde la app.")
+    finally:
+        archivo.seek(0)
+    for formato in ('parquet', 'csv'):
+        if 'recetas.' + formato in nombres:
+            return formato
+    raise ErrorImportacion("El ZIP debe contener 'recetas.csv' o 'recetas.parquet'.")
+
+
+@contextlib.contextmanager
+def _lector(archivo, formato, tam_bloque):
+    """Función ``tabla -> iterador de DataFrames`` (o None si la tabla no está)."""
+    if formato == 'xlsx':
+        libro = load_workbook(archivo, read_only=True, data_only=True)
+
+        def leer(tabla):
+            if tabla not in libro.sheetnames:
+                return None
+            return _bloques_filas(libro[tabla].iter_rows(values_only=True), tam_bloque)
+        try:
+            yield leer
+        finally:
+            libro.close()
+        return
+
+    with zipfile.ZipFile(archivo) as zf:
+        def leer(tabla):
+            nombre = f'{tabla.lower()}.{formato}'
+            if nombre not in zf.namelist():
+                return None
+            if formato == 'csv':
+                return pd.read_csv(zf.open(nombre), dtype=str, keep_default_na=False, chunksize=tam_bloque)
+            try:
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise ErrorImportacion("Para importar archivos Parquet hace falta instalar pyarrow.")
+            return (lote.to_pandas() for lote in pq.ParquetFile(zf.open(nombre)).iter_batches(batch_size=tam_bloque))
+        yield leer
+
+
+def _bloques_filas(filas, tam_bloque):
+    encabezado = [str(c).strip() if c is not None else '' for c in next(filas, ())]
+    bloque, emitidos = [], 0
+    for fila in filas:
+        bloque.append(fila[:len(encabezado)] + (None,) * (len(encabezado) - len(fila)))
+        if len(bloque) == tam_bloque:
+            yield pd.DataFrame(bloque, columns=encabezado)
+            bloque, emitidos = [], emitidos + 1
+    if bloque or not emitidos:
+        yield pd.DataFrame(bloque, columns=encabezado)
+
+
+def _texto(serie):
+    return serie.astype('string').str.strip()
+
+
+def _leer_tabla(leer, tabla, errores):
+    """Recorre ``tabla`` validando cada bloque; produce ``(fila, columnas...)`` por fila válida."""
+    bloques = leer(tabla)
+    if bloques is None:
+        if tabla == 'Pasos':
+            return
+        raise ErrorImportacion(f"Falta la tabla '{tabla}'.")
+    primera_fila = 2  # fila 1 = encabezado
+    for bloque in bloques:
+        faltantes = [c for c in REQUERIDAS[tabla] if c not in bloque.columns]
+        if faltantes:
+            raise ErrorImportacion(f"A la tabla '{tabla}' le faltan las columnas: {', '.join(faltantes)}")
+        filas = pd.RangeIndex(primera_fila, primera_fila + len(bloque))
+        primera_fila += len(bloque)
+        bloque = bloque.set_axis(filas)
+
+        if tabla == 'Recetas':
+            claves = [_texto(bloque['ID']), _texto(bloque['Nombre'])]
+            numero = pd.to_numeric(bloque['Cantidad_Base'], errors='coerce')
+            otras = [_texto(bloque['Unidad_Base']).fillna(''),
+                     _texto(bloque['Imagen']).fillna('') if 'Imagen' in bloque else pd.Series('', index=filas)]
+            motivo_numero = 'Cantidad_Base vacía, no numérica o negativa'
+        elif tabla == 'Lineas':
+            claves = [_texto(bloque['Receta_ID']), _texto(bloque['Ingrediente'])]
+            numero = pd.to_numeric(bloque['Cantidad'], errors='coerce')
+            orden = (pd.to_numeric(bloque['Posicion'], errors='coerce') if 'Posicion' in bloque
+                     else pd.Series(np.nan, index=filas))
+            otras = [orden.fillna(np.inf)]
+            motivo_numero = 'Cantidad vacía, no numérica o negativa'
+        else:
+            claves = [_texto(bloque['Receta_ID'])]
+            numero = (pd.to_numeric(bloque['Numero'], errors='coerce') if 'Numero' in bloque
+                      else pd.Series(np.nan, index=filas))
+            otras = [bloque['Texto'].astype('string').fillna('').astype(object)]  # un paso puede estar vacío
+            motivo_numero = None
+
+        vacia = pd.Series(False, index=filas)
+        for clave in claves:
+            vacia |= clave.isna() | (clave == '')
+        if motivo_numero:
+            invalido = ~vacia & (numero.isna() | ~np.isfinite(numero) | (numero < 0))
+        else:
+            invalido = pd.Series(False, index=filas)
+            numero = numero.fillna(np.inf)
+        for fila in filas[vacia]:
+            errores.append((tabla, fila, 'Faltan datos obligatorios'))
+        for fila in filas[invalido]:
+            errores.append((tabla, fila, motivo_numero))
+        ok = (~vacia & ~invalido).to_numpy()
+        yield from zip(filas[ok], *(c[ok].astype(object) for c in claves), numero[ok].astype(float), *(o[ok] for o in otras))
+
+
+def _numero(valor):
+    """Cantidad como la guarda la app: ``int`` si es entera (12, no 12.0)."""
+    return int(valor) if valor.is_integer() else valor
+
+
+def leer_recetas(archivo, formato, tam_bloque=TAM_BLOQUE):
+    """Lee recetas en cualquiera de los formatos de exportación.
+
+    Devuelve ``(recetas, errores)``: la lista de recetas en el formato de
+    dicts del almacenamiento (en el orden del archivo; si un ID se repite gana
+    la última fila) y un DataFrame ``tabla``/``fila``/``motivo`` con las filas
+    descartadas. Los costos del archivo se ignoran. Lanza ``ErrorImportacion``
+    si falta una tabla o una columna obligatoria.
+    """
+    errores = []
+    recetas = {}
+    lineas = {}
+    pasos = {}
+    with _lector(archivo, formato, tam_bloque) as leer:
+        for fila, receta_id, nombre, cantidad_base, unidad_base, imagen in _leer_tabla(leer, 'Recetas', errores):
+            recetas[receta_id] = {
+                "id": receta_id,
+                "nombre": nombre,
+                "imagen": imagen,
+                "cantidad_base": _numero(cantidad_base),
+                "unidad_base": unidad_base,
+            }
+        for fila, receta_id, ingrediente, cantidad, posicion in _leer_tabla(leer, 'Lineas', errores):
+            if receta_id not in recetas:
+                errores.append(('Lineas', fila, f"La receta '{receta_id}' no está en la tabla Recetas"))
+                continue
+            lineas.setdefault(receta_id, []).append((posicion, fila, ingrediente, _numero(cantidad)))
+        for fila, receta_id, numero, texto in _leer_tabla(leer, 'Pasos', errores):
+            if receta_id not in recetas:
+                errores.append(('Pasos', fila, f"La receta '{receta_id}' no está en la tabla Recetas"))
+                continue
+            pasos.setdefault(receta_id, []).append((numero, fila, texto))
+
+    for receta_id, receta in recetas.items():
+        receta["ingredientes"] = [{"nombre": n, "cantidad": c} for _, _, n, c in sorted(lineas.get(receta_id, []))]
+        receta["pasos"] = [t for _, _, t in sorted(pasos.get(receta_id, []))]
+    errores = pd.DataFrame(errores, columns=['tabla', 'fila', 'motivo'])
+    return list(recetas.values()), errores
@@ -0,0 +1,227 @@
+"""Modelo en memoria del catálogo de recetas.
+
+``load_data`` convierte el JSON (o la base SQLite) en un ``Catalogo``:
+
+* cada receta es un ``Receta`` con ``__slots__`` en vez de un dict;
+* los nombres de ingrediente se internan en enteros, y las líneas de una
+  receta son dos arrays compactos (IDs de ingrediente y cantidades); la
+  tabla de nombres internados solo crece, también al recargar, así que un ID
+  nunca cambia de nombre;
+* el catálogo mantiene los mapas ID de receta -> posición y nombre de
+  ingrediente -> ID, de modo que buscar una receta o validar un ID es O(1).
+
+El formato de dicts sigue siendo el de intercambio con el almacenamiento:
+``Catalogo.a_dict`` y ``Catalogo.a_data`` lo reconstruyen cuando hace falta.
+Las modificaciones nunca alteran listas o mapas que otro hilo pueda estar
+leyendo: se reemplazan por copias (copia en escritura).
+"""
+
+from array import array
+from dataclasses import dataclass
+
+from versionado import Versionado
+
+
+@dataclass(slots=True)
+class Ingrediente:
+    unidad_base: str
+    costo_por_unidad: float
+
+
+@dataclass(slots=True)
+class Receta:
+    id: str
+    nombre: str
+    imagen: str
+    cantidad_base: float
+    unidad_base: str
+    ingredientes: array  # IDs internos de ingrediente ('q')
+    cantidades: array  # cantidad de cada línea ('d')
+    pasos: tuple
+
+
+class Catalogo(Versionado):
+    """Recetas e ingredientes globales, compartidos entre sesiones y ligados a una versión."""
+
+    def __init__(self, data=None, version=None):
+        super().__init__()
+        self._nombres = []
+        self._ids = {}
+        self.reconstruir(data or {'ingredientes_globales': {}, 'recetas': []}, version)
+
+    # --- Construcción y sincronización ---
+
+    def reconstruir(self, data, version):
+        """Convierte el formato de dicts completo en el modelo.
+
+        El catálogo nuevo se arma aparte y se publica al final: mientras
+        tanto, las demás sesiones siguen leyendo el anterior completo, y sus
+        recetas siguen resolviendo sus IDs de ingrediente.
+        """
+        with self._lock:
+            ingredientes = {
+                nombre: Ingrediente(info['unidad_base'], float(info['costo_por_unidad']))
+                for nombre, info in data['ingredientes_globales'].items()
+            }
+            for nombre in ingredientes:
+                self.id_ingrediente(nombre)
+            recetas = [self._desde_dict(r) for r in data['recetas']]
+            posiciones = {r.id: i for i, r in enumerate(recetas)}
+            self.ingredientes, self.recetas, self._posiciones, self._opciones = ingredientes, recetas, posiciones, None
+            self.version = version
+
+    def id_ingrediente(self, nombre):
+        """ID interno de un nombre de ingrediente (lo crea si es nuevo)."""
+        ingrediente_id = self._ids.get(nombre)
+        if ingrediente_id is None:
+            ingrediente_id = self._ids[nombre] = len(self._nombres)
+            self._nombres.append(nombre)
+        return ingrediente_id
+
+    def nombre_ingrediente(self, ingrediente_id):
+        return self._nombres[ingrediente_id]
+
+    @property
+    def nombres_internos(self):
+        """Nombres de todos los ingredientes internados, indexados por ID.
+
+        Es una copia: la tabla puede crecer mientras otra sesión la recorre.
+        """
+        return tuple(self._nombres)
+
+    def _desde_dict(self, receta):
+        lineas = receta.get('ingredientes', [])
+        return Receta(
+            id=receta['id'],
+            nombre=receta['nombre'],
+            imagen=receta['imagen'],
+            cantidad_base=receta['cantidad_base'],
+            unidad_base=receta['unidad_base'],
+            ingredientes=array('q', [self.id_ingrediente(ing['nombre']) for ing in lineas]),
+            cantidades=array('d', [ing['cantidad'] for ing in lineas]),
+            pasos=tuple(receta.get('pasos', [])),
+        )
+
+    # --- Consultas ---
+
+    def __len__(self):
+        return len(self.recetas)
+
+    def receta(self, receta_id):
+        """Receta con ese ID, o None."""
+        posicion = self._posiciones.get(receta_id)
+        return None if posicion is None else self.recetas[posicion]
+
+    def existe(self, receta_id):
+        return receta_id in self._posiciones
+
+    def recetas_por_ids(self, receta_ids):
+        """Recetas con esos IDs, en el mismo orden, omitiendo las que no existan."""
+        posiciones = self._posiciones
+        recetas = self.recetas
+        return [recetas[posiciones[r]] for r in receta_ids if r in posiciones]
+
+    def lineas(self, receta):
+        """Lista de ``(nombre_ingrediente, cantidad)`` de una receta."""
+        nombres = self._nombres
+        return [(nombres[i], c) for i, c in zip(receta.ingredientes, receta.cantidades)]
+
+    @property
+    def nombres_ingredientes(self):
+        """Nombres de los ingredientes globales, en orden (para selectores)."""
+        opciones = self._opciones
+        if opciones is None:
+            nombres = tuple(self.ingredientes)
+            opciones = self._opciones = (nombres, {n: i for i, n in enumerate(nombres)})
+        return opciones[0]
+
+    def posicion_ingrediente(self, nombre):
+        """Posición de un ingrediente en ``nombres_ingredientes``, o None."""
+        self.nombres_ingredientes
+        return self._opciones[1].get(nombre)
+
+    def tabla_ingredientes(self):
+        """Ingredientes globales como DataFrame ``nombre/unidad_base/costo_por_unidad``."""
+        import pandas as pd
+
+        return pd.DataFrame({
+            'nombre': pd.Series(list(self.ingredientes), dtype=object),
+            'unidad_base': pd.Series([i.unidad_base for i in self.ingredientes.values()], dtype=object),
+            'costo_por_unidad': pd.Series([i.costo_por_unidad for i in self.ingredientes.values()], dtype='float64'),
+        })
+
+    def a_dict(self, receta):
+        """Receta en el formato de dicts del almacenamiento."""
+        return {
+            "id": receta.id,
+            "nombre": receta.nombre,
+            "imagen": receta.imagen,
+            "cantidad_base": receta.cantidad_base,
+            "unidad_base": receta.unidad_base,
+            "ingredientes": [{"nombre": n, "cantidad": c} for n, c in self.lineas(receta)],
+            "pasos": list(receta.pasos),
+        }
+
+    def a_data(self):
+        """Catálogo completo en el formato de dicts del almacenamiento."""
+        return {
+            "ingredientes_globales": {
+                n: {"unidad_base": i.unidad_base, "costo_por_unidad": i.costo_por_unidad}
+                for n, i in self.ingredientes.items()
+            },
+            "recetas": [self.a_dict(r) for r in self.recetas],
+        }
+
+    # --- Modificaciones (mantienen los mapas consistentes) ---
+
+    def guardar_receta(self, receta, id_anterior=None):
+        """Inserta o reemplaza una receta a partir de su dict."""
+        with self._lock:
+            buscado = id_anterior if id_anterior is not None else receta['id']
+            nueva = self._desde_dict(receta)
+            recetas = list(self.recetas)
+            posiciones = dict(self._posiciones)
+            posicion = posiciones.pop(buscado, None)
+            if posicion is None:
+                posicion = len(recetas)
+                recetas.append(nueva)
+            else:
+                recetas[posicion] = nueva
+            posiciones[nueva.id] = posicion
+            self.recetas, self._posiciones = recetas, posiciones
+
+    def guardar_recetas(self, recetas):
+        """Inserta o reemplaza (por ID) muchas recetas a partir de sus dicts."""
+        with self._lock:
+            lista = list(self.recetas)
+            posiciones = dict(self._posiciones)
+            for receta in recetas:
+                nueva = self._desde_dict(receta)
+                posicion = posiciones.get(nueva.id)
+                if posicion is None:
+                    posiciones[nueva.id] = len(lista)
+                    lista.append(nueva)
+                else:
+                    lista[posicion] = nueva
+            self.recetas, self._posiciones = lista, posiciones
+
+    def eliminar_receta(self, receta_id):
+        with self._lock:
+            posicion = self._posiciones.get(receta_id)
+            if posicion is None:
+                return
+            recetas = self.recetas[:posicion] + self.recetas[posicion + 1:]
+            posiciones = {r: (p if p < posicion else p - 1) for r, p in self._posiciones.items() if r != receta_id}
+            self.recetas, self._posiciones = recetas, posiciones
+
+    def guardar_ingredientes(self, ingredientes, eliminar=()):
+        """Inserta o actualiza ingredientes globales y borra ``eliminar``."""
+        with self._lock:
+            globales = dict(self.ingredientes)
+            for nombre in eliminar:
+                globales.pop(nombre, None)
+            for nombre, info in ingredientes.items():
+                self.id_ingrediente(nombre)
+                globales[nombre] = Ingrediente(info['unidad_base'], float(info['costo_por_unidad']))
+            self.ingredientes = globales
+            self._opciones = None
@@ -0,0 +1,38 @@
+"""Base común de los recursos en memoria ligados a una versión de datos.
+
+El catálogo, el índice de búsqueda y el motor de costos se comparten entre
+sesiones y reflejan una versión concreta de los datos. Cada uno se reconstruye
+completo cuando esa versión no coincide con la actual, y los guardados de la
+app lo ponen al día de forma incremental con ``sincronizar``.
+"""
+
+import threading
+
+
+class Versionado:
+    """Versión de los datos que refleja el recurso, más el candado que la protege.
+
+    Las subclases definen ``reconstruir(origen, version)`` y hacen todas sus
+    operaciones bajo ``self._lock``.
+    """
+
+    def __init__(self):
+        self.version = None
+        self._lock = threading.RLock()
+
+    def al_dia(self, version):
+        """Indica si el recurso refleja ``version``."""
+        return self.version is not None and self.version == version
+
+    def sincronizar(self, version_anterior, version_nueva, cambio=None):
+        """Aplica ``cambio(recurso)`` solo si el recurso estaba al día.
+
+        Si ya estaba desfasado no se toca, y se reconstruirá completo la
+        próxima vez que se use.
+        """
+        with self._lock:
+            if not self.al_dia(version_anterior):
+                return
+            if cambio:
+                cambio(self)
+            self.version = version_nueva